@@ -335,7 +335,9 @@ def status(config: Optional[str], instance_name: Optional[str], ssh_key: str, ss
 @click.argument('instance_name', required=False)
 @click.option('--ssh-key', default=None, help='SSH 私钥路径（默认: ~/.ssh/lightsail_key.pem）')
 @click.option('--ssh-port', default=6677, help='SSH 端口')
-def verify(config: Optional[str], instance_name: Optional[str], ssh_key: str, ssh_port: int):
+@click.option('--force', is_flag=True, default=False, help='忽略缓存的验证结果，强制重新验证')
+def verify(config: Optional[str], instance_name: Optional[str], ssh_key: str, ssh_port: int,
+           force: bool):
     """
     验证实例的安全配置
     
@@ -394,7 +396,7 @@ def verify(config: Optional[str], instance_name: Optional[str], ssh_key: str, ss
         
         # 执行验证
         click.echo(f"{Fore.YELLOW}正在验证...{Style.RESET_ALL}")
-        verification = manager.verify_security()
+        verification = manager.verify_security(force=force)
         
         # 显示验证结果
         if verification.get('success'):
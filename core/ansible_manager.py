@@ -7,12 +7,56 @@ Ansible 管理模块
 3. Ansible 连接测试
 """
 
+import asyncio
+import json
 import os
+import sys
 import subprocess
+import tempfile
 from typing import List, Dict
 from .utils.logger import get_logger
 import ansible_runner
 
+# 运行时 ansible.cfg（SSH ControlMaster/ControlPersist + pipelining）
+ANSIBLE_CFG = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ansible', 'ansible.cfg'
+)
+
+try:
+    # 可选依赖：orjson（序列化 inventory 与 extra_vars 比标准库 json 更快）
+    import orjson
+except ImportError:
+    orjson = None
+
+# 结构化任务结果对应的 ansible-runner 事件
+TASK_RESULT_EVENTS = ('runner_on_ok', 'runner_on_failed', 'runner_on_unreachable')
+
+try:
+    # 可选依赖：Mitogen 策略插件（持久化远程进程，减少每个任务的模块传输与解释器启动）
+    import ansible_mitogen
+    MITOGEN_STRATEGY_DIR = os.path.join(
+        os.path.dirname(ansible_mitogen.__file__), 'plugins', 'strategy'
+    )
+except ImportError:
+    MITOGEN_STRATEGY_DIR = None
+
+
+def _write_json(path: str, data) -> None:
+    """
+    将数据以 JSON 格式写入文件（已安装 orjson 时使用 orjson）
+
+    Args:
+        path: 文件路径
+        data: 可 JSON 序列化的数据
+    """
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, default=str))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, default=str)
+
+
 class AnsibleManager:
     """
     Ansible 管理类
@@ -26,6 +70,35 @@ class AnsibleManager:
         self.ansible_dir = "/etc/ansible"
         self.hosts_file = os.path.join(self.ansible_dir, "hosts")
         self.ssh_private_key = os.path.expanduser("~/.ssh/id_rsa")
+        self.ansible_cfg = config.get('ansible_cfg', ANSIBLE_CFG)
+        # Linux 控制节点默认启用 Mitogen（需已安装 mitogen；目标 Python 不兼容时可设为 False）
+        self.use_mitogen = (
+            config.get('use_mitogen', sys.platform.startswith('linux'))
+            and MITOGEN_STRATEGY_DIR is not None
+        )
+        self._envvars = self._build_envvars()
+
+    def _build_envvars(self) -> Dict[str, str]:
+        """
+        构建 ansible-runner 使用的环境变量
+
+        Returns:
+            Dict[str, str]: 环境变量字典
+        """
+        envvars = {
+            'ANSIBLE_CONFIG': self.ansible_cfg,
+            # 即使用户级配置关闭了 pipelining，也在本次执行中启用（不再经 /tmp 传输模块）
+            'ANSIBLE_PIPELINING': 'True',
+            'ANSIBLE_HOST_KEY_CHECKING': 'False',
+            'ANSIBLE_RETRY_FILES_ENABLED': 'False',
+        }
+        if self.config.get('profile_tasks', False):
+            # 每个任务的耗时统计（需要 ansible.posix collection）
+            envvars['ANSIBLE_CALLBACKS_ENABLED'] = 'ansible.posix.profile_tasks'
+        if self.use_mitogen:
+            envvars['ANSIBLE_STRATEGY_PLUGINS'] = MITOGEN_STRATEGY_DIR
+            envvars['ANSIBLE_STRATEGY'] = 'mitogen_linear'
+        return envvars
 
     def setup_ansible(self) -> bool:
         """
@@ -229,7 +302,8 @@ pipelining = True
             self.logger.error(f"Ansible 连接测试失败: {str(e)}")
             return False
 
-    def run_playbook(self, playbook: str, extra_vars: dict = None, inventory = None) -> dict:
+    def run_playbook(self, playbook: str, extra_vars: dict = None, inventory = None,
+                     tags: List[str] = None) -> dict:
         """
         执行 Ansible playbook
         
@@ -237,31 +311,16 @@ pipelining = True
             playbook: playbook 文件路径
             extra_vars: 额外变量字典
             inventory: inventory 内容（str 或 dict，可选，默认使用配置中的主机信息）
+            tags: 只运行带有这些标签的任务（可选）
             
         Returns:
-            dict: 执行结果，包含 rc (return code), stdout, stderr
+            dict: 执行结果，包含 rc (return code), stdout, stderr, status,
+                task_results（各主机的任务结果：host, task, event, res）
         """
         try:
             # 创建临时目录
-            import tempfile
-            import json
             with tempfile.TemporaryDirectory() as tmpdir:
-                # 如果没有提供 inventory，使用配置中的主机信息生成
-                if inventory is None:
-                    inventory = self._generate_inventory_for_security()
-                
-                # 如果 inventory 是字典，转换为 JSON 格式
-                # 如果是字符串，直接使用（假设是 INI 格式）
-                if isinstance(inventory, dict):
-                    # 将字典格式的 inventory 保存为 JSON
-                    inventory_path = os.path.join(tmpdir, 'inventory.json')
-                    with open(inventory_path, 'w') as f:
-                        json.dump(inventory, f, indent=2)
-                else:
-                    # 将字符串格式的 inventory 保存为 INI
-                    inventory_path = os.path.join(tmpdir, 'inventory.ini')
-                    with open(inventory_path, 'w') as f:
-                        f.write(inventory)
+                inventory_path = self._write_inventory(tmpdir, inventory)
                 
                 # 准备 ansible-runner 参数
                 runner_config = {
@@ -269,31 +328,45 @@ pipelining = True
                     'playbook': playbook,
                     'inventory': inventory_path,
                     'quiet': False,
-                    'verbosity': 1
+                    'verbosity': 1,
+                    'envvars': dict(self._envvars)
                 }
                 
                 if extra_vars:
                     runner_config['extravars'] = extra_vars
                 
+                if tags:
+                    runner_config['tags'] = ','.join(tags)
+                
                 # 执行 playbook
                 self.logger.info(f"执行 playbook: {playbook}")
                 runner = ansible_runner.run(**runner_config)
                 
-                # 收集输出
+                # 收集输出与结构化任务结果
                 stdout_lines = []
                 stderr_lines = []
+                task_results = []
                 
                 for event in runner.events:
                     if 'stdout' in event:
                         stdout_lines.append(event['stdout'])
                     if 'stderr' in event:
                         stderr_lines.append(event['stderr'])
+                    if event.get('event') in TASK_RESULT_EVENTS:
+                        event_data = event.get('event_data', {})
+                        task_results.append({
+                            'host': event_data.get('host'),
+                            'task': event_data.get('task'),
+                            'event': event['event'],
+                            'res': event_data.get('res', {})
+                        })
                 
                 result = {
                     'rc': runner.rc,
                     'stdout': '\n'.join(stdout_lines),
                     'stderr': '\n'.join(stderr_lines),
-                    'status': runner.status
+                    'status': runner.status,
+                    'task_results': task_results
                 }
                 
                 if runner.rc == 0:
@@ -312,6 +385,90 @@ pipelining = True
                 'status': 'failed'
             }
     
+    async def run_playbook_async(self, playbook: str, extra_vars: dict = None, inventory = None,
+                                 tags: List[str] = None) -> dict:
+        """
+        异步执行 Ansible playbook（通过 ansible-playbook 子进程，不阻塞事件循环）
+        
+        Args:
+            playbook: playbook 文件路径
+            extra_vars: 额外变量字典
+            inventory: inventory 内容（str 或 dict，可选，默认使用配置中的主机信息）
+            tags: 只运行带有这些标签的任务（可选）
+            
+        Returns:
+            dict: 执行结果，包含 rc (return code), stdout, stderr, status
+        """
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                inventory_path = self._write_inventory(tmpdir, inventory)
+                cmd = ['ansible-playbook', '-i', inventory_path, playbook]
+                
+                if extra_vars:
+                    extra_vars_path = os.path.join(tmpdir, 'extravars.json')
+                    _write_json(extra_vars_path, extra_vars)
+                    cmd += ['--extra-vars', f'@{extra_vars_path}']
+                
+                if tags:
+                    cmd += ['--tags', ','.join(tags)]
+                
+                self.logger.info(f"执行 playbook: {playbook}")
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    env={**os.environ, **self._envvars}
+                )
+                stdout, stderr = await proc.communicate()
+                
+                result = {
+                    'rc': proc.returncode,
+                    'stdout': stdout.decode(errors='replace'),
+                    'stderr': stderr.decode(errors='replace'),
+                    'status': 'successful' if proc.returncode == 0 else 'failed'
+                }
+                
+                if proc.returncode == 0:
+                    self.logger.info(f"Playbook 执行成功: {playbook}")
+                else:
+                    self.logger.error(f"Playbook 执行失败: {playbook}, rc={proc.returncode}")
+                
+                return result
+                
+        except Exception as e:
+            self.logger.error(f"执行 playbook 失败: {e}")
+            return {
+                'rc': 1,
+                'stdout': '',
+                'stderr': str(e),
+                'status': 'failed'
+            }
+    
+    def _write_inventory(self, tmpdir: str, inventory = None) -> str:
+        """
+        将 inventory 写入临时目录
+        
+        Args:
+            tmpdir: 临时目录
+            inventory: inventory 内容（dict 保存为 JSON，str 视为 INI 格式；
+                None 时使用配置中的主机信息生成）
+            
+        Returns:
+            str: inventory 文件路径
+        """
+        if inventory is None:
+            inventory = self._generate_inventory_for_security()
+        
+        if isinstance(inventory, dict):
+            inventory_path = os.path.join(tmpdir, 'inventory.json')
+            _write_json(inventory_path, inventory)
+        else:
+            inventory_path = os.path.join(tmpdir, 'inventory.ini')
+            with open(inventory_path, 'w') as f:
+                f.write(inventory)
+        
+        return inventory_path
+    
     def _generate_inventory_for_security(self) -> str:
         """
         为安全配置生成 inventory 内容
@@ -154,14 +154,15 @@ class DeploymentOrchestrator:
             click.echo("⏭  跳过（无安全配置）\n")
             return True
         
-        instances = security.get('instances', [])
+        instances = security.instances
         if not instances:
             click.echo("⏭  跳过（无目标实例）\n")
             return True
         
-        ssh_config = security.get('ssh', {})
-        ssh_port = ssh_config.get('port', 6677)
-        ssh_key = ssh_config.get('key_path', '~/.ssh/lightsail_key.pem')
+        ssh_config = security.ssh
+        ssh_port = ssh_config.port if ssh_config else 6677
+        ssh_key = ssh_config.key_path if ssh_config else '~/.ssh/lightsail_key.pem'
+        ssh_user = ssh_config.user if ssh_config else 'ubuntu'
         
         for instance_name in instances:
             try:
@@ -178,10 +179,10 @@ class DeploymentOrchestrator:
                 # Apply security
                 security_config = {
                     'instance_ip': instance_ip,
-                    'ssh_user': ssh_config.get('user', 'ubuntu'),
+                    'ssh_user': ssh_user,
                     'ssh_key_path': ssh_key,
                     'ssh_port': ssh_port,
-                    'vpn_network': security.get('vpn_network', '10.0.0.0/24')
+                    'vpn_network': security.vpn_network
                 }
                 
                 security_manager = SecurityManager(security_config)
@@ -347,11 +348,9 @@ class DeploymentOrchestrator:
         if self.config.security:
             click.echo("🔒 安全配置:")
             security = self.config.security
-            targets = security.get('instances', [])
-            click.echo(f"  • 配置 {len(targets)} 个实例")
-            if 'ssh' in security:
-                ssh = security['ssh']
-                click.echo(f"  • SSH 端口: {ssh.get('port', 6677)}")
+            click.echo(f"  • 配置 {len(security.instances)} 个实例")
+            if security.ssh:
+                click.echo(f"  • SSH 端口: {security.ssh.port}")
             click.echo()
         
         # Services
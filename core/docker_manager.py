@@ -7,6 +7,7 @@ Docker 管理模块
 3. Docker 容器的测试
 """
 
+import json
 import os
 import subprocess
 from typing import Dict, Optional
@@ -21,6 +22,33 @@ class DockerManager:
         """初始化 Docker 管理器"""
         self.config = config
         self.logger = get_logger(__name__)
+        # 所有 playbook 调用共享的 ansible-runner 参数
+        self._runner_options = {
+            'private_data_dir': 'ansible',
+        }
+        self._become_vars = {
+            'ansible_become': True,
+            'ansible_become_method': 'sudo'
+        }
+
+    def _run_playbook(self, playbook: str, hosts: Dict, extravars: Optional[Dict] = None):
+        """
+        使用共享的 ansible-runner 参数执行 playbook
+
+        Args:
+            playbook: playbook 路径（相对于 ansible 目录）
+            hosts: 主机配置字典
+            extravars: 额外变量（会与 become 变量合并）
+
+        Returns:
+            ansible_runner.Runner: 执行结果
+        """
+        return ansible_runner.run(
+            playbook=playbook,
+            inventory=hosts,
+            extravars={**(extravars or {}), **self._become_vars},
+            **self._runner_options
+        )
 
     def setup_docker(self, hosts: Dict) -> bool:
         """
@@ -34,15 +62,12 @@ class DockerManager:
         """
         try:
             # 运行 Ansible playbook
-            result = ansible_runner.run(
-                private_data_dir='ansible',
-                playbook='playbooks/setup_docker.yml',
-                inventory=hosts,
+            result = self._run_playbook(
+                'playbooks/setup_docker.yml',
+                hosts,
                 extravars={
                     'docker_version': self.config.get('docker_version', 'latest'),
                     'docker_compose_version': self.config.get('docker_compose_version', 'latest'),
-                    'ansible_become': True,
-                    'ansible_become_method': 'sudo'
                 }
             )
 
@@ -77,15 +102,7 @@ class DockerManager:
         """
         try:
             # 运行测试 playbook
-            result = ansible_runner.run(
-                private_data_dir='ansible',
-                playbook='playbooks/test_docker.yml',
-                inventory=hosts,
-                extravars={
-                    'ansible_become': True,
-                    'ansible_become_method': 'sudo'
-                }
-            )
+            result = self._run_playbook('playbooks/test_docker.yml', hosts)
 
             # 解析测试结果
             results = {}
@@ -154,15 +171,7 @@ class DockerManager:
         """
         try:
             # 运行停止 playbook
-            result = ansible_runner.run(
-                private_data_dir='ansible',
-                playbook='playbooks/stop_docker.yml',
-                inventory=hosts,
-                extravars={
-                    'ansible_become': True,
-                    'ansible_become_method': 'sudo'
-                }
-            )
+            result = self._run_playbook('playbooks/stop_docker.yml', hosts)
 
             if result.status == 'successful':
                 self.logger.info("Docker 服务和容器已停止")
@@ -616,7 +625,6 @@ class DockerManager:
             result = subprocess.run(cmd, capture_output=True, timeout=30, text=True)
             
             if result.returncode == 0:
-                import json
                 container_info = json.loads(result.stdout)[0]
                 return {
                     'name': container_info['Name'].lstrip('/'),
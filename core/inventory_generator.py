@@ -5,11 +5,60 @@ Ansible Inventory 生成器
 """
 
 import json
-from typing import Dict, List, Optional, Any
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, Tuple
+
+import yaml
+
 from core.utils.logger import get_logger
 from providers.aws.lightsail_manager import LightsailManager
 
 
+try:
+    # 优先使用 libyaml 的 C 实现
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
+
+# Lightsail 实例列表缓存有效期（秒）
+LIGHTSAIL_CACHE_TTL = 60
+
+
+@dataclass(slots=True)
+class HostInfo:
+    """
+    单个主机的 inventory 记录
+
+    固定字段使用 slots 存储，标签单独保存，由 to_dict 合并为 Ansible 主机变量
+    """
+    ansible_host: Optional[str]
+    ansible_user: str
+    ansible_port: int
+    instance_id: Optional[str]
+    service_type: str = 'general'
+    tags: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为 Ansible 主机变量字典
+
+        Returns:
+            主机变量字典（固定字段 + 小写标签 + service_type）
+        """
+        host_vars = {
+            'ansible_host': self.ansible_host,
+            'ansible_user': self.ansible_user,
+            'ansible_port': self.ansible_port,
+            'instance_id': self.instance_id,
+        }
+        host_vars.update(self.tags)
+        host_vars['service_type'] = self.service_type
+        return host_vars
+
+
 class InventoryGenerator:
     """
     Ansible Inventory 生成器
@@ -20,8 +69,11 @@ class InventoryGenerator:
     - 手动导入实例信息
     """
     
-    def __init__(self):
+    def __init__(self, cache_ttl: float = LIGHTSAIL_CACHE_TTL):
         self.logger = get_logger(__name__)
+        self.cache_ttl = cache_ttl
+        # (region, profile) -> (获取时间, 实例列表)
+        self._ls_cache: Dict[Tuple[str, Optional[str]], Tuple[float, List[Dict[str, Any]]]] = {}
     
     def from_lightsail(self, region: str, profile: Optional[str] = None,
                       tags_filter: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
@@ -38,24 +90,16 @@ class InventoryGenerator:
         """
         self.logger.info(f"从 Lightsail 生成 inventory（区域: {region}）")
         
-        # 创建 Lightsail 管理器
-        config = {'provider': 'aws_lightsail', 'region': region}
-        if profile:
-            config['profile'] = profile
-        
-        manager = LightsailManager(config)
-        
-        # 获取所有实例
-        instances = manager.list_instances()
+        # 获取所有实例（同一 region/profile 在有效期内复用缓存）
+        instances = self._list_lightsail_instances(region, profile)
         
         # 应用标签过滤
         if tags_filter:
-            filtered_instances = []
-            for inst in instances:
-                inst_tags = inst.get('tags', {})
-                if all(inst_tags.get(k) == v for k, v in tags_filter.items()):
-                    filtered_instances.append(inst)
-            instances = filtered_instances
+            filter_items = tags_filter.items()
+            instances = [
+                inst for inst in instances
+                if filter_items <= inst.get('tags', {}).items()
+            ]
         
         self.logger.info(f"找到 {len(instances)} 个实例")
         
@@ -64,6 +108,41 @@ class InventoryGenerator:
         
         return inventory
     
+    def _list_lightsail_instances(self, region: str,
+                                  profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取 Lightsail 实例列表，按 (region, profile) 缓存
+
+        Args:
+            region: AWS 区域
+            profile: AWS profile 名称
+
+        Returns:
+            实例信息列表
+        """
+        key = (region, profile)
+        now = time.monotonic()
+        
+        cached = self._ls_cache.get(key)
+        if cached is not None and now - cached[0] < self.cache_ttl:
+            self.logger.debug(f"使用缓存的 Lightsail 实例列表（区域: {region}）")
+            return cached[1]
+        
+        # 创建 Lightsail 管理器
+        config = {'provider': 'aws_lightsail', 'region': region}
+        if profile:
+            config['profile'] = profile
+        
+        manager = LightsailManager(config)
+        instances = manager.list_instances()
+        
+        self._ls_cache[key] = (now, instances)
+        return instances
+    
+    def clear_cache(self):
+        """清除 Lightsail 实例列表缓存"""
+        self._ls_cache.clear()
+    
     def from_terraform_state(self, state_file: str) -> Dict[str, Any]:
         """
         从 Terraform state 文件生成 inventory
@@ -103,8 +182,7 @@ class InventoryGenerator:
             if config_file.endswith('.json'):
                 config = json.load(f)
             else:
-                import yaml
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=_YamlLoader)
         
         instances = config.get('instances', [])
         
@@ -117,6 +195,8 @@ class InventoryGenerator:
         """
         构建 Ansible inventory 结构
         
+        使用 HostInfo 记录确定主机分组，all.hosts 中保存转换后的主机变量字典
+        
         Args:
             instances: 实例信息列表
         
@@ -139,37 +219,35 @@ class InventoryGenerator:
             }
         }
         
+        hosts = inventory['all']['hosts']
+        children = inventory['all']['children']
+        
         # 处理每个实例
         for inst in instances:
             instance_name = inst.get('name') or inst.get('instance_id')
+            tags = inst.get('tags', {})
             
-            # 构建主机信息
-            host_info = {
-                'ansible_host': inst.get('public_ip'),
-                'ansible_user': inst.get('username', 'ubuntu'),
-                'ansible_port': inst.get('ssh_port', 22),
-                'instance_id': inst.get('instance_id'),
-            }
-            
-            # 添加标签
-            if 'tags' in inst:
-                for key, value in inst['tags'].items():
-                    host_info[key.lower()] = value
-            
-            # 添加服务类型特定信息
-            service_type = inst.get('tags', {}).get('Service') or inst.get('service_type', 'general')
-            host_info['service_type'] = service_type
+            # 构建主机信息（标签键统一小写）
+            host_info = HostInfo(
+                ansible_host=inst.get('public_ip'),
+                ansible_user=inst.get('username', 'ubuntu'),
+                ansible_port=inst.get('ssh_port', 22),
+                instance_id=inst.get('instance_id'),
+                service_type=tags.get('Service') or inst.get('service_type', 'general'),
+                tags={key.lower(): value for key, value in tags.items()},
+            )
             
             # 添加到主机列表
-            inventory['all']['hosts'][instance_name] = host_info
+            hosts[instance_name] = host_info.to_dict()
             
             # 添加到对应的组
-            if 'collector' in service_type.lower():
-                inventory['all']['children']['data_collectors']['hosts'].append(instance_name)
-            elif 'execution' in service_type.lower() or 'exec' in service_type.lower():
-                inventory['all']['children']['execution_engines']['hosts'].append(instance_name)
-            elif 'monitor' in service_type.lower():
-                inventory['all']['children']['monitors']['hosts'].append(instance_name)
+            service_type = host_info.service_type.lower()
+            if 'collector' in service_type:
+                children['data_collectors']['hosts'].append(instance_name)
+            elif 'execution' in service_type or 'exec' in service_type:
+                children['execution_engines']['hosts'].append(instance_name)
+            elif 'monitor' in service_type:
+                children['monitors']['hosts'].append(instance_name)
         
         return inventory
     
@@ -208,20 +286,59 @@ class InventoryGenerator:
         
         return instances
     
-    def save_inventory(self, inventory: Dict[str, Any], output_file: str):
+    def save_inventory(self, inventory: Dict[str, Any], output_file: str) -> bool:
         """
         保存 inventory 到文件
         
+        输出内容按主机名排序，相同输入总是生成相同字节；内容未变化时不重写文件，
+        保持文件 mtime 不变，以便 Ansible 复用已缓存的 inventory 解析结果。
+        文件扩展名为 .yml/.yaml 时输出 YAML，否则输出 JSON。
+        
         Args:
             inventory: Inventory 数据
             output_file: 输出文件路径
+        
+        Returns:
+            bool: 文件是否被写入（内容未变化时为 False）
         """
         self.logger.info(f"保存 inventory 到: {output_file}")
         
-        with open(output_file, 'w') as f:
-            json.dump(inventory, f, indent=2, ensure_ascii=False)
+        # 在副本上转换主机记录并排序组内主机列表（不修改调用方的 inventory），
+        # 字典键在序列化时排序
+        all_group = inventory['all']
+        output = {
+            **inventory,
+            'all': {
+                **all_group,
+                'hosts': {
+                    name: host.to_dict() if isinstance(host, HostInfo) else host
+                    for name, host in all_group.get('hosts', {}).items()
+                },
+                'children': {
+                    name: {**group, 'hosts': sorted(group.get('hosts', []))}
+                    for name, group in all_group.get('children', {}).items()
+                }
+            }
+        }
+        
+        if output_file.endswith(('.yml', '.yaml')):
+            content = yaml.dump(output, Dumper=_YamlDumper, sort_keys=True,
+                                allow_unicode=True, default_flow_style=False)
+        else:
+            content = json.dumps(output, indent=2, ensure_ascii=False, sort_keys=True) + '\n'
+        data = content.encode('utf-8')
+        
+        if os.path.isfile(output_file):
+            with open(output_file, 'rb') as f:
+                if f.read() == data:
+                    self.logger.info("Inventory 未变化，跳过写入")
+                    return False
+        
+        with open(output_file, 'wb') as f:
+            f.write(data)
         
         self.logger.info(f"Inventory 已保存（{len(inventory['all']['hosts'])} 个主机）")
+        return True
     
     def generate_and_save(self, source: str, source_type: str, 
                          output_file: str, **kwargs) -> Dict[str, Any]:
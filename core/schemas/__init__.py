@@ -7,6 +7,7 @@ from .config_schemas import (
     MonitorConfig,
     SSHConfig,
     FirewallRule,
+    FirewallConfig,
 )
 
 __all__ = [
@@ -16,5 +17,6 @@ __all__ = [
     'MonitorConfig',
     'SSHConfig',
     'FirewallRule',
+    'FirewallConfig',
 ]
 
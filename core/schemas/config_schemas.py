@@ -8,34 +8,31 @@ These schemas provide:
 - IDE auto-completion support
 """
 
-from pydantic import BaseModel, Field, field_validator, ConfigDict
-from typing import List, Optional, Dict, Any
-from enum import Enum
+from pydantic import BaseModel, Field, field_validator, ConfigDict, TypeAdapter, ValidationError
+from typing import List, Optional, Dict, Any, Literal, Union
+from functools import lru_cache
+from os.path import expanduser
+from sys import intern
+import ipaddress
 import re
 
 
-class Region(str, Enum):
-    """AWS Regions supported by the system"""
-    US_EAST_1 = 'us-east-1'
-    US_EAST_2 = 'us-east-2'
-    US_WEST_1 = 'us-west-1'
-    US_WEST_2 = 'us-west-2'
-    AP_SOUTH_1 = 'ap-south-1'
-    AP_NORTHEAST_1 = 'ap-northeast-1'
-    AP_NORTHEAST_2 = 'ap-northeast-2'
-    AP_NORTHEAST_3 = 'ap-northeast-3'
-    AP_SOUTHEAST_1 = 'ap-southeast-1'
-    AP_SOUTHEAST_2 = 'ap-southeast-2'
-    EU_CENTRAL_1 = 'eu-central-1'
-    EU_WEST_1 = 'eu-west-1'
-    EU_WEST_2 = 'eu-west-2'
-    EU_WEST_3 = 'eu-west-3'
-    EU_NORTH_1 = 'eu-north-1'
+# Precompiled patterns used by validators
+_INSTANCE_NAME_RE = re.compile(r'^[a-zA-Z0-9][a-zA-Z0-9-_]*$')
+_EMAIL_RE = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+# Exchanges supported by the data collector
+_VALID_EXCHANGES: frozenset[str] = frozenset({'gateio', 'mexc'})
+_VALID_EXCHANGES_STR = ', '.join(sorted(_VALID_EXCHANGES))
+
+
+# Security rule profiles shipped with the system
+SecurityProfileLiteral = Literal['default', 'data-collector', 'monitor', 'execution']
 
 
 class SSHConfig(BaseModel):
     """SSH configuration"""
-    model_config = ConfigDict(extra='allow')  # Allow extra fields for flexibility
+    model_config = ConfigDict(extra='forbid', defer_build=True)
     
     port: int = Field(default=6677, ge=1, le=65535, description="SSH port number")
     key_path: str = Field(..., description="SSH private key path")
@@ -48,35 +45,50 @@ class SSHConfig(BaseModel):
         if not v:
             raise ValueError("SSH key path cannot be empty")
         # Expand ~ to home directory
-        import os
-        return os.path.expanduser(v)
+        return expanduser(v)
 
 
 class FirewallRule(BaseModel):
     """Firewall rule configuration"""
-    model_config = ConfigDict(extra='allow')
+    model_config = ConfigDict(extra='forbid', defer_build=True)
     
     port: int = Field(..., ge=1, le=65535, description="Port number")
     protocol: str = Field(..., pattern='^(tcp|udp|icmp)$', description="Protocol (tcp/udp/icmp)")
     source: str = Field(default="0.0.0.0/0", description="Source CIDR block")
     comment: Optional[str] = Field(None, description="Rule description")
     
+    @field_validator('protocol')
+    @classmethod
+    def intern_protocol(cls, v: str) -> str:
+        """Share protocol strings across rules"""
+        return intern(v)
+    
     @field_validator('source')
     @classmethod
     def validate_cidr(cls, v: str) -> str:
         """Validate CIDR format"""
-        # Basic CIDR validation
-        if '/' not in v and v != '0.0.0.0/0':
-            # Allow IP without /32
-            parts = v.split('.')
-            if len(parts) == 4 and all(p.isdigit() and 0 <= int(p) <= 255 for p in parts):
-                return f"{v}/32"
-        return v
+        try:
+            if '/' in v:
+                ipaddress.ip_network(v, strict=False)
+                return v
+            # Allow IP without prefix length (/32 for IPv4, /128 for IPv6)
+            address = ipaddress.ip_address(v)
+        except ValueError:
+            raise ValueError(f"Invalid CIDR format: {v}")
+        return f"{v}/{address.max_prefixlen}"
+
+
+class FirewallConfig(BaseModel):
+    """Firewall configuration"""
+    model_config = ConfigDict(extra='allow', defer_build=True)
+    
+    default_policy: Optional[str] = Field(None, description="Default incoming policy")
+    rules: List[FirewallRule] = Field(default_factory=list, description="Firewall rules")
 
 
 class InfraInstanceConfig(BaseModel):
     """Infrastructure instance configuration"""
-    model_config = ConfigDict(extra='allow')
+    model_config = ConfigDict(extra='allow', defer_build=True)
     
     name: str = Field(..., min_length=3, max_length=255, description="Instance name")
     blueprint: str = Field(..., description="Blueprint ID (e.g., ubuntu_22_04)")
@@ -87,11 +99,17 @@ class InfraInstanceConfig(BaseModel):
     static_ip: bool = Field(default=False, description="Allocate static IP")
     tags: Dict[str, str] = Field(default_factory=dict, description="Resource tags")
     
+    @field_validator('blueprint', 'bundle', 'region')
+    @classmethod
+    def intern_values(cls, v: str) -> str:
+        """Share repeated blueprint/bundle/region strings across instances"""
+        return intern(v)
+    
     @field_validator('name')
     @classmethod
     def validate_name(cls, v: str) -> str:
         """Validate instance name format"""
-        if not re.match(r'^[a-zA-Z0-9][a-zA-Z0-9-_]*$', v):
+        if not _INSTANCE_NAME_RE.match(v):
             raise ValueError(
                 "Instance name must start with alphanumeric and contain only "
                 "alphanumeric characters, hyphens, and underscores"
@@ -101,22 +119,38 @@ class InfraInstanceConfig(BaseModel):
 
 class SecurityConfig(BaseModel):
     """Security configuration"""
-    model_config = ConfigDict(extra='allow')
+    model_config = ConfigDict(extra='allow', defer_build=True)
     
     instance_name: str = Field(..., description="Target instance name")
-    profile: str = Field(default='default', description="Security profile (default/data-collector/monitor/execution)")
+    profile: SecurityProfileLiteral = Field(default='default', description="Security profile (default/data-collector/monitor/execution)")
     ssh_port: int = Field(default=6677, ge=1, le=65535, description="SSH port")
     ssh_key: str = Field(..., description="SSH private key path")
     vpn_network: str = Field(default='10.0.0.0/24', description="VPN network CIDR")
     region: str = Field(default='ap-northeast-1', description="AWS region")
     
     # Optional firewall configuration
-    firewall: Optional[Dict[str, Any]] = Field(None, description="Firewall configuration")
+    firewall: Optional[FirewallConfig] = Field(None, description="Firewall configuration")
+    
+    @field_validator('profile', mode='before')
+    @classmethod
+    def normalize_profile(cls, v: Any) -> Any:
+        """Accept rule file names (data_collector, monitor_rules) as profile aliases"""
+        if isinstance(v, str):
+            v = v.replace('_', '-')
+            if v.endswith('-rules'):
+                v = v[:-len('-rules')]
+        return v
+    
+    @field_validator('profile', 'region')
+    @classmethod
+    def intern_values(cls, v: str) -> str:
+        """Share repeated profile/region strings across configs"""
+        return intern(v)
 
 
 class DataCollectorConfig(BaseModel):
     """Data collector configuration"""
-    model_config = ConfigDict(extra='allow')
+    model_config = ConfigDict(extra='allow', defer_build=True)
     
     host: str = Field(..., description="Data collector host IP")
     vpn_ip: str = Field(..., description="VPN IP address")
@@ -141,24 +175,30 @@ class DataCollectorConfig(BaseModel):
     @classmethod
     def validate_pairs(cls, v: List[str]) -> List[str]:
         """Validate trading pair format"""
-        for pair in v:
-            if '-' not in pair:
-                raise ValueError(f"Invalid pair format: {pair}. Expected format: BTC-USDT")
+        bad_pair = next((pair for pair in v if '-' not in pair), None)
+        if bad_pair is not None:
+            raise ValueError(f"Invalid pair format: {bad_pair}. Expected format: BTC-USDT")
         return v
     
     @field_validator('exchange')
     @classmethod
     def validate_exchange(cls, v: str) -> str:
         """Validate exchange name"""
-        valid_exchanges = ['gateio', 'mexc']
-        if v.lower() not in valid_exchanges:
-            raise ValueError(f"Invalid exchange: {v}. Valid options: {', '.join(valid_exchanges)}")
-        return v.lower()
+        exchange = v.lower()
+        if exchange not in _VALID_EXCHANGES:
+            raise ValueError(f"Invalid exchange: {v}. Valid options: {_VALID_EXCHANGES_STR}")
+        return intern(exchange)
+    
+    @field_validator('ssh_user')
+    @classmethod
+    def intern_ssh_user(cls, v: str) -> str:
+        """Share SSH user strings across configs"""
+        return intern(v)
 
 
 class MonitorConfig(BaseModel):
     """Monitor configuration"""
-    model_config = ConfigDict(extra='allow')
+    model_config = ConfigDict(extra='allow', defer_build=True)
     
     host: str = Field(..., description="Monitor host IP")
     grafana_password: str = Field(..., min_length=8, description="Grafana admin password")
@@ -180,19 +220,64 @@ class MonitorConfig(BaseModel):
     @classmethod
     def validate_email(cls, v: Optional[str]) -> Optional[str]:
         """Validate email format"""
-        if v and '@' not in v:
+        if v and not _EMAIL_RE.fullmatch(v):
             raise ValueError(f"Invalid email format: {v}")
         return v
+    
+    @field_validator('ssh_user')
+    @classmethod
+    def intern_ssh_user(cls, v: str) -> str:
+        """Share SSH user strings across configs"""
+        return intern(v)
+
+
+# Mapping of config types to schemas
+SCHEMA_MAP = {
+    'infra': InfraInstanceConfig,
+    'security': SecurityConfig,
+    'data_collector': DataCollectorConfig,
+    'monitor': MonitorConfig,
+}
+
+@lru_cache(maxsize=None)
+def _adapter(schema_class: type[BaseModel]) -> TypeAdapter:
+    """Return the cached TypeAdapter for a schema class"""
+    return TypeAdapter(schema_class)
+
+
+def get_adapter(kind: str) -> TypeAdapter:
+    """
+    Return the cached TypeAdapter for a config type.
+    
+    Args:
+        kind: Config type name (a SCHEMA_MAP key)
+        
+    Returns:
+        TypeAdapter for the matching schema
+        
+    Raises:
+        ValueError: If the config type is unknown
+    """
+    schema_class = SCHEMA_MAP.get(kind)
+    if schema_class is None:
+        raise ValueError(
+            f"Unknown config type: {kind}. Valid options: {', '.join(SCHEMA_MAP)}"
+        )
+    return _adapter(schema_class)
 
 
 # Helper function for validation
-def validate_config(config_dict: Dict[str, Any], schema_class: type[BaseModel]) -> BaseModel:
+def validate_config(
+    config_dict: Dict[str, Any],
+    schema_class: Union[type[BaseModel], str]
+) -> BaseModel:
     """
     Validate configuration dictionary against a Pydantic schema.
     
     Args:
         config_dict: Configuration dictionary to validate
-        schema_class: Pydantic model class to validate against
+        schema_class: Pydantic model class to validate against, or a
+            SCHEMA_MAP key such as 'infra'
         
     Returns:
         Validated configuration object
@@ -200,29 +285,18 @@ def validate_config(config_dict: Dict[str, Any], schema_class: type[BaseModel])
     Raises:
         ValueError: If validation fails with detailed error messages
     """
+    if isinstance(schema_class, str):
+        adapter = get_adapter(schema_class)
+    else:
+        adapter = _adapter(schema_class)
+    
     try:
-        return schema_class(**config_dict)
+        return adapter.validate_python(config_dict)
+    except ValidationError as e:
+        errors = '\n'.join([
+            f"  • {'.'.join(map(str, error['loc']))}: {error['msg']}"
+            for error in e.errors()
+        ])
+        raise ValueError(f"Configuration validation failed:\n{errors}")
     except Exception as e:
-        from pydantic import ValidationError
-        if isinstance(e, ValidationError):
-            errors = []
-            for error in e.errors():
-                field = '.'.join(str(x) for x in error['loc'])
-                msg = error['msg']
-                errors.append(f"  • {field}: {msg}")
-            
-            raise ValueError(
-                f"Configuration validation failed:\n" + '\n'.join(errors)
-            )
-        else:
-            raise ValueError(f"Configuration error: {str(e)}")
-
-
-# Mapping of config types to schemas
-SCHEMA_MAP = {
-    'infra': InfraInstanceConfig,
-    'security': SecurityConfig,
-    'data_collector': DataCollectorConfig,
-    'monitor': MonitorConfig,
-}
-
+        raise ValueError(f"Configuration error: {str(e)}")
@@ -4,17 +4,27 @@ Data Lake 配置 Schema
 使用 Pydantic 进行配置验证和类型检查
 """
 
-from pydantic import BaseModel, Field, field_validator, model_validator
-from typing import Optional, Dict, Literal
-from pathlib import Path
+from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict, PrivateAttr
+from typing import Any, Optional, Dict, Literal, Mapping
+from types import MappingProxyType
+from functools import lru_cache
+from os.path import expanduser
+
+
+@lru_cache(maxsize=64)
+def _expand(path: str) -> str:
+    """展开路径中的 ~（同一路径在配置中常重复出现，结果缓存）"""
+    return expanduser(path)
 
 
 class SourceConfig(BaseModel):
     """
     数据源配置
     
-    定义远程数据源的 SSH 连接参数
+    定义远程数据源的 SSH 连接参数，加载后只读
     """
+    model_config = ConfigDict(extra='forbid', defer_build=True, frozen=True)
+    
     type: Literal["ssh"] = Field(..., description="数据源类型，目前仅支持 ssh")
     host: str = Field(..., description="远程主机 IP 或域名")
     port: int = Field(default=6677, description="SSH 端口")
@@ -30,20 +40,27 @@ class SourceConfig(BaseModel):
     def expand_home(cls, v):
         """展开路径中的 ~ 为用户主目录"""
         if v:
-            return str(Path(v).expanduser())
+            return _expand(v)
         return v
 
 
+# 已验证的 SourceConfig 缓存（SourceConfig 只读，可在 profiles 之间共享）
+_SOURCE_CACHE: Dict[tuple, SourceConfig] = {}
+_SOURCE_CACHE_SIZE = 128
+
+
 class ProfileConfig(BaseModel):
     """
     Profile 配置
     
     定义单个数据同步配置文件，包含源、目标、保留策略等
     """
+    model_config = ConfigDict(extra='forbid', defer_build=True, revalidate_instances='never')
+    
     enabled: bool = Field(default=True, description="是否启用此 profile")
     source: SourceConfig = Field(..., description="数据源配置")
     local_subdir: str = Field(..., description="本地子目录（相对于 root_dir）")
-    retention_days: int = Field(default=30, description="数据保留天数")
+    retention_days: int = Field(default=30, gt=0, description="数据保留天数（必须大于 0）")
     rsync_args: str = Field(
         default="-az --partial --inplace",
         description="rsync 命令参数"
@@ -53,13 +70,24 @@ class ProfileConfig(BaseModel):
         description="checkpoint 文件路径（自动生成如果未指定）"
     )
     
-    @field_validator('retention_days')
+    @field_validator('source', mode='wrap')
     @classmethod
-    def validate_retention(cls, v):
-        """验证保留天数必须为正数"""
-        if v <= 0:
-            raise ValueError('retention_days 必须大于 0')
-        return v
+    def reuse_source(cls, v: Any, handler):
+        """相同的源配置只验证一次，后续直接复用已构建的 SourceConfig"""
+        if not isinstance(v, dict):
+            return handler(v)
+        try:
+            key = tuple(sorted(v.items()))
+            cached = _SOURCE_CACHE.get(key)
+        except TypeError:
+            # 包含不可哈希的值，直接验证
+            return handler(v)
+        if cached is None:
+            cached = handler(v)
+            if len(_SOURCE_CACHE) >= _SOURCE_CACHE_SIZE:
+                _SOURCE_CACHE.clear()
+            _SOURCE_CACHE[key] = cached
+        return cached
     
     @field_validator('local_subdir')
     @classmethod
@@ -76,6 +104,8 @@ class DataLakeConfig(BaseModel):
     
     包含全局设置和多个 profiles
     """
+    model_config = ConfigDict(extra='forbid', defer_build=True, revalidate_instances='never')
+    
     root_dir: str = Field(..., description="本地 Data Lake 根目录")
     checkpoint_dir: Optional[str] = Field(
         default=None,
@@ -86,33 +116,48 @@ class DataLakeConfig(BaseModel):
         description="Profile 配置字典"
     )
     
+    # 已启用 profiles 的缓存（在模型验证后生成；model_construct 构造时为 None）
+    _enabled_cache: Optional[Dict[str, ProfileConfig]] = PrivateAttr(default=None)
+    
     @field_validator('root_dir')
     @classmethod
     def expand_root_dir(cls, v):
         """展开根目录路径中的 ~"""
-        return str(Path(v).expanduser())
+        return _expand(v)
     
     @model_validator(mode='after')
     def set_defaults_and_checkpoint_files(self):
         """设置默认值并为每个 profile 自动生成 checkpoint 文件路径"""
         # 设置默认 checkpoint_dir
         if self.checkpoint_dir is None:
-            self.checkpoint_dir = f"{self.root_dir}/.checkpoints"
+            self.checkpoint_dir = self.root_dir + '/.checkpoints'
         
-        # 为每个 profile 设置 checkpoint 文件路径
+        # 单次遍历：为每个 profile 设置 checkpoint 文件路径，并收集已启用的 profiles
+        enabled = {}
+        checkpoint_prefix = self.checkpoint_dir + '/'
         for name, profile in self.profiles.items():
             if profile.checkpoint_file is None:
-                profile.checkpoint_file = f"{self.checkpoint_dir}/{name}.json"
+                profile.checkpoint_file = checkpoint_prefix + name + '.json'
+            if profile.enabled:
+                enabled[name] = profile
+        
+        self._enabled_cache = enabled
         
         return self
     
-    def get_enabled_profiles(self) -> Dict[str, ProfileConfig]:
-        """获取所有已启用的 profiles"""
-        return {
-            name: profile 
-            for name, profile in self.profiles.items() 
-            if profile.enabled
-        }
+    def get_enabled_profiles(self) -> Mapping[str, ProfileConfig]:
+        """
+        获取所有已启用的 profiles
+        
+        优先使用验证时生成的缓存；未经验证构造（model_construct）时按当前 profiles 计算。
+        
+        Returns:
+            只读的 {profile 名称: ProfileConfig} 映射
+        """
+        enabled = self._enabled_cache
+        if enabled is None:
+            enabled = {name: profile for name, profile in self.profiles.items() if profile.enabled}
+        return MappingProxyType(enabled)
 
 
 class RootConfig(BaseModel):
@@ -121,5 +166,7 @@ class RootConfig(BaseModel):
     
     包装 DataLakeConfig 以匹配 YAML 文件结构
     """
+    model_config = ConfigDict(extra='forbid', defer_build=True)
+    
     data_lake: DataLakeConfig
 
@@ -6,12 +6,12 @@ Supports deploying complete production environments from a single config file.
 
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Dict, Optional, Any
-from .config_schemas import SSHConfig
+from .config_schemas import SSHConfig, FirewallConfig
 
 
 class InfraInstance(BaseModel):
     """Infrastructure instance configuration"""
-    model_config = ConfigDict(extra='allow')
+    model_config = ConfigDict(extra='allow', defer_build=True, frozen=True)
     
     name: str = Field(..., description="Instance name")
     blueprint: str = Field(..., description="Blueprint ID")
@@ -24,16 +24,36 @@ class InfraInstance(BaseModel):
 
 class ServiceConfig(BaseModel):
     """Service deployment configuration"""
-    model_config = ConfigDict(extra='allow')
+    model_config = ConfigDict(extra='allow', defer_build=True, frozen=True)
     
     type: str = Field(..., description="Service type (data-collector/monitor)")
     target: str = Field(..., description="Target instance name")
     config: Dict[str, Any] = Field(..., description="Service-specific configuration")
 
 
+class EnvironmentSSHConfig(SSHConfig):
+    """SSH configuration for environment instances (key path defaults to the Lightsail key)"""
+    
+    key_path: str = Field(
+        default='~/.ssh/lightsail_key.pem',
+        validate_default=True,
+        description="SSH private key path"
+    )
+
+
+class EnvironmentSecurityConfig(BaseModel):
+    """Security configuration applied to environment instances"""
+    model_config = ConfigDict(extra='allow', defer_build=True)
+    
+    instances: List[str] = Field(default_factory=list, description="Target instance names")
+    ssh: Optional[EnvironmentSSHConfig] = Field(None, description="SSH configuration")
+    vpn_network: str = Field(default='10.0.0.0/24', description="VPN network CIDR")
+    firewall: Optional[FirewallConfig] = Field(None, description="Firewall configuration")
+
+
 class EnvironmentConfig(BaseModel):
     """Complete environment configuration"""
-    model_config = ConfigDict(extra='allow')
+    model_config = ConfigDict(extra='allow', defer_build=True)
     
     name: str = Field(default="production", description="Environment name")
     description: Optional[str] = Field(None, description="Environment description")
@@ -49,7 +69,7 @@ class EnvironmentConfig(BaseModel):
     )
     
     # Security
-    security: Optional[Dict[str, Any]] = Field(None, description="Security configuration")
+    security: Optional[EnvironmentSecurityConfig] = Field(None, description="Security configuration")
     
     # Services
     services: List[ServiceConfig] = Field(default_factory=list, description="Services to deploy")
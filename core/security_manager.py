@@ -10,13 +10,433 @@
 
 from typing import Dict, List, Any, Optional
 from pathlib import Path
+from types import MappingProxyType
+from functools import lru_cache, cached_property, wraps
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import asyncio
+import atexit
+import errno
+import hashlib
+import heapq
+import itertools
 import json
+import os
+import re
+import selectors
 import time
 import socket
+import subprocess
+import threading
 import yaml
 from core.utils.logger import get_logger
 from core.ansible_manager import AnsibleManager
 
+try:
+    # 优先使用 libyaml 的 C 实现
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+# security/all.yml 中各安全阶段的标签
+SECURITY_PHASES = ('initial', 'firewall', 'ssh', 'fail2ban', 'vpn', 'service', 'tailscale', 'verify')
+
+# 安全配置步骤中预期的错误（playbook 失败、SSH/文件错误、规则或参数错误），
+# 捕获后记录日志并返回失败；其他异常视为程序错误，直接抛出
+_EXPECTED_ERRORS = (RuntimeError, OSError, subprocess.SubprocessError, ValueError, yaml.YAMLError)
+
+# 安全相关 playbook（相对 ansible/playbooks）
+SECURITY_PLAYBOOKS = {
+    'initial': 'security/01_initial_security.yml',
+    'firewall': 'security/02_setup_firewall.yml',
+    'ssh': 'security/03_ssh_hardening.yml',
+    'fail2ban': 'security/04_install_fail2ban.yml',
+    'vpn': 'security/05_adjust_for_vpn.yml',
+    'service': 'security/06_adjust_for_service.yml',
+    'tailscale': 'security/07_adjust_for_tailscale.yml',
+    'verify': 'security/99_verify_security.yml',
+    'all': 'security/all.yml',
+    'setup_tailscale': 'common/setup_tailscale.yml',
+}
+
+# 安全规则配置目录
+RULES_DIR = Path(__file__).parent.parent / 'config' / 'security'
+
+# SSH 主连接（ControlMaster）socket 路径，与 ansible/ansible.cfg 中的 control_path 一致
+CONTROL_PATH = str(Path.home() / '.ansible' / 'cp' / 'qi-%h-%p-%r')
+
+# 安全验证结果缓存目录（<instance_ip>.ok，内容为状态哈希与验证结果）
+VERIFY_CACHE_DIR = Path.home() / '.cache' / 'quants-infra' / 'security'
+VERIFY_CACHE_TTL = 3600
+
+# 规则文件不允许覆盖的实例核心配置项
+FIREWALL_CORE_KEYS = ('ssh_port', 'wireguard_port', 'vpn_network')
+SERVICE_CORE_KEYS = ('ssh_port', 'wireguard_port')
+
+# 安全状态查询：一次 SSH 会话执行全部命令，各段输出之间以分隔行隔开
+_STATUS_SEPARATOR = '=====quants-infra-status====='
+_STATUS_COMMANDS = (
+    ('firewall', 'sudo iptables -S 2>/dev/null'),
+    ('ssh', 'sudo sshd -T 2>/dev/null'),
+    ('fail2ban', 'sudo fail2ban-client status 2>/dev/null'),
+    ('open_ports', 'ss -tlnH 2>/dev/null'),
+)
+_SSHD_OPTION_RE = re.compile(r'^(port|passwordauthentication|permitrootlogin)\s+(\S+)$', re.M)
+_JAIL_LIST_RE = re.compile(r'Jail list:\s*(.*)$', re.M)
+_LISTEN_PORT_RE = re.compile(r'^LISTEN\s+\d+\s+\d+\s+\S*:(\d+)\s', re.M)
+
+
+def _invalidates_verify_cache(method):
+    """
+    装饰修改远程安全配置的方法：方法结束后（无论成功与否）删除验证结果缓存，
+    之后的 verify_security 会重新运行验证 playbook
+    """
+    if asyncio.iscoroutinefunction(method):
+        @wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                self._invalidate_verify_cache()
+        return async_wrapper
+    
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._invalidate_verify_cache()
+    return wrapper
+
+
+def _parse_firewall_status(output: str) -> Dict:
+    """解析 iptables -S 输出"""
+    rules_count = sum(1 for line in output.splitlines() if line.startswith('-A '))
+    input_drop = '-P INPUT DROP' in output
+    return {
+        'status': 'active' if rules_count or input_drop else 'inactive',
+        'rules_count': rules_count
+    }
+
+
+def _parse_ssh_status(output: str) -> Dict:
+    """解析 sshd -T 输出"""
+    options = dict(_SSHD_OPTION_RE.findall(output))
+    if not options:
+        return {'status': 'unknown'}
+    return {
+        'status': 'configured',
+        'port': int(options['port']) if 'port' in options else None,
+        'password_auth': 'enabled' if options.get('passwordauthentication') == 'yes' else 'disabled',
+        'root_login': 'disabled' if options.get('permitrootlogin') == 'no' else options.get('permitrootlogin', 'unknown')
+    }
+
+
+def _parse_fail2ban_status(output: str) -> Dict:
+    """解析 fail2ban-client status 输出"""
+    match = _JAIL_LIST_RE.search(output)
+    if not match:
+        return {'status': 'inactive', 'jails': []}
+    jails = [jail.strip() for jail in match.group(1).split(',') if jail.strip()]
+    return {'status': 'active', 'jails': jails}
+
+
+def _parse_open_ports(output: str) -> List[Dict]:
+    """解析 ss -tlnH 输出"""
+    ports = sorted({int(port) for port in _LISTEN_PORT_RE.findall(output)})
+    return [{'port': port, 'protocol': 'tcp'} for port in ports]
+
+
+_STATUS_PARSERS = {
+    'firewall': _parse_firewall_status,
+    'ssh': _parse_ssh_status,
+    'fail2ban': _parse_fail2ban_status,
+    'open_ports': _parse_open_ports,
+}
+
+
+@lru_cache(maxsize=32)
+def _load_yaml_cached(path_str: str, mtime_ns: int) -> Dict:
+    """
+    解析规则 YAML 文件，按 (路径, 修改时间) 缓存
+    
+    文件修改后 mtime 变化，缓存自动失效。以字节方式读取，由 libyaml 直接解码。
+    """
+    with open(path_str, 'rb') as f:
+        return yaml.load(f, Loader=_YamlLoader) or {}
+
+
+@lru_cache(maxsize=1)
+def _scan_rules_dir() -> Dict[str, Path]:
+    """
+    扫描规则目录，建立 {文件名（不含扩展名）: 路径} 查找表（进程内只扫描一次）
+    """
+    return {path.stem: path for path in sorted(RULES_DIR.glob('*.yml'))}
+
+
+def _rules_candidates(profile: str) -> tuple:
+    """
+    规则名称的查找顺序：profile、profile_rules、去掉 _rules 后缀的 profile
+    
+    兼容 data-collector 与 data_collector 两种命名。
+    """
+    profile_slug = profile.replace('-', '_')
+    return (profile_slug, f'{profile_slug}_rules', profile_slug.removesuffix('_rules'))
+
+
+class _ReadinessProbe:
+    """单个实例的就绪探测状态（只由反应器线程访问）"""
+    
+    def __init__(self, host: str, port: int, deadline: float):
+        self.host = host
+        self.port = port
+        self.deadline = deadline
+        self.future: Future = Future()
+        self.sock: Optional[socket.socket] = None
+        self.connected = False
+        self.step_deadline = deadline
+        self.attempt = 0
+
+
+class ReadinessReactor:
+    """
+    SSH 就绪探测反应器
+    
+    所有等待中的探测共用一个 selector 和一个后台线程：非阻塞连接完成后
+    读取 SSH 版本标识（SSH-）；连接失败或未收到标识时按指数退避
+    （0.5s 起，最长 4s）重新连接，直到截止时间。
+    没有待处理的探测时后台线程退出，下次提交探测时重新启动。
+    """
+    
+    # 单次连接或读取 SSH 标识的超时时间（秒）
+    STEP_TIMEOUT = 2
+    
+    _default: Optional['ReadinessReactor'] = None
+    _default_lock = threading.Lock()
+    
+    def __init__(self):
+        self.logger = get_logger(__name__)
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._submitted: List[_ReadinessProbe] = []
+        # 以下状态只由反应器线程修改
+        self._active = set()
+        self._retries: List[tuple] = []  # 堆：(重试时间, 序号, 探测)
+        self._seq = itertools.count()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+    
+    @classmethod
+    def default(cls) -> 'ReadinessReactor':
+        """进程内共享的反应器"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+    
+    def wait(self, host: str, port: int, timeout: float) -> Future:
+        """
+        提交就绪探测
+        
+        Args:
+            host: 实例地址
+            port: SSH 端口
+            timeout: 超时时间（秒）
+            
+        Returns:
+            Future: 结果为 bool（实例是否就绪）
+        """
+        probe = _ReadinessProbe(host, port, time.monotonic() + timeout)
+        with self._lock:
+            self._submitted.append(probe)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='readiness-reactor', daemon=True
+                )
+                self._thread.start()
+        try:
+            self._wakeup_w.send(b'\0')
+        except BlockingIOError:
+            pass  # 唤醒数据已在缓冲区中
+        return probe.future
+    
+    def result(self, future: Future, timeout: float) -> bool:
+        """
+        等待探测结果（最多比探测超时多等一个 STEP_TIMEOUT）
+        
+        Args:
+            future: wait 返回的 Future
+            timeout: 提交探测时使用的超时时间（秒）
+            
+        Returns:
+            bool: 实例是否就绪（等待超时视为未就绪）
+        """
+        try:
+            return future.result(timeout + self.STEP_TIMEOUT)
+        except FutureTimeoutError:
+            self.logger.warning("等待就绪探测结果超时")
+            return False
+    
+    def _run(self):
+        """反应器线程入口：主循环出错时结束所有待处理的探测，下次提交时重新启动线程"""
+        try:
+            self._loop()
+        except Exception as e:
+            self.logger.error("就绪探测反应器异常退出: %s", e)
+            self._fail_pending()
+    
+    def _fail_pending(self):
+        """将所有已提交、进行中和等待重试的探测结果设为 False，并允许重新启动线程"""
+        with self._lock:
+            probes = self._submitted + list(self._active) + [item[2] for item in self._retries]
+            self._submitted = []
+            self._active = set()
+            self._retries = []
+            self._thread = None
+        for probe in probes:
+            if probe.sock is not None:
+                try:
+                    self._selector.unregister(probe.sock)
+                except (KeyError, ValueError, OSError):
+                    pass
+                probe.sock.close()
+                probe.sock = None
+            if not probe.future.done():
+                probe.future.set_result(False)
+    
+    def _loop(self):
+        """反应器主循环"""
+        while True:
+            with self._lock:
+                submitted, self._submitted = self._submitted, []
+                if not submitted and not self._active and not self._retries:
+                    self._thread = None
+                    return
+            
+            now = time.monotonic()
+            for probe in submitted:
+                self._connect(probe, now)
+            while self._retries and self._retries[0][0] <= now:
+                self._connect(heapq.heappop(self._retries)[2], now)
+            
+            for key, _ in self._selector.select(self._next_timeout(now)):
+                if key.fileobj is self._wakeup_r:
+                    self._drain_wakeup()
+                else:
+                    self._on_ready(key.data)
+            
+            now = time.monotonic()
+            for probe in [p for p in self._active if now >= p.step_deadline]:
+                self.logger.debug("连接测试超时: %s:%s", probe.host, probe.port)
+                self._retry(probe, now)
+    
+    def _next_timeout(self, now: float) -> float:
+        """下一次需要处理超时或重试的时间间隔"""
+        timeout = 1.0
+        if self._retries:
+            timeout = min(timeout, self._retries[0][0] - now)
+        for probe in self._active:
+            timeout = min(timeout, probe.step_deadline - now)
+        return max(timeout, 0)
+    
+    def _drain_wakeup(self):
+        """清空唤醒 socket"""
+        try:
+            while self._wakeup_r.recv(512):
+                pass
+        except BlockingIOError:
+            pass
+    
+    def _connect(self, probe: _ReadinessProbe, now: float):
+        """发起非阻塞连接"""
+        if now >= probe.deadline:
+            probe.future.set_result(False)
+            return
+        
+        sock = None
+        try:
+            sock = self._open_probe_socket()
+            err = sock.connect_ex((probe.host, probe.port))
+        except OSError as e:
+            err = e.errno or errno.EIO
+        if err not in (0, errno.EINPROGRESS):
+            self.logger.debug("连接测试失败: %s", os.strerror(err))
+            if sock is not None:
+                sock.close()
+            self._schedule_retry(probe, now)
+            return
+        
+        probe.sock = sock
+        probe.connected = False
+        probe.step_deadline = min(now + self.STEP_TIMEOUT, probe.deadline)
+        self._selector.register(sock, selectors.EVENT_WRITE, probe)
+        self._active.add(probe)
+    
+    def _on_ready(self, probe: _ReadinessProbe):
+        """处理连接完成或收到数据"""
+        now = time.monotonic()
+        if not probe.connected:
+            err = probe.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                self.logger.debug("连接测试失败: %s", os.strerror(err))
+                self._retry(probe, now)
+                return
+            # 已连接，等待 SSH 版本标识
+            probe.connected = True
+            probe.step_deadline = min(now + self.STEP_TIMEOUT, probe.deadline)
+            self._selector.modify(probe.sock, selectors.EVENT_READ, probe)
+            return
+        
+        try:
+            banner = probe.sock.recv(4)
+        except OSError:
+            banner = b''
+        if banner == b'SSH-':
+            self._close(probe)
+            probe.future.set_result(True)
+        else:
+            self.logger.debug("端口已开放，SSH 服务尚未就绪")
+            self._retry(probe, now)
+    
+    def _retry(self, probe: _ReadinessProbe, now: float):
+        """关闭当前连接并安排重试"""
+        self._close(probe)
+        self._schedule_retry(probe, now)
+    
+    def _schedule_retry(self, probe: _ReadinessProbe, now: float):
+        """按指数退避安排重试（不超过截止时间）"""
+        if now >= probe.deadline:
+            probe.future.set_result(False)
+            return
+        retry_at = min(now + min(0.5 * 2 ** probe.attempt, 4), probe.deadline)
+        probe.attempt += 1
+        heapq.heappush(self._retries, (retry_at, next(self._seq), probe))
+    
+    def _close(self, probe: _ReadinessProbe):
+        """注销并关闭探测 socket"""
+        if probe.sock is not None:
+            self._selector.unregister(probe.sock)
+            probe.sock.close()
+            probe.sock = None
+        self._active.discard(probe)
+    
+    @staticmethod
+    def _open_probe_socket() -> socket.socket:
+        """
+        创建用于就绪探测的非阻塞 TCP socket
+        
+        Returns:
+            socket.socket: 非阻塞 socket（支持时设置 TCP_USER_TIMEOUT，半开连接快速失败）
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        if hasattr(socket, 'TCP_USER_TIMEOUT'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, 3000)
+        return sock
+
 
 class SecurityManager:
     """
@@ -37,30 +457,56 @@ class SecurityManager:
                 - vpn_network: VPN 网络 (默认 10.0.0.0/24)
                 - wireguard_port: WireGuard 端口 (默认 51820)
                 - log_dropped: 是否记录被拒绝的流量 (默认 False)
+                - lazy_rules: 是否按需加载规则文件 (默认 False，初始化时预加载全部规则)
+                - ssh_control_master: 实例就绪后是否预先建立 SSH 主连接 (默认 True)
         """
         self.config = config
         self.logger = get_logger(__name__)
-        self.ansible_manager = AnsibleManager(config)
         self.playbook_dir = Path(__file__).parent.parent / 'ansible' / 'playbooks'
+        # playbook 完整路径（只构建一次）
+        self._pb = {name: str(self.playbook_dir / rel) for name, rel in SECURITY_PLAYBOOKS.items()}
         
-        # 验证配置
-        self._validate_config()
+        # 验证配置（只检查必需字段；SSH 密钥文件在首次需要 Ansible 时检查）
+        self._validate_required_fields()
+        
+        # 预先建立的 SSH 主连接（ControlPath, 端口），见 _open_control_master
+        self._ssh_cp: Optional[tuple] = None
+        
+        # 预加载全部规则文件（只读），只需要单个规则集的调用方可设置 lazy_rules
+        self._rules_cache: Optional[MappingProxyType] = None
+        if not config.get('lazy_rules', False):
+            self._rules_cache = self._preload_rules()
+    
+    @cached_property
+    def ansible_manager(self) -> AnsibleManager:
+        """
+        Ansible 管理器（首次使用时创建，并检查 SSH 密钥文件）
+        
+        只加载规则或查询状态的调用方不会创建 AnsibleManager。
+        
+        Raises:
+            FileNotFoundError: SSH 密钥文件不存在
+        """
+        self._validate_ssh_key_exists()
+        return AnsibleManager(self.config)
     
-    def _validate_config(self):
+    def _validate_required_fields(self):
         """验证配置是否包含所有必需的字段"""
         required_fields = ['instance_ip', 'ssh_user', 'ssh_key_path']
         missing_fields = [field for field in required_fields if field not in self.config]
         
         if missing_fields:
             raise ValueError(f"安全配置中缺少必需字段: {', '.join(missing_fields)}")
-        
-        # 验证 SSH 密钥文件存在
+    
+    def _validate_ssh_key_exists(self):
+        """验证 SSH 密钥文件存在"""
         ssh_key_path = Path(self.config['ssh_key_path'])
         if not ssh_key_path.exists():
             raise FileNotFoundError(f"SSH 密钥文件不存在: {ssh_key_path}")
     
     # ===== 核心方法 =====
     
+    @_invalidates_verify_cache
     def setup_initial_security(self) -> bool:
         """
         实例创建后的初始安全配置
@@ -79,25 +525,26 @@ class SecurityManager:
             
             # 1. 等待实例就绪
             if not self._wait_for_instance_ready():
-                raise Exception("实例启动超时")
+                raise RuntimeError("实例启动超时")
             
             # 2. 运行初始安全 playbook
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'security' / '01_initial_security.yml'),
-                inventory=self._create_inventory(),
-                extra_vars=self._get_base_vars()
+                playbook=self._pb['initial'],
+                inventory=self._inventory,
+                extra_vars=self._base_vars
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"初始安全配置失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"初始安全配置失败: {result.get('stderr', 'Unknown error')}")
             
             self.logger.info("初始安全配置完成")
             return True
             
-        except Exception as e:
-            self.logger.error(f"初始安全配置失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("初始安全配置失败: %s", e)
             return False
     
+    @_invalidates_verify_cache
     def setup_firewall(self, rules_profile: str = 'default') -> bool:
         """
         配置 iptables 防火墙
@@ -109,28 +556,16 @@ class SecurityManager:
             bool: 配置是否成功
         """
         try:
-            self.logger.info(f"配置防火墙，使用规则集: {rules_profile}...")
+            self.logger.info("配置防火墙，使用规则集: %s...", rules_profile)
             
-            # 1. 加载规则配置
-            rules_config = self._load_security_rules(rules_profile)
-            
-            # 2. 保护核心配置不被规则文件覆盖
-            base_vars = self._get_base_vars()
-            
-            # 从规则配置中移除核心配置项，防止覆盖实例配置
-            core_config_keys = ['ssh_port', 'wireguard_port', 'vpn_network']
-            for key in core_config_keys:
-                if key in rules_config and key in base_vars:
-                    self.logger.warning(
-                        f"规则文件中的 {key}={rules_config[key]} 被忽略，"
-                        f"使用实例配置中的 {key}={base_vars[key]}"
-                    )
-                    rules_config.pop(key)
+            # 1. 加载规则配置（核心配置项不允许被规则文件覆盖）
+            base_vars = self._base_vars
+            rules_config = self._load_rules_vars(rules_profile, base_vars, FIREWALL_CORE_KEYS)
             
             # 2. 运行防火墙配置 playbook
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'security' / '02_setup_firewall.yml'),
-                inventory=self._create_inventory(),
+                playbook=self._pb['firewall'],
+                inventory=self._inventory,
                 extra_vars={
                     **base_vars,
                     **rules_config
@@ -138,15 +573,16 @@ class SecurityManager:
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"防火墙配置失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"防火墙配置失败: {result.get('stderr', 'Unknown error')}")
             
             self.logger.info("防火墙配置完成")
             return True
             
-        except Exception as e:
-            self.logger.error(f"防火墙配置失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("防火墙配置失败: %s", e)
             return False
     
+    @_invalidates_verify_cache
     def setup_ssh_hardening(self) -> bool:
         """
         SSH 安全加固
@@ -169,27 +605,26 @@ class SecurityManager:
             current_port = self.config.get('ssh_port', 22)
             target_port = self.config.get('new_ssh_port', self.config.get('ssh_port', 6677))
             
-            self.logger.info(f"SSH 端口将改为: {current_port} → {target_port}")
+            self.logger.info("SSH 端口将改为: %s → %s", current_port, target_port)
             
             # ⚡ 关键：如果SSH端口要改变，先更新防火墙规则以开放新端口
             if current_port != target_port:
-                self.logger.info(f"更新防火墙规则以开放新SSH端口 {target_port}...")
+                self.logger.info("更新防火墙规则以开放新SSH端口 %s...", target_port)
                 
                 # 加载当前的防火墙规则profile
                 rules_profile = self.config.get('firewall_rules_profile', 'default')
                 rules_config = self._load_security_rules(rules_profile)
                 
                 # 准备防火墙配置的 extra_vars，使用目标端口
-                base_vars = self._get_base_vars()
-                base_vars['ssh_port'] = target_port  # 使用目标端口生成规则
+                base_vars = {**self._base_vars, 'ssh_port': target_port}  # 使用目标端口生成规则
                 
                 # 从规则配置中移除核心配置项，防止覆盖
                 core_config_keys = ['ssh_port', 'wireguard_port', 'vpn_network']
                 for key in core_config_keys:
                     if key in rules_config and key in base_vars:
                         self.logger.warning(
-                            f"规则文件中的 {key}={rules_config[key]} 被忽略，"
-                            f"使用实例配置中的 {key}={base_vars[key]}"
+                            "规则文件中的 %s=%s 被忽略，使用实例配置中的 %s=%s",
+                            key, rules_config[key], key, base_vars[key]
                         )
                         rules_config.pop(key)
                 
@@ -211,7 +646,7 @@ class SecurityManager:
                 
                 # 直接运行防火墙 playbook，不调用 setup_firewall()
                 result = self.ansible_manager.run_playbook(
-                    playbook=str(self.playbook_dir / 'security' / '02_setup_firewall.yml'),
+                    playbook=self._pb['firewall'],
                     inventory=inventory,
                     extra_vars={
                         **base_vars,
@@ -220,13 +655,12 @@ class SecurityManager:
                 )
                 
                 if result.get('rc', 1) != 0:
-                    raise Exception("更新防火墙规则失败，取消SSH端口修改以保持安全")
+                    raise RuntimeError("更新防火墙规则失败，取消SSH端口修改以保持安全")
                 
-                self.logger.info(f"✓ 防火墙已更新，端口 {target_port} 已开放")
+                self.logger.info("✓ 防火墙已更新，端口 %s 已开放", target_port)
             
             # 准备SSH加固的变量
-            vars_dict = self._get_base_vars()
-            vars_dict['ssh_port'] = target_port
+            vars_dict = {**self._base_vars, 'ssh_port': target_port}
             
             # 创建自定义 inventory，使用当前端口连接（SSH 还未切换）
             inventory = {
@@ -245,21 +679,22 @@ class SecurityManager:
             }
             
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'security' / '03_ssh_hardening.yml'),
+                playbook=self._pb['ssh'],
                 inventory=inventory,
                 extra_vars=vars_dict
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"SSH 加固失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"SSH 加固失败: {result.get('stderr', 'Unknown error')}")
             
             self.logger.info("SSH 安全加固完成")
             return True
             
-        except Exception as e:
-            self.logger.error(f"SSH 加固失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("SSH 加固失败: %s", e)
             return False
     
+    @_invalidates_verify_cache
     def install_fail2ban(self) -> bool:
         """
         安装并配置 fail2ban 入侵防护
@@ -271,21 +706,168 @@ class SecurityManager:
             self.logger.info("安装 fail2ban...")
             
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'security' / '04_install_fail2ban.yml'),
-                inventory=self._create_inventory(),
-                extra_vars=self._get_base_vars()
+                playbook=self._pb['fail2ban'],
+                inventory=self._inventory,
+                extra_vars=self._base_vars
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"fail2ban 安装失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"fail2ban 安装失败: {result.get('stderr', 'Unknown error')}")
             
             self.logger.info("fail2ban 安装完成")
             return True
             
-        except Exception as e:
-            self.logger.error(f"fail2ban 安装失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("fail2ban 安装失败: %s", e)
+            return False
+    
+    def setup_all_security(self, rules_profile: str = 'default') -> bool:
+        """
+        执行完整的安全配置流程
+        
+        初始安全配置（含等待实例就绪）完成后，防火墙、fail2ban 与安全验证
+        通过 security/all.yml 在一次 playbook 执行中按顺序运行。
+        防火墙必须先于 fail2ban：02_setup_firewall.yml 通过 iptables-restore
+        重写 filter 表，会删除 fail2ban 创建的 f2b-* 链，且两者都会使用 apt。
+        
+        Args:
+            rules_profile: 防火墙规则配置文件名
+        
+        Returns:
+            bool: 全部步骤是否成功
+        """
+        if not self.setup_initial_security():
+            self.logger.error("初始安全配置失败，终止后续安全配置")
+            return False
+        
+        return self.run_security_phases(
+            ['firewall', 'fail2ban', 'verify'],
+            rules_profile=rules_profile
+        )
+    
+    @_invalidates_verify_cache
+    def run_security_phases(self, phases: List[str], extra_vars: Optional[Dict] = None,
+                            rules_profile: str = 'default') -> bool:
+        """
+        在一次 ansible-playbook 执行中运行多个安全阶段
+        
+        通过 security/all.yml 按标签选择阶段，SSH 连接与事实收集只需一次。
+        阶段按 all.yml 中的顺序执行（firewall 先于 fail2ban）。
+        
+        Args:
+            phases: 阶段标签列表（见 SECURITY_PHASES）
+            extra_vars: 追加的 Ansible 变量（覆盖基础变量）；
+                包含 service 阶段时必须提供 service_type
+            rules_profile: firewall 阶段使用的规则配置文件名
+        
+        Returns:
+            bool: 执行是否成功
+        """
+        self._check_phases(phases)
+        
+        try:
+            self.logger.info("运行安全阶段: %s...", ', '.join(phases))
+            
+            result = self._run_tagged(phases, self._phase_vars(phases, extra_vars, rules_profile))
+            
+            if result.get('rc', 1) != 0:
+                raise RuntimeError(f"安全阶段执行失败: {result.get('stderr', 'Unknown error')}")
+            
+            self.logger.info("安全阶段执行完成")
+            return True
+            
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("安全阶段执行失败: %s", e)
+            return False
+    
+    # ===== 异步方法（多个实例可在同一事件循环中并发配置） =====
+    
+    @_invalidates_verify_cache
+    async def setup_initial_security_async(self) -> bool:
+        """
+        setup_initial_security 的异步版本
+        
+        Returns:
+            bool: 配置是否成功
+        """
+        try:
+            self.logger.info("开始初始安全配置...")
+            
+            if not await self._wait_for_instance_ready_async():
+                raise RuntimeError("实例启动超时")
+            
+            result = await self.ansible_manager.run_playbook_async(
+                playbook=self._pb['initial'],
+                inventory=self._inventory,
+                extra_vars=self._base_vars
+            )
+            
+            if result.get('rc', 1) != 0:
+                raise RuntimeError(f"初始安全配置失败: {result.get('stderr', 'Unknown error')}")
+            
+            self.logger.info("初始安全配置完成")
+            return True
+            
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("初始安全配置失败: %s", e)
             return False
     
+    @_invalidates_verify_cache
+    async def run_security_phases_async(self, phases: List[str], extra_vars: Optional[Dict] = None,
+                                        rules_profile: str = 'default') -> bool:
+        """
+        run_security_phases 的异步版本
+        
+        Args:
+            phases: 阶段标签列表（见 SECURITY_PHASES）
+            extra_vars: 追加的 Ansible 变量（覆盖基础变量）
+            rules_profile: firewall 阶段使用的规则配置文件名
+        
+        Returns:
+            bool: 执行是否成功
+        """
+        self._check_phases(phases)
+        
+        try:
+            self.logger.info("运行安全阶段: %s...", ', '.join(phases))
+            
+            result = await self.ansible_manager.run_playbook_async(
+                playbook=self._pb['all'],
+                inventory=self._inventory,
+                extra_vars={**self._base_vars, **self._phase_vars(phases, extra_vars, rules_profile)},
+                tags=list(phases)
+            )
+            
+            if result.get('rc', 1) != 0:
+                raise RuntimeError(f"安全阶段执行失败: {result.get('stderr', 'Unknown error')}")
+            
+            self.logger.info("安全阶段执行完成")
+            return True
+            
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("安全阶段执行失败: %s", e)
+            return False
+    
+    async def setup_all_security_async(self, rules_profile: str = 'default') -> bool:
+        """
+        setup_all_security 的异步版本
+        
+        Args:
+            rules_profile: 防火墙规则配置文件名
+        
+        Returns:
+            bool: 全部步骤是否成功
+        """
+        if not await self.setup_initial_security_async():
+            self.logger.error("初始安全配置失败，终止后续安全配置")
+            return False
+        
+        return await self.run_security_phases_async(
+            ['firewall', 'fail2ban', 'verify'],
+            rules_profile=rules_profile
+        )
+    
+    @_invalidates_verify_cache
     def setup_tailscale(self, auth_key: str,
                        advertise_routes: Optional[str] = None,
                        accept_routes: bool = True) -> bool:
@@ -303,11 +885,11 @@ class SecurityManager:
         try:
             # 日志中隐藏认证密钥敏感信息
             masked_key = auth_key[:15] + "***" if len(auth_key) > 15 else "***"
-            self.logger.info(f"安装 Tailscale VPN (key: {masked_key})...")
+            self.logger.info("安装 Tailscale VPN (key: %s)...", masked_key)
             
             # 构建 extra_vars
             extra_vars = {
-                **self._get_base_vars(),
+                **self._base_vars,
                 'tailscale_auth_key': auth_key,
                 'tailscale_accept_routes': accept_routes
             }
@@ -317,21 +899,22 @@ class SecurityManager:
             
             # 运行 Tailscale playbook
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'common' / 'setup_tailscale.yml'),
-                inventory=self._create_inventory(),
+                playbook=self._pb['setup_tailscale'],
+                inventory=self._inventory,
                 extra_vars=extra_vars
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"Tailscale 安装失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"Tailscale 安装失败: {result.get('stderr', 'Unknown error')}")
             
             self.logger.info("Tailscale VPN 安装完成")
             return True
             
-        except Exception as e:
-            self.logger.error(f"Tailscale 安装失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("Tailscale 安装失败: %s", e)
             return False
     
+    @_invalidates_verify_cache
     def adjust_firewall_for_tailscale(self) -> bool:
         """
         Tailscale 部署后调整防火墙
@@ -348,27 +931,28 @@ class SecurityManager:
             
             # 添加 Tailscale 特定参数
             extra_vars = {
-                **self._get_base_vars(),
+                **self._base_vars,
                 'tailscale_network': '100.64.0.0/10',  # Tailscale CGNAT 网络范围
                 'tailscale_interface': 'tailscale0'
             }
             
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'security' / '07_adjust_for_tailscale.yml'),
-                inventory=self._create_inventory(),
+                playbook=self._pb['tailscale'],
+                inventory=self._inventory,
                 extra_vars=extra_vars
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"Tailscale 防火墙调整失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"Tailscale 防火墙调整失败: {result.get('stderr', 'Unknown error')}")
             
             self.logger.info("Tailscale 防火墙调整完成")
             return True
             
-        except Exception as e:
-            self.logger.error(f"Tailscale 防火墙调整失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("Tailscale 防火墙调整失败: %s", e)
             return False
 
+    @_invalidates_verify_cache
     def setup_tailscale(
         self,
         auth_key: str,
@@ -390,7 +974,7 @@ class SecurityManager:
             self.logger.info("安装并配置 Tailscale VPN...")
             
             extra_vars = {
-                **self._get_base_vars(),
+                **self._base_vars,
                 'tailscale_auth_key': auth_key,
                 'tailscale_accept_routes': accept_routes
             }
@@ -399,21 +983,22 @@ class SecurityManager:
                 extra_vars['tailscale_advertise_routes'] = advertise_routes
             
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'common' / 'setup_tailscale.yml'),
-                inventory=self._create_inventory(),
+                playbook=self._pb['setup_tailscale'],
+                inventory=self._inventory,
                 extra_vars=extra_vars
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"Tailscale 安装失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"Tailscale 安装失败: {result.get('stderr', 'Unknown error')}")
             
             self.logger.info("Tailscale VPN 配置完成")
             return True
             
-        except Exception as e:
-            self.logger.error(f"Tailscale 安装失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("Tailscale 安装失败: %s", e)
             return False
     
+    @_invalidates_verify_cache
     def adjust_firewall_for_vpn(self) -> bool:
         """
         VPN 部署后调整防火墙
@@ -430,21 +1015,22 @@ class SecurityManager:
             self.logger.info("调整防火墙以支持 VPN...")
             
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'security' / '05_adjust_for_vpn.yml'),
-                inventory=self._create_inventory(),
-                extra_vars=self._get_base_vars()
+                playbook=self._pb['vpn'],
+                inventory=self._inventory,
+                extra_vars=self._base_vars
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"VPN 防火墙调整失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"VPN 防火墙调整失败: {result.get('stderr', 'Unknown error')}")
             
             self.logger.info("VPN 防火墙调整完成")
             return True
             
-        except Exception as e:
-            self.logger.error(f"VPN 防火墙调整失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("VPN 防火墙调整失败: %s", e)
             return False
     
+    @_invalidates_verify_cache
     def adjust_firewall_for_service(self, service_type: str) -> bool:
         """
         服务部署后调整防火墙
@@ -456,27 +1042,27 @@ class SecurityManager:
             bool: 调整是否成功
         """
         try:
-            self.logger.info(f"调整防火墙以支持服务: {service_type}...")
+            self.logger.info("调整防火墙以支持服务: %s...", service_type)
             
             # 加载服务特定的规则
             service_rules = self._load_security_rules(f"{service_type}_rules")
             
             # 保护核心配置不被服务规则覆盖
-            base_vars = self._get_base_vars()
+            base_vars = self._base_vars
             
             # 从服务规则中移除核心配置项，防止覆盖
             core_config_keys = ['ssh_port', 'wireguard_port']
             for key in core_config_keys:
                 if key in service_rules and key in base_vars:
                     self.logger.warning(
-                        f"服务规则中的 {key}={service_rules[key]} 被忽略，"
-                        f"使用实例配置中的 {key}={base_vars[key]}"
+                        "服务规则中的 %s=%s 被忽略，使用实例配置中的 %s=%s",
+                        key, service_rules[key], key, base_vars[key]
                     )
                     service_rules.pop(key)
             
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'security' / '06_adjust_for_service.yml'),
-                inventory=self._create_inventory(),
+                playbook=self._pb['service'],
+                inventory=self._inventory,
                 extra_vars={
                     **base_vars,
                     'service_type': service_type,
@@ -485,16 +1071,16 @@ class SecurityManager:
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"服务防火墙调整失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"服务防火墙调整失败: {result.get('stderr', 'Unknown error')}")
             
-            self.logger.info(f"服务 {service_type} 防火墙调整完成")
+            self.logger.info("服务 %s 防火墙调整完成", service_type)
             return True
             
-        except Exception as e:
-            self.logger.error(f"服务防火墙调整失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("服务防火墙调整失败: %s", e)
             return False
     
-    def verify_security(self) -> Dict[str, Any]:
+    def verify_security(self, force: bool = False) -> Dict[str, Any]:
         """
         验证安全配置
         
@@ -505,29 +1091,44 @@ class SecurityManager:
         4. 系统安全参数
         5. fail2ban 状态
         
+        配置状态（inventory、基础变量、防火墙规则）与最近一次成功验证相同且
+        未超过 VERIFY_CACHE_TTL 时，直接返回缓存的验证结果。
+        
+        Args:
+            force: 忽略缓存，强制运行验证 playbook
+        
         Returns:
             Dict: 验证结果
         """
         try:
             self.logger.info("验证安全配置...")
             
+            state_hash = self._state_hash()
+            if not force:
+                cached = self._load_verify_cache(state_hash)
+                if cached is not None:
+                    self.logger.info("配置未变化，使用最近一次验证结果")
+                    return cached
+            
             result = self.ansible_manager.run_playbook(
-                playbook=str(self.playbook_dir / 'security' / '99_verify_security.yml'),
-                inventory=self._create_inventory(),
-                extra_vars=self._get_base_vars()
+                playbook=self._pb['verify'],
+                inventory=self._inventory,
+                extra_vars=self._base_vars
             )
             
             if result.get('rc', 1) != 0:
-                raise Exception(f"安全验证失败: {result.get('stderr', 'Unknown error')}")
+                raise RuntimeError(f"安全验证失败: {result.get('stderr', 'Unknown error')}")
             
             # 解析验证结果
             verification_results = self._parse_verification_results(result)
+            if verification_results.get('success'):
+                self._save_verify_cache(state_hash, verification_results)
             
             self.logger.info("安全配置验证完成")
             return verification_results
             
-        except Exception as e:
-            self.logger.error(f"安全验证失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("安全验证失败: %s", e)
             return {'success': False, 'error': str(e)}
     
     def get_security_status(self) -> Dict[str, Any]:
@@ -540,18 +1141,16 @@ class SecurityManager:
         try:
             self.logger.info("获取安全状态...")
             
-            # 实现安全状态查询
-            # 返回防火墙规则、SSH 配置、fail2ban 状态等
+            # 防火墙规则、SSH 配置、fail2ban 状态与开放端口在一次 SSH 会话中查询
+            sections = self._collect_status_bundle()
             
             return {
-                'firewall': self._get_firewall_status(),
-                'ssh': self._get_ssh_status(),
-                'fail2ban': self._get_fail2ban_status(),
-                'open_ports': self._get_open_ports()
+                name: _STATUS_PARSERS[name](output)
+                for name, output in sections.items()
             }
             
-        except Exception as e:
-            self.logger.error(f"获取安全状态失败: {str(e)}")
+        except _EXPECTED_ERRORS as e:
+            self.logger.error("获取安全状态失败: %s", e)
             return {'success': False, 'error': str(e)}
     
     # ===== 辅助方法 =====
@@ -560,6 +1159,10 @@ class SecurityManager:
         """
         等待实例就绪
         
+        端口可连接且返回 SSH 版本标识（SSH-）才视为就绪。探测由进程内共享的
+        ReadinessReactor 执行，多个实例同时等待时只占用一个后台线程。
+        就绪后预先建立 SSH 主连接，后续 playbook 直接复用。
+        
         Args:
             timeout: 超时时间（秒）
             port: SSH 端口
@@ -568,34 +1171,224 @@ class SecurityManager:
             bool: 实例是否就绪
         """
         instance_ip = self.config['instance_ip']
-        start_time = time.time()
+        self.logger.info("等待实例 %s 就绪 (端口 %s)...", instance_ip, port)
+        reactor = ReadinessReactor.default()
+        ready = reactor.result(reactor.wait(instance_ip, port, timeout), timeout)
+        return self._on_instance_probed(ready, port)
+    
+    def _on_instance_probed(self, ready: bool, port: int) -> bool:
+        """
+        处理就绪探测结果：就绪时预先建立 SSH 主连接
         
-        self.logger.info(f"等待实例 {instance_ip} 就绪 (端口 {port})...")
+        Args:
+            ready: 实例是否就绪
+            port: SSH 端口
+            
+        Returns:
+            bool: 实例是否就绪
+        """
+        instance_ip = self.config['instance_ip']
+        if not ready:
+            self.logger.error("实例 %s 启动超时", instance_ip)
+            return False
+        self.logger.info("实例 %s 已就绪", instance_ip)
+        self._open_control_master(port)
+        return True
+    
+    def _open_control_master(self, port: int) -> bool:
+        """
+        在后台建立 SSH 主连接（ControlMaster），首个 playbook 任务无需再次握手
+        
+        可通过配置 ssh_control_master: false 关闭。进程退出时关闭主连接。
+        
+        Args:
+            port: SSH 端口
+            
+        Returns:
+            bool: 是否已启动主连接进程
+        """
+        if not self.config.get('ssh_control_master', True) or self._ssh_cp is not None:
+            return False
         
-        while time.time() - start_time < timeout:
+        target = f"{self.config['ssh_user']}@{self.config['instance_ip']}"
+        try:
+            Path(CONTROL_PATH).parent.mkdir(parents=True, exist_ok=True)
+            subprocess.Popen(
+                [
+                    'ssh', '-M', '-N', '-f',
+                    '-o', f'ControlPath={CONTROL_PATH}',
+                    '-o', 'ControlPersist=600s',
+                    '-o', 'StrictHostKeyChecking=no',
+                    '-o', 'UserKnownHostsFile=/dev/null',
+                    '-o', 'BatchMode=yes',
+                    '-i', self.config['ssh_key_path'],
+                    '-p', str(port),
+                    target
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            self.logger.warning("建立 SSH 主连接失败: %s", e)
+            return False
+        
+        self._ssh_cp = (CONTROL_PATH, port)
+        atexit.register(self._close_control_master)
+        return True
+    
+    def _close_control_master(self):
+        """关闭预先建立的 SSH 主连接"""
+        if self._ssh_cp is None:
+            return
+        control_path, port = self._ssh_cp
+        self._ssh_cp = None
+        try:
+            subprocess.run(
+                ['ssh', '-O', 'exit', '-o', f'ControlPath={control_path}', '-p', str(port),
+                 f"{self.config['ssh_user']}@{self.config['instance_ip']}"],
+                capture_output=True,
+                timeout=10
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            self.logger.debug("关闭 SSH 主连接失败: %s", e)
+    
+    async def _wait_for_instance_ready_async(self, timeout: int = 300, port: int = 22) -> bool:
+        """
+        _wait_for_instance_ready 的异步版本
+        
+        Args:
+            timeout: 超时时间（秒）
+            port: SSH 端口
+            
+        Returns:
+            bool: 实例是否就绪
+        """
+        instance_ip = self.config['instance_ip']
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        
+        self.logger.info("等待实例 %s 就绪 (端口 %s)...", instance_ip, port)
+        
+        while True:
             try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(5)
-                result = sock.connect_ex((instance_ip, port))
-                sock.close()
-                
-                if result == 0:
-                    self.logger.info(f"实例 {instance_ip} 已就绪")
-                    # 额外等待 10 秒确保 SSH 服务完全启动
-                    time.sleep(10)
-                    return True
-                    
-            except Exception as e:
-                self.logger.debug(f"连接测试失败: {str(e)}")
-            
-            time.sleep(5)
-        
-        self.logger.error(f"实例 {instance_ip} 启动超时")
+                probe_timeout = max(min(2, deadline - time.monotonic()), 0.1)
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(instance_ip, port), probe_timeout
+                )
+                try:
+                    if await asyncio.wait_for(reader.read(4), probe_timeout) == b'SSH-':
+                        self.logger.info("实例 %s 已就绪", instance_ip)
+                        self._open_control_master(port)
+                        return True
+                    self.logger.debug("端口已开放，SSH 服务尚未就绪")
+                finally:
+                    writer.close()
+            except (OSError, asyncio.TimeoutError) as e:
+                self.logger.debug("连接测试失败: %s", e)
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(0.5 * 2 ** attempt, 4, remaining))
+            attempt += 1
+        
+        self.logger.error("实例 %s 启动超时", instance_ip)
         return False
     
-    def _create_inventory(self) -> Dict:
+    @staticmethod
+    def _check_phases(phases: List[str]):
         """
-        创建 Ansible inventory
+        检查安全阶段列表
+        
+        Args:
+            phases: 阶段标签列表
+            
+        Raises:
+            ValueError: 未知阶段，或 firewall 与 service 同时出现
+        """
+        unknown = [phase for phase in phases if phase not in SECURITY_PHASES]
+        if unknown:
+            raise ValueError(f"未知的安全阶段: {', '.join(unknown)}")
+        if 'firewall' in phases and 'service' in phases:
+            # 两个阶段的规则变量同名（如 public_ports），同一次执行中会互相覆盖
+            raise ValueError("firewall 与 service 阶段需要不同的规则，不能在同一次执行中运行")
+    
+    def _phase_vars(self, phases: List[str], extra_vars: Optional[Dict],
+                    rules_profile: str) -> Dict:
+        """
+        加载各阶段需要的规则配置，并与追加变量合并
+        
+        Args:
+            phases: 阶段标签列表
+            extra_vars: 追加的 Ansible 变量；包含 service 阶段时必须提供 service_type
+            rules_profile: firewall 阶段使用的规则配置文件名
+            
+        Returns:
+            Dict: 阶段变量（不含基础变量）
+        """
+        base_vars = self._base_vars
+        phase_vars = dict(extra_vars or {})
+        
+        if 'firewall' in phases:
+            phase_vars = {
+                **self._load_rules_vars(rules_profile, base_vars, FIREWALL_CORE_KEYS),
+                **phase_vars
+            }
+        if 'service' in phases:
+            service_type = phase_vars.get('service_type')
+            if not service_type:
+                raise ValueError("service 阶段需要在 extra_vars 中提供 service_type")
+            phase_vars = {
+                **self._load_rules_vars(f"{service_type}_rules", base_vars, SERVICE_CORE_KEYS),
+                **phase_vars
+            }
+        return phase_vars
+    
+    def _load_rules_vars(self, profile: str, base_vars: Dict, core_keys: tuple) -> Dict:
+        """
+        加载规则配置，并移除不允许覆盖实例配置的核心配置项
+        
+        Args:
+            profile: 规则配置文件名
+            base_vars: 实例基础变量
+            core_keys: 以实例配置为准的配置项
+            
+        Returns:
+            Dict: 可合并到 extra_vars 的规则变量
+        """
+        rules_config = self._load_security_rules(profile)
+        for key in core_keys:
+            if key in rules_config and key in base_vars:
+                self.logger.warning(
+                    "规则文件中的 %s=%s 被忽略，使用实例配置中的 %s=%s",
+                    key, rules_config[key], key, base_vars[key]
+                )
+                rules_config.pop(key)
+        return rules_config
+    
+    def _run_tagged(self, tags: List[str], extra_vars: Optional[Dict] = None) -> Dict:
+        """
+        使用合并 playbook 按标签执行安全阶段
+        
+        Args:
+            tags: 要执行的阶段标签
+            extra_vars: 追加的 Ansible 变量
+            
+        Returns:
+            Dict: Ansible 执行结果
+        """
+        return self.ansible_manager.run_playbook(
+            playbook=self._pb['all'],
+            inventory=self._inventory,
+            extra_vars={**self._base_vars, **(extra_vars or {})},
+            tags=list(tags)
+        )
+    
+    @cached_property
+    def _inventory(self) -> Dict:
+        """
+        Ansible inventory（实例生命周期内不变，只构建一次，调用方不应修改）
         
         Returns:
             Dict: Ansible inventory 数据
@@ -609,16 +1402,25 @@ class SecurityManager:
                         'ansible_ssh_private_key_file': self.config['ssh_key_path'],
                         'ansible_port': self.config.get('ssh_port', 22),
                         'ansible_python_interpreter': '/usr/bin/python3',
-                        'ansible_ssh_common_args': '-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null',  # ⚡ 跳过host key检查
-                        'ansible_ssh_common_args': '-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null'
+                        'ansible_ssh_common_args': '-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null'  # ⚡ 跳过host key检查
                     }
                 }
             }
         }
     
-    def _get_base_vars(self) -> Dict:
+    def _create_inventory(self) -> Dict:
         """
-        获取基础变量
+        创建 Ansible inventory
+        
+        Returns:
+            Dict: Ansible inventory 数据（共享的缓存对象）
+        """
+        return self._inventory
+    
+    @cached_property
+    def _base_vars(self) -> Dict:
+        """
+        基础 Ansible 变量（只构建一次，调用方不应修改，需要修改时先复制）
         
         Returns:
             Dict: 基础 Ansible 变量
@@ -630,6 +1432,48 @@ class SecurityManager:
             'log_dropped': self.config.get('log_dropped', False)
         }
     
+    def _get_base_vars(self) -> Dict:
+        """
+        获取基础变量
+        
+        Returns:
+            Dict: 基础 Ansible 变量（副本，调用方可以修改）
+        """
+        return dict(self._base_vars)
+    
+    def _resolve_rules_path(self, profile: str) -> Path:
+        """
+        查找规则配置文件路径
+        
+        Args:
+            profile: 规则配置文件名（不含 .yml 扩展名）
+            
+        Returns:
+            Path: 规则配置文件路径
+        """
+        table = _scan_rules_dir()
+        for name in _rules_candidates(profile):
+            if name in table:
+                return table[name]
+        
+        raise FileNotFoundError(f"规则配置文件不存在: {RULES_DIR / (profile.replace('-', '_') + '.yml')}")
+    
+    def _preload_rules(self) -> Optional[MappingProxyType]:
+        """
+        预加载规则目录下的全部规则文件
+        
+        Returns:
+            MappingProxyType: {文件名（不含扩展名）: 规则配置}；加载失败时返回 None（回退为按需加载）
+        """
+        try:
+            return MappingProxyType({
+                stem: _load_yaml_cached(str(path), path.stat().st_mtime_ns)
+                for stem, path in _scan_rules_dir().items()
+            })
+        except (OSError, yaml.YAMLError) as e:
+            self.logger.warning("预加载安全规则失败，改为按需加载: %s", e)
+            return None
+    
     def _load_security_rules(self, profile: str) -> Dict:
         """
         加载安全规则配置
@@ -638,106 +1482,261 @@ class SecurityManager:
             profile: 规则配置文件名（不含 .yml 扩展名）
             
         Returns:
-            Dict: 安全规则配置
-        """
-        # 规范化文件名，兼容 data-collector 与 data_collector 两种命名
-        profile_slug = profile.replace('-', '_')
-        
-        # 尝试不同的文件名格式
-        config_base = Path(__file__).parent.parent / 'config' / 'security'
-        
-        # 尝试 profile.yml
-        config_path = config_base / f'{profile_slug}.yml'
-        if config_path.exists():
-            pass  # 使用这个路径
-        # 尝试 profile_rules.yml
-        elif (config_base / f'{profile_slug}_rules.yml').exists():
-            config_path = config_base / f'{profile_slug}_rules.yml'
-        # 如果 profile 已经包含 _rules，尝试不带 _rules 的
-        elif profile_slug.endswith('_rules'):
-            base_profile = profile_slug.replace('_rules', '')
-            if (config_base / f'{base_profile}.yml').exists():
-                config_path = config_base / f'{base_profile}.yml'
-            else:
-                raise FileNotFoundError(f"规则配置文件不存在: {config_path}")
-        else:
-            raise FileNotFoundError(f"规则配置文件不存在: {config_path}")
+            Dict: 安全规则配置（副本，调用方可以修改）
+        """
+        if self._rules_cache is not None:
+            for name in _rules_candidates(profile):
+                if name in self._rules_cache:
+                    return dict(self._rules_cache[name])
+        
+        config_path = self._resolve_rules_path(profile)
+        rules = _load_yaml_cached(str(config_path), config_path.stat().st_mtime_ns)
+        return dict(rules)
+    
+    def _state_hash(self) -> str:
+        """
+        计算当前安全配置状态的哈希（inventory、基础变量、防火墙规则）
         
-        with open(config_path, 'r') as f:
-            return yaml.safe_load(f) or {}
+        Returns:
+            str: 状态哈希
+        """
+        try:
+            rules = self._load_security_rules(self.config.get('firewall_rules_profile', 'default'))
+        except FileNotFoundError:
+            rules = None
+        state = json.dumps([self._inventory, self._base_vars, rules], sort_keys=True, default=str)
+        return hashlib.blake2b(state.encode()).hexdigest()
+    
+    def _verify_cache_path(self) -> Path:
+        """验证结果缓存文件路径"""
+        return VERIFY_CACHE_DIR / f"{self.config['instance_ip']}.ok"
+    
+    def _invalidate_verify_cache(self):
+        """删除验证结果缓存（安全配置被修改后调用）"""
+        try:
+            self._verify_cache_path().unlink(missing_ok=True)
+        except OSError as e:
+            self.logger.warning("删除验证结果缓存失败: %s", e)
+    
+    def _load_verify_cache(self, state_hash: str) -> Optional[Dict]:
+        """
+        读取与当前状态匹配且未过期的验证结果
+        
+        Args:
+            state_hash: 当前状态哈希
+            
+        Returns:
+            Optional[Dict]: 缓存的验证结果；无可用缓存时返回 None
+        """
+        cache_path = self._verify_cache_path()
+        try:
+            if time.time() - cache_path.stat().st_mtime >= VERIFY_CACHE_TTL:
+                return None
+            cached = json.loads(cache_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if cached.get('hash') != state_hash:
+            return None
+        return cached.get('results')
+    
+    def _save_verify_cache(self, state_hash: str, results: Dict):
+        """
+        原子写入成功的验证结果
+        
+        Args:
+            state_hash: 当前状态哈希
+            results: 验证结果
+        """
+        cache_path = self._verify_cache_path()
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps({'hash': state_hash, 'results': results}))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            self.logger.warning("写入验证结果缓存失败: %s", e)
     
     def _parse_verification_results(self, result: Dict) -> Dict:
         """
         解析验证结果
         
+        从 ansible-runner 的结构化任务结果中读取 99_verify_security.yml 
+        生成的 security_status，不再解析 stdout。
+        
         Args:
             result: Ansible playbook 执行结果
             
         Returns:
-            Dict: 解析后的验证结果
+            Dict: 解析后的验证结果（hosts 为各主机的 security_status）
         """
-        # 实现结果解析逻辑
-        # 从 Ansible 输出中提取关键信息
+        hosts = {
+            task['host']: task['res']['security_status']
+            for task in result.get('task_results', [])
+            if task.get('event') == 'runner_on_ok' and 'security_status' in task.get('res', {})
+        }
+        success = result.get('rc', 1) == 0
+        
+        if not hosts:
+            # 没有结构化结果（如异步执行），仅依据返回码
+            return {
+                'success': success,
+                'firewall': 'configured',
+                'ssh': 'hardened',
+                'fail2ban': 'active'
+            }
+        
+        summaries = [status.get('summary', {}) for status in hosts.values()]
+        
+        def passed(key: str) -> bool:
+            return all(summary.get(key) == 'PASS' for summary in summaries)
+        
         return {
-            'success': result.get('rc', 1) == 0,
-            'firewall': 'configured',
-            'ssh': 'hardened',
-            'fail2ban': 'active'
+            'success': success and passed('overall_status'),
+            'firewall': 'configured' if passed('firewall_status') else 'failed',
+            'ssh': 'hardened' if passed('ssh_status') else 'failed',
+            'fail2ban': 'active' if passed('fail2ban_status') else 'failed',
+            'hosts': hosts
         }
     
-    def _get_firewall_status(self) -> Dict:
+    def _collect_status_bundle(self) -> Dict[str, str]:
         """
-        获取防火墙状态
+        通过一次 SSH 执行收集全部安全状态命令的输出
         
         Returns:
-            Dict: 防火墙状态信息
+            Dict[str, str]: {段名: 命令输出}
+            
+        Raises:
+            RuntimeError: SSH 执行失败
         """
-        # 实现防火墙状态查询
-        # 可以通过 SSH 执行 iptables -L 命令
-        return {
-            'status': 'active',
-            'rules_count': 0
-        }
+        separator = f"; echo '{_STATUS_SEPARATOR}'; "
+        remote_cmd = separator.join(cmd for _, cmd in _STATUS_COMMANDS)
+        
+        cmd = [
+            'ssh', '-i', self.config['ssh_key_path'],
+            '-p', str(self.config.get('ssh_port', 22)),
+            '-o', 'StrictHostKeyChecking=no',
+            '-o', 'UserKnownHostsFile=/dev/null',
+            '-o', 'BatchMode=yes',
+            '-o', f'ControlPath={CONTROL_PATH}',
+            f"{self.config['ssh_user']}@{self.config['instance_ip']}",
+            remote_cmd
+        ]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        if result.returncode == 255:
+            raise RuntimeError(f"SSH 连接失败: {result.stderr.strip()}")
+        
+        outputs = result.stdout.split(_STATUS_SEPARATOR + '\n')
+        if len(outputs) != len(_STATUS_COMMANDS):
+            raise RuntimeError("安全状态输出格式异常")
+        
+        return {name: output for (name, _), output in zip(_STATUS_COMMANDS, outputs)}
+
+
+class SecurityManagerBulk(SecurityManager):
+    """
+    批量安全管理器
+    多个实例共用一个 inventory，每个安全阶段只执行一次 playbook，
+    由 Ansible 按 forks 并发到所有主机
+    """
     
-    def _get_ssh_status(self) -> Dict:
+    def __init__(self, configs: List[Dict[str, Any]]):
+        """
+        初始化批量安全管理器
+        
+        Args:
+            configs: 各实例的安全配置字典列表（字段同 SecurityManager）；
+                端口、VPN 网络等基础变量作为 extra_vars 对所有主机生效，必须一致
         """
-        获取 SSH 状态
+        if not configs:
+            raise ValueError("批量安全配置不能为空")
+        
+        super().__init__(configs[0])
+        self.configs = list(configs)
+        
+        # 每个实例一个单主机管理器，用于就绪探测、SSH 加固与状态查询
+        self._hosts = [SecurityManager({**cfg, 'lazy_rules': True}) for cfg in self.configs]
+        
+        ips = [host.config['instance_ip'] for host in self._hosts]
+        if len(set(ips)) != len(ips):
+            raise ValueError(f"批量安全配置中存在重复的实例IP: {', '.join(ips)}")
+        if any(host._base_vars != self._base_vars for host in self._hosts):
+            raise ValueError("批量安全配置中各实例的 ssh_port/wireguard_port/vpn_network/log_dropped 必须一致")
+    
+    def _validate_ssh_key_exists(self):
+        """验证所有实例的 SSH 密钥文件存在"""
+        for host in self._hosts:
+            host._validate_ssh_key_exists()
+    
+    @_invalidates_verify_cache
+    def setup_ssh_hardening(self) -> bool:
+        """
+        SSH 安全加固（逐个实例执行）
+        
+        SSH 加固在切换端口前使用各实例的当前端口连接，不能合并到同一个 inventory。
         
         Returns:
-            Dict: SSH 配置状态
+            bool: 所有实例是否都配置成功
         """
-        # 实现 SSH 状态查询
-        return {
-            'port': self.config.get('ssh_port', 6677),
-            'password_auth': 'disabled',
-            'root_login': 'disabled'
-        }
+        return all([host.setup_ssh_hardening() for host in self._hosts])
     
-    def _get_fail2ban_status(self) -> Dict:
+    def get_security_status(self) -> Dict[str, Any]:
         """
-        获取 fail2ban 状态
+        获取所有实例的安全状态
         
         Returns:
-            Dict: fail2ban 状态信息
+            Dict: {实例IP: 安全状态信息}
         """
-        # 实现 fail2ban 状态查询
-        return {
-            'status': 'unknown',
-            'jails': []
-        }
+        return {host.config['instance_ip']: host.get_security_status() for host in self._hosts}
     
-    def _get_open_ports(self) -> List[Dict]:
+    def _wait_for_instance_ready(self, timeout: int = 300, port: int = 22) -> bool:
         """
-        获取开放端口列表
+        等待所有实例就绪（全部探测提交到同一个 ReadinessReactor）
         
+        Args:
+            timeout: 超时时间（秒）
+            port: SSH 端口
+            
         Returns:
-            List[Dict]: 开放端口信息列表
+            bool: 所有实例是否都已就绪
         """
-        # 实现开放端口查询
-        return [
-            {
-                'port': self.config.get('ssh_port', 6677),
-                'protocol': 'tcp',
-                'description': 'SSH'
-            }
-        ]
+        reactor = ReadinessReactor.default()
+        self.logger.info("等待 %s 个实例就绪 (端口 %s)...", len(self._hosts), port)
+        futures = [reactor.wait(host.config['instance_ip'], port, timeout) for host in self._hosts]
+        results = [host._on_instance_probed(reactor.result(future, timeout), port)
+                   for host, future in zip(self._hosts, futures)]
+        return all(results)
+    
+    async def _wait_for_instance_ready_async(self, timeout: int = 300, port: int = 22) -> bool:
+        """
+        _wait_for_instance_ready 的异步版本
+        
+        Args:
+            timeout: 超时时间（秒）
+            port: SSH 端口
+            
+        Returns:
+            bool: 所有实例是否都已就绪
+        """
+        results = await asyncio.gather(
+            *(host._wait_for_instance_ready_async(timeout, port) for host in self._hosts)
+        )
+        return all(results)
+    
+    @cached_property
+    def _inventory(self) -> Dict:
+        """
+        包含所有实例的 Ansible inventory（只构建一次，调用方不应修改）
+        
+        Returns:
+            Dict: Ansible inventory 数据
+        """
+        hosts = {}
+        for host in self._hosts:
+            hosts.update(host._inventory['all']['hosts'])
+        return {'all': {'hosts': hosts}}
+    
+    def _verify_cache_path(self) -> Path:
+        """验证结果缓存文件路径（按实例IP集合区分）"""
+        ips = ','.join(sorted(host.config['instance_ip'] for host in self._hosts))
+        return VERIFY_CACHE_DIR / f"bulk-{hashlib.blake2b(ips.encode(), digest_size=8).hexdigest()}.ok"
@@ -13,15 +13,209 @@ SSH 管理模块
     manager.test_ssh_connections(hosts)  # 测试连接
 """
 
+import asyncio
+import hashlib
+import io
+import logging
 import os
 import shutil
+import socket
+import string
 import subprocess
+import tarfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 import paramiko
 from .utils.logger import get_logger
 import time
 import json
 
+try:
+    # 可选依赖：ssh2-python（libssh2 C 实现，握手与命令执行比 paramiko 更快）
+    from ssh2.session import Session as Ssh2Session
+    from ssh2.exceptions import AuthenticationError as Ssh2AuthenticationError, SSH2Error
+    _AUTH_ERRORS = (paramiko.AuthenticationException, Ssh2AuthenticationError)
+    _SSH_ERRORS = (paramiko.SSHException, SSH2Error)
+except ImportError:
+    Ssh2Session = None
+    _AUTH_ERRORS = (paramiko.AuthenticationException,)
+    _SSH_ERRORS = (paramiko.SSHException,)
+
+try:
+    # 可选依赖：asyncssh（所有连接测试在同一个事件循环中并发执行，不占用线程）
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+# 连接测试执行的命令与超时时间（秒）
+TEST_COMMAND = 'echo "SSH connection test"'
+# 普通用户连接时同时检查免密 sudo：退出码 SUDO_UNAVAILABLE 表示已连接但 sudo 不可用
+SUDO_UNAVAILABLE = 97
+SUDO_CHECK_COMMAND = f'{TEST_COMMAND} && (sudo -n true 2>/dev/null || exit {SUDO_UNAVAILABLE})'
+TEST_TIMEOUT = 10
+# SSH 握手与认证阶段的超时时间（秒），慢主机尽快失败而不是等待 paramiko 默认的 30 秒
+TEST_HANDSHAKE_TIMEOUT = 5
+# paramiko 通道窗口与最大包大小，减少短命令应答的小块读取
+TEST_WINDOW_SIZE = 2 ** 22
+TEST_MAX_PACKET_SIZE = 2 ** 19
+
+# 本机主机名（生成密钥注释使用）
+_NODENAME = os.uname().nodename
+
+# 并发 SSH 操作（连接测试、远程配置）的最大线程数
+MAX_SSH_WORKERS = 32
+
+# 连接测试结果的缓存时间（秒），verify_all_connections 与 get_connection_status 共用
+TEST_CACHE_TTL = 30
+
+# 复用的 JSON 编码器（json.dumps 带参数时每次都会新建编码器）
+_CACHE_KEY_ENCODER = json.JSONEncoder(sort_keys=True, default=str)
+_KEY_INFO_ENCODER = json.JSONEncoder(indent=2)
+
+# OpenSSH 连接复用：同一主机的多次 SSH 调用共用一个主连接
+SSH_CONTROL_DIR = os.path.expanduser('~/.ssh/cm')
+SSH_MUX_OPTIONS = [
+    '-o', 'ControlMaster=auto',
+    '-o', f'ControlPath={SSH_CONTROL_DIR}/%r@%h:%p',
+    '-o', 'ControlPersist=60s',
+]
+
+
+def _ensure_mode(path: str, mode: int) -> None:
+    """
+    权限不一致时才修改文件权限，避免重复的 chmod 写入
+
+    Args:
+        path: 文件路径
+        mode: 期望的权限位
+    """
+    if os.stat(path).st_mode & 0o777 != mode:
+        os.chmod(path, mode)
+
+
+@lru_cache(maxsize=256)
+def _expand(path: str) -> str:
+    """展开路径中的 ~（结果缓存，同一密钥路径只展开一次）"""
+    return os.path.expanduser(path)
+
+
+# 目标主机上的 SSH 初始化脚本（$public_key、$port 在生成时替换）
+_INIT_SCRIPT_TEMPLATE = string.Template('''#!/usr/bin/env python3
+import os
+import subprocess
+import sys
+import pwd
+
+def get_user_home(username):
+    try:
+        return pwd.getpwnam(username).pw_dir
+    except KeyError:
+        print(f"找不到用户 {username} 的主目录")
+        return None
+
+def setup_ssh_for_user(username, public_key):
+    """为指定用户配置SSH"""
+    try:
+        user_home = get_user_home(username)
+        if not user_home:
+            return False
+
+        ssh_dir = os.path.join(user_home, '.ssh')
+        os.makedirs(ssh_dir, mode=0o700, exist_ok=True)
+
+        # 设置目录所有权
+        subprocess.run(['chown', username, ssh_dir], check=True)
+
+        # 写入公钥
+        auth_keys_file = os.path.join(ssh_dir, 'authorized_keys')
+        with open(auth_keys_file, 'w') as f:
+            f.write("$public_key\\n")
+
+        # 设置文件权限和所有权
+        os.chmod(auth_keys_file, 0o600)
+        subprocess.run(['chown', username, auth_keys_file], check=True)
+
+        print(f"为用户 {username} 配置SSH完成")
+        return True
+    except Exception as e:
+        print(f"为用户 {username} 配置SSH时出错: {str(e)}")
+        return False
+
+def setup_ssh():
+    try:
+        # 安装SSH服务器
+        subprocess.run(['apt-get', 'update'], check=True)
+        subprocess.run(['apt-get', 'install', '-y', 'openssh-server'], check=True)
+
+        # 获取所有本地用户
+        users = []
+        with open('/etc/passwd', 'r') as f:
+            for line in f:
+                parts = line.strip().split(':')
+                if len(parts) >= 6:
+                    username = parts[0]
+                    home = parts[5]
+                    shell = parts[6] if len(parts) > 6 else '/bin/false'
+                    # 只处理有效的用户账户
+                    if home.startswith('/home/') and '/bin/bash' in shell:
+                        users.append(username)
+
+        # 为root配置SSH
+        setup_ssh_for_user('root', "$public_key")
+
+        # 为所有普通用户配置SSH
+        for username in users:
+            setup_ssh_for_user(username, "$public_key")
+
+        # 配置SSH服务
+        sshd_config = \"""
+# 修改SSH端口为$port
+Port $port
+PermitRootLogin yes
+PubkeyAuthentication yes
+PasswordAuthentication yes
+
+# 安全设置
+Protocol 2
+UsePrivilegeSeparation yes
+IgnoreRhosts yes
+HostbasedAuthentication no
+PermitEmptyPasswords no
+X11Forwarding no
+MaxAuthTries 5
+ClientAliveInterval 300
+ClientAliveCountMax 2
+
+# 日志设置
+SyslogFacility AUTH
+LogLevel INFO
+\"""
+        with open('/etc/ssh/sshd_config', 'w') as f:
+            f.write(sshd_config)
+
+        # 配置防火墙允许新端口
+        try:
+            subprocess.run(['ufw', 'allow', '$port/tcp'], check=True)
+        except:
+            print("警告: 防火墙配置失败，请手动配置防火墙允许$port端口")
+
+        # 重启SSH服务
+        subprocess.run(['systemctl', 'restart', 'ssh'], check=True)
+        print("SSH配置成功完成")
+
+    except Exception as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("需要root权限运行此脚本", file=sys.stderr)
+        sys.exit(1)
+    setup_ssh()
+''')
+
 
 class SSHManager:
     """
@@ -48,14 +242,64 @@ class SSHManager:
         """
         self.config = config
         self.logger = get_logger(__name__)
-        self.ssh_dir = os.path.expanduser('~/.ssh')
+        self._home = os.path.expanduser('~')
+        self.ssh_dir = os.path.join(self._home, '.ssh')
         self.private_key_path = os.path.join(self.ssh_dir, 'id_rsa')
         self.public_key_path = os.path.join(self.ssh_dir, 'id_rsa.pub')
         self.output_dir = os.path.join('ansible', 'server', 'scripts')
         self.ssh_port = self.config.get('ssh_port', 22)
+        # 连接测试结果缓存 {主机配置指纹: (测试时间, 结果列表)}
+        self._test_cache: Dict[str, Tuple[float, List[Dict]]] = {}
+        # 公钥指纹缓存 (公钥路径, 指纹)，重新配置本地密钥时清空
+        self._pubkey_cache: Optional[Tuple[str, str]] = None
+        # 密钥对不存在时在后台生成，与配置解析、目录准备等工作重叠
+        self._keygen_proc: Optional[subprocess.Popen] = None
+        if not os.path.exists(self.private_key_path):
+            self._start_keygen()
 
     # ===== SSH 初始化和配置 =====
 
+    def _start_keygen(self) -> None:
+        """
+        在后台启动 ssh-keygen 生成本地密钥对
+
+        启动失败时仅记录日志，由 _setup_local_ssh 同步生成
+        """
+        try:
+            os.makedirs(self.ssh_dir, mode=0o700, exist_ok=True)
+            self._keygen_proc = subprocess.Popen(
+                [
+                    'ssh-keygen',
+                    '-t', 'ed25519',
+                    '-f', self.private_key_path,
+                    '-N', '',
+                    '-C', f"deployment@{_NODENAME}"
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE
+            )
+        except OSError as e:
+            self.logger.debug("后台生成 SSH 密钥对失败: %s", e)
+            self._keygen_proc = None
+
+    def _wait_for_keygen(self) -> bool:
+        """
+        等待后台 ssh-keygen 完成
+
+        Returns:
+            bool: 是否由后台进程生成了新的密钥对
+
+        Raises:
+            subprocess.CalledProcessError: ssh-keygen 执行失败
+        """
+        proc, self._keygen_proc = self._keygen_proc, None
+        if proc is None:
+            return False
+        _, stderr = proc.communicate()
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args, stderr=stderr)
+        return True
+
     def initialize_ssh(self, hosts: Dict, mode: str = 'virtual') -> bool:
         """
         初始化 SSH 配置
@@ -96,22 +340,26 @@ class SSHManager:
             # 创建.ssh目录
             os.makedirs(self.ssh_dir, mode=0o700, exist_ok=True)
 
-            # 如果密钥对不存在，则生成
-            if not os.path.exists(self.private_key_path):
+            # 如果密钥对不存在，则生成（优先复用后台 ssh-keygen 的结果）
+            if self._wait_for_keygen():
+                self.logger.info("生成了新的 SSH 密钥对")
+            elif not os.path.exists(self.private_key_path):
                 subprocess.run([
                     'ssh-keygen',
                     '-t', 'ed25519',
                     '-f', self.private_key_path,
                     '-N', '',
-                    '-C', f"deployment@{os.uname().nodename}"
+                    '-C', f"deployment@{_NODENAME}"
                 ], check=True)
                 self.logger.info("生成了新的 SSH 密钥对")
             else:
                 self.logger.info("使用现有的 SSH 密钥对")
 
-            # 设置正确的权限
-            os.chmod(self.private_key_path, 0o600)
-            os.chmod(self.public_key_path, 0o644)
+            self._pubkey_cache = None
+
+            # 设置正确的权限（已正确时跳过）
+            _ensure_mode(self.private_key_path, 0o600)
+            _ensure_mode(self.public_key_path, 0o644)
 
             self.logger.info("本地SSH配置完成")
             return True
@@ -137,13 +385,14 @@ class SSHManager:
             if 'all' not in hosts or 'hosts' not in hosts['all']:
                 raise ValueError("无效的主机配置格式：缺少 'all.hosts' 结构")
 
+            public_key = self._read_public_key()
             for hostname, host_config in hosts['all']['hosts'].items():
                 self._generate_host_files({
                     'host': hostname,
                     'ansible_host': host_config['ansible_host'],
                     'ansible_user': host_config['ansible_user'],
                     'ansible_port': host_config['ansible_port']
-                })
+                }, public_key)
 
             self.logger.info("虚拟机 SSH 初始化文件生成完成")
             return True
@@ -163,8 +412,8 @@ class SSHManager:
             bool: 初始化是否成功
         """
         try:
-            # 1. 确保.ssh目录存在
-            os.makedirs(self.ssh_dir, mode=0o700, exist_ok=True)
+            # 1. 等待后台生成的本地密钥对（.ssh 目录已由 _setup_local_ssh 创建）
+            self._wait_for_keygen()
 
             # 2. 生成新的密钥对（使用 ed25519，更安全和现代）
             key_name = "cloud_deploy"
@@ -175,12 +424,12 @@ class SSHManager:
                 '-t', 'ed25519',
                 '-f', key_path,
                 '-N', '',
-                '-C', f"cloud_deploy@{os.uname().nodename}"
+                '-C', f"cloud_deploy@{_NODENAME}"
             ], check=True)
 
-            # 3. 设置正确的权限
-            os.chmod(f"{key_path}", 0o600)
-            os.chmod(f"{key_path}.pub", 0o644)
+            # 3. 设置正确的权限（已正确时跳过）
+            _ensure_mode(key_path, 0o600)
+            _ensure_mode(f"{key_path}.pub", 0o644)
 
             # 4. 读取公钥内容
             with open(f"{key_path}.pub", 'r') as f:
@@ -204,26 +453,25 @@ class SSHManager:
             }
 
             info_file = os.path.join(output_dir, 'keys_info.json')
-            with open(info_file, 'w') as f:
-                json.dump(key_info, f, indent=2)
+            Path(info_file).write_text(_KEY_INFO_ENCODER.encode(key_info))
 
             # 8. 将公钥内容单独保存为文本文件，方便复制
             pubkey_file = os.path.join(output_dir, 'authorized_keys')
-            with open(pubkey_file, 'w') as f:
-                f.write(public_key)
+            Path(pubkey_file).write_text(public_key)
 
-            self.logger.info(f"""
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("""
 云服务器 SSH 密钥生成完成:
 
-所有文件已保存到目录: {output_dir}
+所有文件已保存到目录: %s
 - 私钥: id_ed25519
 - 公钥: id_ed25519.pub
 - 密钥信息: keys_info.json
 - 授权密钥: authorized_keys
 
 请将 authorized_keys 文件的内容添加到云服务器的 ~/.ssh/authorized_keys 文件中:
-{public_key}
-            """)
+%s
+            """, output_dir, public_key)
             return True
 
         except Exception as e:
@@ -232,7 +480,17 @@ class SSHManager:
 
     # ===== 脚本生成 =====
 
-    def _generate_host_files(self, host: dict) -> Tuple[str, str]:
+    def _read_public_key(self) -> str:
+        """
+        读取本地公钥内容（每次批量生成前读取一次）
+
+        Returns:
+            str: 公钥内容
+        """
+        with open(self.public_key_path, 'r') as f:
+            return f.read().strip()
+
+    def _generate_host_files(self, host: dict, public_key: str) -> Tuple[str, str]:
         """
         为特定主机生成初始化文件
 
@@ -242,15 +500,12 @@ class SSHManager:
                 - ansible_host: 主机地址
                 - ansible_user: 用户名
                 - ansible_port: SSH端口
+            public_key: 公钥内容（见 _read_public_key）
 
         Returns:
             Tuple[str, str]: (脚本路径, 公钥路径)
         """
         try:
-            # 读取公钥
-            with open(self.public_key_path, 'r') as f:
-                public_key = f.read().strip()
-
             # 生成主机特定目录
             host_dir = os.path.join(self.output_dir, host['host'])
             os.makedirs(host_dir, exist_ok=True)
@@ -259,15 +514,14 @@ class SSHManager:
             script_path = os.path.join(host_dir, 'setup_ssh.py')
             self._generate_init_script(script_path, public_key, host['ansible_port'])
 
-            # 2. 复制公钥文件
+            # 2. 公钥文件（只读）：优先创建硬链接，跨文件系统等情况下回退为复制
             key_path = os.path.join(host_dir, 'id_rsa.pub')
-            shutil.copy2(self.public_key_path, key_path)
-
-            # 3. 验证生成的脚本
-            with open(script_path, 'r') as f:
-                script_content = f.read()
-                if '{public_key}' in script_content:
-                    raise Exception("公钥替换失败")
+            try:
+                if os.path.lexists(key_path):
+                    os.unlink(key_path)
+                os.link(self.public_key_path, key_path)
+            except OSError:
+                shutil.copy2(self.public_key_path, key_path)
 
             self.logger.info(f"主机 {host['host']} ({host['ansible_host']}) 的初始化文件生成完成")
             return script_path, key_path
@@ -287,131 +541,101 @@ class SSHManager:
         Raises:
             Exception: 脚本生成错误
         """
-        # 使用 f-string 直接替换公钥和端口
-        script_content = f'''#!/usr/bin/env python3
-import os
-import subprocess
-import sys
-import pwd
-
-def get_user_home(username):
-    try:
-        return pwd.getpwnam(username).pw_dir
-    except KeyError:
-        print(f"找不到用户 {{username}} 的主目录")
-        return None
+        script_content = self._render_init_script(public_key, port)
 
-def setup_ssh_for_user(username, public_key):
-    """为指定用户配置SSH"""
-    try:
-        user_home = get_user_home(username)
-        if not user_home:
-            return False
-
-        ssh_dir = os.path.join(user_home, '.ssh')
-        os.makedirs(ssh_dir, mode=0o700, exist_ok=True)
+        # 一次写入整个脚本；fchmod 保证权限不受 umask 和已存在文件的影响
+        buf = memoryview(script_content.encode())
+        fd = os.open(script_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+        try:
+            while buf:
+                buf = buf[os.write(fd, buf):]
+            os.fchmod(fd, 0o755)
+        finally:
+            os.close(fd)
 
-        # 设置目录所有权
-        subprocess.run(['chown', username, ssh_dir], check=True)
+    def _render_init_script(self, public_key: str, port: int) -> str:
+        """
+        渲染 Python 初始化脚本内容
 
-        # 写入公钥
-        auth_keys_file = os.path.join(ssh_dir, 'authorized_keys')
-        with open(auth_keys_file, 'w') as f:
-            f.write("{public_key}\\n")
+        Args:
+            public_key: SSH 公钥内容
+            port: SSH 端口号
 
-        # 设置文件权限和所有权
-        os.chmod(auth_keys_file, 0o600)
-        subprocess.run(['chown', username, auth_keys_file], check=True)
+        Returns:
+            str: 脚本内容
 
-        print(f"为用户 {{username}} 配置SSH完成")
-        return True
-    except Exception as e:
-        print(f"为用户 {{username}} 配置SSH时出错: {{str(e)}}")
-        return False
+        Raises:
+            Exception: 公钥替换失败
+        """
+        script_content = _INIT_SCRIPT_TEMPLATE.substitute(public_key=public_key, port=port)
+        # 在内存中验证替换结果，不再回读文件
+        if public_key not in script_content:
+            raise Exception("公钥替换失败")
+        return script_content
 
-def setup_ssh():
-    try:
-        # 安装SSH服务器
-        subprocess.run(['apt-get', 'update'], check=True)
-        subprocess.run(['apt-get', 'install', '-y', 'openssh-server'], check=True)
+    def _build_host_bundle(self, public_key: str, port: int) -> bytes:
+        """
+        在内存中将初始化脚本与公钥打包为 tar（用于一次 SSH 调用传输并执行）
 
-        # 获取所有本地用户
-        users = []
-        with open('/etc/passwd', 'r') as f:
-            for line in f:
-                parts = line.strip().split(':')
-                if len(parts) >= 6:
-                    username = parts[0]
-                    home = parts[5]
-                    shell = parts[6] if len(parts) > 6 else '/bin/false'
-                    # 只处理有效的用户账户
-                    if home.startswith('/home/') and '/bin/bash' in shell:
-                        users.append(username)
+        Args:
+            public_key: SSH 公钥内容
+            port: SSH 端口号
 
-        # 为root配置SSH
-        setup_ssh_for_user('root', "{public_key}")
+        Returns:
+            bytes: tar 数据，包含 setup_ssh.py (0755) 与 id_rsa.pub (0644)
+        """
+        members = (
+            ('setup_ssh.py', self._render_init_script(public_key, port).encode(), 0o755),
+            ('id_rsa.pub', f"{public_key}\n".encode(), 0o644),
+        )
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode='w') as tar:
+            for name, data, mode in members:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mode = mode
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+        return buf.getvalue()
 
-        # 为所有普通用户配置SSH
-        for username in users:
-            setup_ssh_for_user(username, "{public_key}")
+    # ===== 连接测试 =====
 
-        # 配置SSH服务
-        sshd_config = \"""
-# 修改SSH端口为{port}
-Port {port}
-PermitRootLogin yes
-PubkeyAuthentication yes
-PasswordAuthentication yes
+    def test_ssh_connections(self, hosts: Dict) -> List[Dict]:
+        """
+        测试所有主机的 SSH 连接（普通用户与 root，所有连接并发测试）
 
-# 安全设置
-Protocol 2
-UsePrivilegeSeparation yes
-IgnoreRhosts yes
-HostbasedAuthentication no
-PermitEmptyPasswords no
-X11Forwarding no
-MaxAuthTries 5
-ClientAliveInterval 300
-ClientAliveCountMax 2
+        普通用户连接的同一会话中检查免密 sudo，可用时不再单独以 root 连接。
 
-# 日志设置
-SyslogFacility AUTH
-LogLevel INFO
-\"""
-        with open('/etc/ssh/sshd_config', 'w') as f:
-            f.write(sshd_config)
+        相同主机配置在 TEST_CACHE_TTL 秒内重复调用时直接返回上次的结果。
 
-        # 配置防火墙允许新端口
-        try:
-            subprocess.run(['ufw', 'allow', '{port}/tcp'], check=True)
-        except:
-            print("警告: 防火墙配置失败，请手动配置防火墙允许{port}端口")
+        Args:
+            hosts: vpn_hosts.json 格式的主机配置字典
 
-        # 重启SSH服务
-        subprocess.run(['systemctl', 'restart', 'ssh'], check=True)
-        print("SSH配置成功完成")
+        Returns:
+            List[Dict]: 测试结果列表
+        """
+        if 'all' not in hosts or 'hosts' not in hosts['all']:
+            raise ValueError("无效的主机配置格式：缺少 'all.hosts' 结构")
 
-    except Exception as e:
-        print(f"错误: {{str(e)}}", file=sys.stderr)
-        sys.exit(1)
+        cache_key = hashlib.blake2b(
+            _CACHE_KEY_ENCODER.encode(hosts).encode(), digest_size=16
+        ).hexdigest()
+        cached = self._test_cache.get(cache_key)
+        if cached is not None and time.monotonic() - cached[0] < TEST_CACHE_TTL:
+            self.logger.debug("使用缓存的 SSH 连接测试结果")
+            return cached[1]
 
-if __name__ == '__main__':
-    if os.geteuid() != 0:
-        print("需要root权限运行此脚本", file=sys.stderr)
-        sys.exit(1)
-    setup_ssh()
-'''
-        # 写入脚本文件
-        with open(script_path, 'w') as f:
-            f.write(script_content)
-        # 设置执行权限
-        os.chmod(script_path, 0o755)
+        results = self._run_connection_tests(hosts)
+        self._test_cache[cache_key] = (time.monotonic(), results)
+        return results
 
-    # ===== 连接测试 =====
+    def invalidate_test_cache(self) -> None:
+        """清空连接测试结果缓存（主机配置或远程状态变化后调用）"""
+        self._test_cache.clear()
 
-    def test_ssh_connections(self, hosts: Dict) -> List[Dict]:
+    def _run_connection_tests(self, hosts: Dict) -> List[Dict]:
         """
-        测试所有主机的 SSH 连接
+        实际执行所有主机的 SSH 连接测试
 
         Args:
             hosts: vpn_hosts.json 格式的主机配置字典
@@ -420,25 +644,32 @@ if __name__ == '__main__':
             List[Dict]: 测试结果列表
         """
         results = []
-        if 'all' not in hosts or 'hosts' not in hosts['all']:
-            raise ValueError("无效的主机配置格式：缺少 'all.hosts' 结构")
+        host_items = list(hosts['all']['hosts'].items())
+        if not host_items:
+            return results
 
-        for hostname, host_config in hosts['all']['hosts'].items():
-            # 测试普通用户连接
-            normal_result = self._test_single_connection({
+        # 1. 以普通用户连接，同一会话中检查免密 sudo（可用即视为具备 root 权限）
+        user_tests = [
+            {
                 'host': host_config['ansible_host'],
                 'username': host_config['ansible_user'],
                 'port': host_config['ansible_port'],
-                'key_filename': os.path.expanduser(host_config['ansible_ssh_private_key_file'])
-            })
+                'key_filename': _expand(host_config['ansible_ssh_private_key_file']),
+                'sudo_check': True
+            }
+            for _, host_config in host_items
+        ]
+        user_results = self._fan_out(user_tests)
 
-            # 测试 root 连接
-            root_result = self._test_single_connection({
-                'host': host_config['ansible_host'],
-                'username': 'root',
-                'port': host_config['ansible_port'],
-                'key_filename': os.path.expanduser(host_config['ansible_ssh_private_key_file'])
-            })
+        # 2. 只有 sudo 不可用（或普通用户连接失败）的主机才以 root 直接连接
+        root_indexes = [i for i, r in enumerate(user_results) if not r.get('sudo')]
+        root_results = dict(zip(root_indexes, self._fan_out([
+            {**user_tests[i], 'username': 'root', 'sudo_check': False} for i in root_indexes
+        ])))
+
+        for i, (hostname, host_config) in enumerate(host_items):
+            normal_result = user_results[i]
+            root_result = root_results.get(i, {'success': True, 'message': '通过 sudo 验证 root 权限'})
 
             # 合并结果
             result = {
@@ -470,6 +701,43 @@ if __name__ == '__main__':
 
         return results
 
+    def _fan_out(self, tests: List[Dict]) -> List[Dict]:
+        """
+        并发执行一组连接测试（已安装 asyncssh 时使用事件循环，否则使用线程池）
+
+        Args:
+            tests: _test_single_connection 格式的主机配置列表
+
+        Returns:
+            List[Dict]: 与 tests 顺序一致的测试结果
+        """
+        if not tests:
+            return []
+        if asyncssh is not None:
+            return asyncio.run(self._atest_all(tests))
+        with ThreadPoolExecutor(max_workers=min(MAX_SSH_WORKERS, len(tests))) as executor:
+            return list(executor.map(self._test_single_connection, tests))
+
+    @staticmethod
+    def _apply_exit_status(result: Dict, host_config: Dict, exit_status: int, error: str) -> None:
+        """
+        根据测试命令的退出码填写测试结果
+
+        Args:
+            result: 测试结果（原地修改）
+            host_config: 主机配置（sudo_check 为 True 时同时记录 sudo 是否可用）
+            exit_status: 测试命令退出码
+            error: 标准错误输出
+        """
+        sudo_check = host_config.get('sudo_check', False)
+        if exit_status == 0 or (sudo_check and exit_status == SUDO_UNAVAILABLE):
+            result['success'] = True
+            result['message'] = 'SSH连接成功'
+            if sudo_check:
+                result['sudo'] = exit_status == 0
+        else:
+            result['message'] = f'命令执行失败: {error}'
+
     def _test_single_connection(self, host_config: Dict) -> Dict:
         """
         测试单个主机的 SSH 连接
@@ -480,9 +748,10 @@ if __name__ == '__main__':
                 - username: 用户名
                 - port: SSH 端口
                 - key_filename: SSH 密钥文件路径
+                - sudo_check: 是否在同一会话中检查免密 sudo（可选）
 
         Returns:
-            Dict: 测试结果
+            Dict: 测试结果（sudo_check 时包含 sudo: 免密 sudo 是否可用）
         """
         result = {
             'host': host_config['host'],
@@ -491,49 +760,23 @@ if __name__ == '__main__':
         }
 
         try:
-            # 检查 SSH 密钥文件
-            key_filename = host_config.get('key_filename', self.private_key_path)
-            if not os.path.exists(key_filename):
-                raise Exception(f"SSH密钥文件不存在: {key_filename}")
-
-            # 检查密钥权限
-            key_stat = os.stat(key_filename)
-            if key_stat.st_mode & 0o777 != 0o600:
-                self.logger.warning(f"修复密钥文件权限: {key_filename}")
-                os.chmod(key_filename, 0o600)
-
-            # 尝试 SSH 连接
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            key_filename = self._check_key_file(host_config.get('key_filename', self.private_key_path))
 
+            # 尝试 SSH 连接（已安装 ssh2-python 时使用 libssh2）
             try:
                 self.logger.info(f"正在连接到 {host_config['host']} 使用用户 {host_config['username']}")
 
-                ssh.connect(
-                    hostname=host_config['host'],
-                    username=host_config['username'],
-                    port=host_config['port'],
-                    key_filename=key_filename,
-                    timeout=10,
-                    allow_agent=False,
-                    look_for_keys=False
-                )
-
-                # 执行测试命令
-                stdin, stdout, stderr = ssh.exec_command('echo "SSH connection test"')
-                exit_status = stdout.channel.recv_exit_status()
-
-                if exit_status == 0:
-                    result['success'] = True
-                    result['message'] = 'SSH连接成功'
+                command = SUDO_CHECK_COMMAND if host_config.get('sudo_check') else TEST_COMMAND
+                if Ssh2Session is not None:
+                    exit_status, error = self._exec_ssh2(host_config, key_filename, command)
                 else:
-                    result['message'] = f'命令执行失败: {stderr.read().decode()}'
+                    exit_status, error = self._exec_paramiko(host_config, key_filename, command)
 
-                ssh.close()
+                self._apply_exit_status(result, host_config, exit_status, error)
 
-            except paramiko.AuthenticationException:
+            except _AUTH_ERRORS:
                 result['message'] = '认证失败，请检查SSH密钥配置'
-            except paramiko.SSHException as e:
+            except _SSH_ERRORS as e:
                 result['message'] = f'SSH连接错误: {str(e)}'
             except Exception as e:
                 result['message'] = f'连接错误: {str(e)}'
@@ -545,6 +788,167 @@ if __name__ == '__main__':
 
         return result
 
+    def _check_key_file(self, key_filename: str) -> str:
+        """
+        检查 SSH 密钥文件存在，权限不是 0600 时修复
+
+        Args:
+            key_filename: SSH 密钥文件路径
+
+        Returns:
+            str: SSH 密钥文件路径
+        """
+        if not os.path.exists(key_filename):
+            raise Exception(f"SSH密钥文件不存在: {key_filename}")
+
+        key_stat = os.stat(key_filename)
+        if key_stat.st_mode & 0o777 != 0o600:
+            self.logger.warning(f"修复密钥文件权限: {key_filename}")
+            os.chmod(key_filename, 0o600)
+        return key_filename
+
+    async def _atest_all(self, tests: List[Dict]) -> List[Dict]:
+        """
+        使用 asyncssh 在一个事件循环中并发执行所有连接测试
+
+        Args:
+            tests: _test_single_connection 格式的主机配置列表
+
+        Returns:
+            List[Dict]: 与 tests 顺序一致的测试结果
+        """
+        outcomes = await asyncio.gather(*(self._atest(t) for t in tests), return_exceptions=True)
+        return [
+            outcome if not isinstance(outcome, BaseException)
+            else {'host': t['host'], 'success': False, 'message': f'未知错误: {str(outcome)}'}
+            for t, outcome in zip(tests, outcomes)
+        ]
+
+    async def _atest(self, host_config: Dict) -> Dict:
+        """
+        _test_single_connection 的 asyncssh 版本
+
+        Args:
+            host_config: 主机配置（host, username, port, key_filename）
+
+        Returns:
+            Dict: 测试结果
+        """
+        result = {
+            'host': host_config['host'],
+            'success': False,
+            'message': ''
+        }
+
+        try:
+            key_filename = self._check_key_file(host_config.get('key_filename', self.private_key_path))
+        except Exception as e:
+            result['message'] = f'未知错误: {str(e)}'
+            return result
+
+        try:
+            self.logger.info(f"正在连接到 {host_config['host']} 使用用户 {host_config['username']}")
+            command = SUDO_CHECK_COMMAND if host_config.get('sudo_check') else TEST_COMMAND
+            completed = await asyncio.wait_for(
+                self._arun(host_config, key_filename, command), TEST_TIMEOUT
+            )
+            self._apply_exit_status(result, host_config, completed.exit_status, completed.stderr)
+        except asyncssh.PermissionDenied:
+            result['message'] = '认证失败，请检查SSH密钥配置'
+        except asyncssh.Error as e:
+            result['message'] = f'SSH连接错误: {str(e)}'
+        except (OSError, asyncio.TimeoutError) as e:
+            result['message'] = f'连接错误: {str(e) or "连接超时"}'
+
+        return result
+
+    @staticmethod
+    async def _arun(host_config: Dict, key_filename: str, command: str):
+        """
+        使用 asyncssh 连接主机并执行命令
+
+        Returns:
+            asyncssh.SSHCompletedProcess: 命令执行结果
+        """
+        async with asyncssh.connect(
+            host_config['host'],
+            port=host_config['port'],
+            username=host_config['username'],
+            client_keys=[key_filename],
+            known_hosts=None,
+            agent_path=None
+        ) as conn:
+            return await conn.run(command)
+
+    def _exec_paramiko(self, host_config: Dict, key_filename: str, command: str) -> Tuple[int, str]:
+        """
+        使用 paramiko 连接主机并执行命令
+
+        Args:
+            host_config: 主机配置（host, username, port）
+            key_filename: SSH 密钥文件路径
+            command: 要执行的命令
+
+        Returns:
+            Tuple[int, str]: (退出码, 标准错误输出)
+        """
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            ssh.connect(
+                hostname=host_config['host'],
+                username=host_config['username'],
+                port=host_config['port'],
+                key_filename=key_filename,
+                timeout=TEST_TIMEOUT,
+                banner_timeout=TEST_HANDSHAKE_TIMEOUT,
+                auth_timeout=TEST_HANDSHAKE_TIMEOUT,
+                allow_agent=False,
+                look_for_keys=False
+            )
+            # 调整随后打开的命令通道的窗口与包大小
+            transport = ssh.get_transport()
+            transport.default_window_size = TEST_WINDOW_SIZE
+            transport.default_max_packet_size = TEST_MAX_PACKET_SIZE
+            stdin, stdout, stderr = ssh.exec_command(command)
+            exit_status = stdout.channel.recv_exit_status()
+            return exit_status, stderr.read().decode(errors='replace')
+        finally:
+            ssh.close()
+
+    def _exec_ssh2(self, host_config: Dict, key_filename: str, command: str) -> Tuple[int, str]:
+        """
+        使用 ssh2-python（libssh2）连接主机并执行命令
+
+        Args:
+            host_config: 主机配置（host, username, port）
+            key_filename: SSH 密钥文件路径
+            command: 要执行的命令
+
+        Returns:
+            Tuple[int, str]: (退出码, 标准错误输出)
+        """
+        sock = socket.create_connection((host_config['host'], host_config['port']), timeout=TEST_TIMEOUT)
+        try:
+            session = Ssh2Session()
+            session.set_timeout(TEST_TIMEOUT * 1000)
+            session.handshake(sock)
+            session.userauth_publickey_fromfile(host_config['username'], key_filename)
+
+            channel = session.open_session()
+            channel.execute(command)
+            stderr = b''
+            size, data = channel.read_stderr()
+            while size > 0:
+                stderr += data
+                size, data = channel.read_stderr()
+            channel.wait_eof()
+            channel.close()
+            channel.wait_closed()
+            return channel.get_exit_status(), stderr.decode(errors='replace')
+        finally:
+            sock.close()
+
     # ===== 状态验证和报告 =====
 
     def verify_all_connections(self, hosts: Dict) -> bool:
@@ -650,24 +1054,30 @@ if __name__ == '__main__':
 
     def _get_ssh_key_fingerprint(self) -> Optional[str]:
         """
-        获取 SSH 密钥指纹
+        获取 SSH 密钥指纹（结果缓存，重新配置本地密钥后重新计算）
 
         Returns:
             Optional[str]: 密钥指纹，如果获取失败则返回 None
         """
+        if self._pubkey_cache is not None and self._pubkey_cache[0] == self.public_key_path:
+            return self._pubkey_cache[1]
         try:
             result = subprocess.run(
                 ['ssh-keygen', '-l', '-f', self.public_key_path],
                 capture_output=True,
                 text=True
             )
-            return result.stdout.strip() if result.returncode == 0 else None
         except Exception:
             return None
+        if result.returncode != 0:
+            return None
+        fingerprint = result.stdout.strip()
+        self._pubkey_cache = (self.public_key_path, fingerprint)
+        return fingerprint
 
     def setup_ssh(self, hosts: Dict) -> bool:
         """
-        配置所有主机的 SSH
+        配置所有主机的 SSH（各主机并发配置）
 
         Args:
             hosts: vpn_hosts.json 格式的主机配置字典
@@ -679,69 +1089,117 @@ if __name__ == '__main__':
             if 'all' not in hosts or 'hosts' not in hosts['all']:
                 raise ValueError("无效的主机配置格式：缺少 'all.hosts' 结构")
 
-            success = True
-            for hostname, host_config in hosts['all']['hosts'].items():
-                try:
-                    # 生成该主机的配置文件
-                    script_path, key_path = self._generate_host_files({
-                        'host': hostname,
-                        'ansible_host': host_config['ansible_host'],
-                        'ansible_user': host_config['ansible_user'],
-                        'ansible_port': host_config['ansible_port']
-                    })
-
-                    # 执行远程配置
-                    if not self._setup_remote_ssh(host_config, script_path):
-                        self.logger.error(f"主机 {hostname} SSH配置失败")
-                        success = False
-                    else:
-                        self.logger.info(f"主机 {hostname} SSH配置成功")
-
-                except Exception as e:
-                    self.logger.error(f"主机 {hostname} 配置过程出错: {str(e)}")
-                    success = False
+            host_items = list(hosts['all']['hosts'].items())
+            if not host_items:
+                return True
+
+            # 公钥只读取一次，各主机并发配置
+            public_key = self._read_public_key()
+            os.makedirs(SSH_CONTROL_DIR, mode=0o700, exist_ok=True)
+            unique_hosts = {
+                (c['ansible_user'], c['ansible_host'], c['ansible_port']): c
+                for _, c in host_items
+            }
+
+            with ThreadPoolExecutor(max_workers=min(MAX_SSH_WORKERS, len(host_items))) as executor:
+                # 预先为每个主机建立 SSH 主连接，后续 SSH 调用直接复用
+                list(executor.map(self._open_control_master, unique_hosts.values()))
 
+                futures = [
+                    executor.submit(self._provision_one, hostname, host_config, public_key)
+                    for hostname, host_config in host_items
+                ]
+                success = all([future.result() for future in as_completed(futures)])
+
+            # 远程 SSH 配置已变化，之前的连接测试结果不再有效
+            self.invalidate_test_cache()
             return success
 
         except Exception as e:
             self.logger.error(f"SSH配置失败: {str(e)}")
             return False
 
-    def _setup_remote_ssh(self, host_config: Dict, script_path: str) -> bool:
+    def _provision_one(self, hostname: str, host_config: Dict, public_key: str) -> bool:
+        """
+        打包单个主机的初始化文件并执行远程配置
+
+        Args:
+            hostname: 主机名
+            host_config: vpn_hosts.json 中的主机配置
+            public_key: 公钥内容
+
+        Returns:
+            bool: 配置是否成功
+        """
+        try:
+            # 初始化脚本与公钥在内存中打包，不写入本地文件
+            bundle = self._build_host_bundle(public_key, host_config['ansible_port'])
+
+            # 执行远程配置
+            if not self._setup_remote_ssh(host_config, bundle):
+                self.logger.error(f"主机 {hostname} SSH配置失败")
+                return False
+
+            self.logger.info(f"主机 {hostname} SSH配置成功")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"主机 {hostname} 配置过程出错: {str(e)}")
+            return False
+
+    def _open_control_master(self, host_config: Dict) -> bool:
+        """
+        在后台建立到主机的 SSH 主连接（ControlPersist 到期后自动关闭）
+
+        Args:
+            host_config: 主机配置（ansible_host, ansible_user, ansible_port,
+                ansible_ssh_private_key_file）
+
+        Returns:
+            bool: 主连接是否建立成功
+        """
+        try:
+            subprocess.run([
+                # OpenSSH 取第一次出现的选项值，ControlMaster=yes 需放在通用选项之前
+                'ssh', '-o', 'ControlMaster=yes', *SSH_MUX_OPTIONS,
+                '-N', '-f',
+                '-p', str(host_config['ansible_port']),
+                '-i', _expand(host_config['ansible_ssh_private_key_file']),
+                f"{host_config['ansible_user']}@{host_config['ansible_host']}"
+            ], check=True, timeout=30)
+            return True
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+            # 主连接只是优化，失败时 scp/ssh 仍会单独建立连接
+            self.logger.warning(f"主机 {host_config['ansible_host']} SSH 主连接建立失败: {str(e)}")
+            return False
+
+    def _setup_remote_ssh(self, host_config: Dict, bundle: bytes) -> bool:
         """
         配置远程主机的 SSH
 
+        初始化文件以 tar 流通过一次 SSH 调用传输，在远程解压后立即执行。
+
         Args:
             host_config: 主机配置，包含：
                 - ansible_host: 主机地址
                 - ansible_user: 用户名
                 - ansible_port: SSH端口
                 - ansible_ssh_private_key_file: SSH私钥文件路径
-            script_path: 初始化脚本路径
+            bundle: _build_host_bundle 生成的 tar 数据
 
         Returns:
             bool: 配置是否成功
         """
         try:
-            # 使用 SCP 复制脚本到远程主机
-            scp_command = [
-                'scp', '-P', str(host_config['ansible_port']),
-                '-i', os.path.expanduser(host_config['ansible_ssh_private_key_file']),
-                script_path,
-                f"{host_config['ansible_user']}@{host_config['ansible_host']}:/tmp/setup_ssh.py"
-            ]
-            
-            subprocess.run(scp_command, check=True)
-
-            # 执行远程脚本
             ssh_command = [
-                'ssh', '-p', str(host_config['ansible_port']),
-                '-i', os.path.expanduser(host_config['ansible_ssh_private_key_file']),
+                'ssh', *SSH_MUX_OPTIONS,
+                '-p', str(host_config['ansible_port']),
+                '-i', _expand(host_config['ansible_ssh_private_key_file']),
                 f"{host_config['ansible_user']}@{host_config['ansible_host']}",
-                'sudo python3 /tmp/setup_ssh.py'
+                'tar -xf - -C /tmp && sudo python3 /tmp/setup_ssh.py'
             ]
-            
-            subprocess.run(ssh_command, check=True)
+
+            subprocess.run(ssh_command, input=bundle, check=True)
 
             self.logger.info(f"主机 {host_config['ansible_host']} SSH配置成功")
             return True
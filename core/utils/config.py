@@ -3,27 +3,56 @@ import json
 import yaml
 import re
 from pathlib import Path
-from typing import Dict, Any, Optional, Type, TYPE_CHECKING
+from typing import Dict, Any, Optional, Tuple, Type, TYPE_CHECKING
+
+try:
+    # 可选依赖：orjson（解析 JSON 配置比标准库 json 更快）
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from pydantic import ValidationError
+except ImportError:
+    ValidationError = None
 
 if TYPE_CHECKING:
     from pydantic import BaseModel
 
+# 匹配 ${VAR} 或 ${VAR:default}
+_ENV_PATTERN = re.compile(r'\$\{([^}:]+)(?::([^}]*))?\}')
+
+# 优先使用 libyaml 的 C 实现解析 YAML
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# 已解析配置缓存 {配置路径: (文件修改时间 ns, 环境变量替换前的配置)}
+_CFG_CACHE: Dict[str, Tuple[int, Any]] = {}
+
+# 写入默认配置使用的 JSON 编码器（只创建一次）
+_DEFAULT_CONFIG_ENCODER = json.JSONEncoder(indent=4)
+
 def load_config(config_path: str) -> Dict:
     """加载配置文件（支持 YAML 和 JSON）"""
     path = Path(config_path)
     
     try:
-        # 根据扩展名选择加载器
-        if path.suffix in ['.yml', '.yaml']:
-            # YAML 支持
-            with open(path, 'r') as f:
-                config = yaml.safe_load(f)
+        # 文件未修改时复用已解析的结果
+        mtime = os.stat(path).st_mtime_ns
+        cached = _CFG_CACHE.get(str(path))
+        if cached is not None and cached[0] == mtime:
+            config = cached[1]
         else:
-            # 保持原有 JSON 逻辑
-            with open(path, 'r') as f:
-                config = json.load(f)
-        
-        # 环境变量替换
+            # 一次读入整个文件，再根据扩展名选择解析器
+            data = path.read_bytes()
+            if path.suffix in ['.yml', '.yaml']:
+                # YAML 支持
+                config = yaml.load(data, Loader=_YAML_LOADER)
+            else:
+                # 保持原有 JSON 逻辑（已安装 orjson 时使用 orjson）
+                config = orjson.loads(data) if orjson is not None else json.loads(data)
+            _CFG_CACHE[str(path)] = (mtime, config)
+        
+        # 环境变量替换（每次调用重新替换，并重建字典/列表，调用方修改不会影响缓存）
         config = replace_env_vars(config)
         
         return config
@@ -48,9 +77,8 @@ def _create_default_config(config_path: str) -> Dict:
     # 确保配置目录存在
     os.makedirs(os.path.dirname(config_path), exist_ok=True)
 
-    # 写入默认配置
-    with open(config_path, 'w') as f:
-        json.dump(default_config, f, indent=4)
+    # 写入默认配置（一次写入）
+    Path(config_path).write_text(_DEFAULT_CONFIG_ENCODER.encode(default_config))
 
     return default_config
 
@@ -71,19 +99,21 @@ def replace_env_vars(data: Any) -> Any:
     elif isinstance(data, list):
         return [replace_env_vars(item) for item in data]
     elif isinstance(data, str):
-        # 匹配 ${VAR} 或 ${VAR:default}
-        pattern = r'\$\{([^}:]+)(?::([^}]*))?\}'
-        
-        def replacer(match):
-            var_name = match.group(1)
-            default_value = match.group(2)
-            return os.environ.get(var_name, default_value or '')
-        
-        return re.sub(pattern, replacer, data)
+        # 大多数配置值不含变量引用，直接跳过正则匹配
+        if '${' not in data:
+            return data
+        return _ENV_PATTERN.sub(_env_replacer, data)
     else:
         return data
 
 
+def _env_replacer(match: 're.Match') -> str:
+    """返回环境变量的值，未设置时使用默认值（无默认值则为空字符串）"""
+    var_name = match.group(1)
+    default_value = match.group(2)
+    return os.environ.get(var_name, default_value or '')
+
+
 def merge_configs(config: Dict, cli_args: Dict) -> Dict:
     """
     合并配置文件和 CLI 参数
@@ -110,62 +140,6 @@ def get_config_dir(config_path: str) -> str:
     return os.path.dirname(config_path)
 
 
-def load_and_validate_config(
-    config_path: str,
-    schema_class: Optional[Type['BaseModel']] = None
-) -> Dict:
-    """
-    加载并可选验证配置文件
-    
-    Args:
-        config_path: 配置文件路径
-        schema_class: 可选的 Pydantic schema 类用于验证
-        
-    Returns:
-        配置字典（如果提供 schema_class，返回验证后的数据）
-        
-    Raises:
-        ValueError: 验证失败时抛出，包含详细错误信息
-        
-    Example:
-        # 不验证（快速加载，向后兼容）
-        config = load_and_validate_config('infra.yml')
-        
-        # 带验证（推荐用于生产环境）
-        from core.schemas.config_schemas import InfraInstanceConfig
-        config = load_and_validate_config('infra.yml', InfraInstanceConfig)
-    """
-    # 加载配置
-    config = load_config(config_path)
-    
-    # 如果没有提供 schema，直接返回（向后兼容）
-    if schema_class is None:
-        return config
-    
-    # 验证配置
-    try:
-        from pydantic import ValidationError
-        validated = schema_class(**config)
-        # 返回字典形式（与现有代码兼容）
-        return validated.model_dump()
-    except ValidationError as e:
-        # 格式化错误信息
-        errors = []
-        for error in e.errors():
-            field = '.'.join(str(x) for x in error['loc'])
-            msg = error['msg']
-            input_val = error.get('input', 'N/A')
-            errors.append(f"  • {field}: {msg} (got: {input_val})")
-        
-        raise ValueError(
-            f"❌ 配置验证失败:\n" + '\n'.join(errors) +
-            f"\n\n💡 请检查配置文件: {config_path}\n"
-            f"   参考示例: config/examples/"
-        )
-    except Exception as e:
-        raise ValueError(f"配置验证错误: {str(e)}")
-
-
 def load_and_validate_config(
     config_path: str,
     schema_class: Optional[Type['BaseModel']] = None
@@ -200,11 +174,12 @@ def load_and_validate_config(
     
     # 验证配置
     try:
-        from pydantic import ValidationError
         validated = schema_class(**config)
         # 返回字典形式（与现有代码兼容）
         return validated.model_dump()
-    except ValidationError as e:
+    except Exception as e:
+        if ValidationError is None or not isinstance(e, ValidationError):
+            raise ValueError(f"配置验证错误: {str(e)}")
         # 格式化错误信息
         errors = []
         for error in e.errors():
@@ -217,5 +192,3 @@ def load_and_validate_config(
             f"❌ 配置验证失败:\n" + '\n'.join(errors) +
             f"\n\n💡 请检查配置文件: {config_path}"
         )
-    except Exception as e:
-        raise ValueError(f"配置验证错误: {str(e)}")
\ No newline at end of file
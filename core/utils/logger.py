@@ -6,6 +6,7 @@
 2. 日志格式的统一配置
 3. 控制台和文件双重输出
 4. 单例模式确保日志配置的一致性
+5. 文件与控制台输出由后台线程完成，不阻塞调用方
 
 使用方法:
     from utils.logger import get_logger
@@ -13,11 +14,28 @@
     logger.info("这是一条日志消息")
 """
 
+import atexit
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import threading
 from typing import Optional
 
+# 模块根目录与日志目录（导入时计算一次）
+_MODULE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_LOG_DIR = os.path.join(_MODULE_ROOT, 'logs')
+
+# 保护单例创建与初始化的锁
+_lock = threading.Lock()
+
+# 日志文件按天（UTC 午夜）轮转，保留的历史文件数
+LOG_FILE_NAME = 'deployment.log'
+LOG_BACKUP_COUNT = 14
+
+# 文件日志的缓冲记录数：INFO/DEBUG 攒满后一次写入，ERROR 及以上立即写入
+LOG_BUFFER_CAPACITY = 512
+
 
 class LoggerSetup:
     """
@@ -28,31 +46,42 @@ class LoggerSetup:
     属性:
         module_root (str): 模块根目录路径
         log_dir (str): 日志文件存储目录
+        buffered_handler (Optional[logging.handlers.MemoryHandler]): 文件日志缓冲处理器
+        listener (Optional[logging.handlers.QueueListener]): 后台写日志的队列监听器
         _instance (Optional[LoggerSetup]): 单例实例
         _initialized (bool): 是否已初始化标志
+        _dir_ready (bool): 日志目录是否已创建
     """
 
     _instance: Optional['LoggerSetup'] = None
     _initialized: bool = False
+    _dir_ready: bool = False
 
     def __new__(cls) -> 'LoggerSetup':
         """
-        实现单例模式
+        实现单例模式（双重检查加锁，多线程同时创建时也只有一个实例）
 
         Returns:
             LoggerSetup: 日志设置类的唯一实例
         """
         if cls._instance is None:
-            cls._instance = super(LoggerSetup, cls).__new__(cls)
+            with _lock:
+                if cls._instance is None:
+                    cls._instance = super(LoggerSetup, cls).__new__(cls)
         return cls._instance
 
     def __init__(self) -> None:
         """初始化日志设置"""
-        if not self._initialized:
-            # 获取模块根目录（deployment/ansible）
-            self.module_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            self.log_dir = os.path.join(self.module_root, 'logs')
-            self._initialized = True
+        if self._initialized:
+            return
+        with _lock:
+            if not self._initialized:
+                # 模块根目录（deployment/ansible）
+                self.module_root = _MODULE_ROOT
+                self.log_dir = _LOG_DIR
+                self.buffered_handler = None
+                self.listener = None
+                self._initialized = True
 
     def setup(self) -> logging.Logger:
         """
@@ -61,7 +90,7 @@ class LoggerSetup:
         功能：
         1. 创建日志目录
         2. 配置日志格式
-        3. 设置文件和控制台输出
+        3. 设置文件和控制台输出（由后台线程写出，调用方只负责入队）
         4. 设置日志级别
 
         Returns:
@@ -72,23 +101,47 @@ class LoggerSetup:
             Exception: 其他配置过程中的错误
         """
         try:
-            # 创建日志目录
-            os.makedirs(self.log_dir, exist_ok=True)
+            # 创建日志目录（只在首次配置时创建）
+            if not LoggerSetup._dir_ready:
+                os.makedirs(self.log_dir, exist_ok=True)
+                LoggerSetup._dir_ready = True
 
-            # 生成日志文件名（包含时间戳）
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            log_file = os.path.join(self.log_dir, f"deployment_{timestamp}.log")
+            # 日志文件名（轮转后的历史文件带日期后缀）
+            log_file = os.path.join(self.log_dir, LOG_FILE_NAME)
 
             # 配置日志格式
             formatter = logging.Formatter(
                 '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
             )
 
-            # 配置文件处理器
-            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            # 格式中只用到时间、名称、级别与消息：关闭线程/进程信息与调用位置（findCaller）的采集
+            logging.logThreads = False
+            logging.logProcesses = False
+            logging.logMultiprocessing = False
+            logging._srcfile = None
+
+            # 配置文件处理器：按时间轮转（不在每条日志写入时 stat 文件大小），
+            # delay=True 时没有日志输出就不打开文件
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                log_file,
+                when='midnight',
+                backupCount=LOG_BACKUP_COUNT,
+                encoding='utf-8',
+                delay=True,
+                utc=True
+            )
             file_handler.setFormatter(formatter)
             file_handler.setLevel(logging.INFO)
 
+            # 文件处理器外包一层缓冲，批量写入以减少 write 系统调用
+            buffered_handler = logging.handlers.MemoryHandler(
+                capacity=LOG_BUFFER_CAPACITY,
+                flushLevel=logging.ERROR,
+                target=file_handler,
+                flushOnClose=True
+            )
+            buffered_handler.setLevel(logging.INFO)
+
             # 配置控制台处理器
             console_handler = logging.StreamHandler()
             console_handler.setFormatter(formatter)
@@ -98,12 +151,19 @@ class LoggerSetup:
             logger = logging.getLogger()
             logger.setLevel(logging.INFO)
 
-            # 清除现有的处理器（避免重复）
+            # 清除现有的处理器（避免重复），先停止旧的监听器并写出缓冲中的日志
+            self.shutdown()
             logger.handlers.clear()
 
-            # 添加处理器
-            logger.addHandler(file_handler)
-            logger.addHandler(console_handler)
+            # 根日志记录器只负责入队，文件与控制台输出由监听器线程完成
+            log_queue = queue.Queue(-1)
+            listener = logging.handlers.QueueListener(
+                log_queue, buffered_handler, console_handler, respect_handler_level=True
+            )
+            logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            listener.start()
+            self.buffered_handler = buffered_handler
+            self.listener = listener
 
             return logger
 
@@ -112,6 +172,20 @@ class LoggerSetup:
         except Exception as e:
             raise Exception(f"日志系统配置失败: {str(e)}")
 
+    def flush(self) -> None:
+        """等待队列中的日志处理完毕，并将缓冲中的文件日志立即写入磁盘"""
+        if self.listener is not None:
+            self.listener.queue.join()
+        if self.buffered_handler is not None:
+            self.buffered_handler.flush()
+
+    def shutdown(self) -> None:
+        """停止队列监听器（处理完剩余日志后退出）并写出缓冲中的文件日志"""
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+        self.flush()
+
     def get_logger(self, name: str) -> logging.Logger:
         """
         获取指定名称的日志记录器
@@ -142,6 +216,19 @@ def setup_logger() -> logging.Logger:
     return _logger_setup.setup()
 
 
+def flush_logs() -> None:
+    """
+    将缓冲中的文件日志立即写入磁盘
+
+    在抛出异常或流程结束前调用，确保缓冲的日志不会丢失
+    """
+    _logger_setup.flush()
+
+
+# 解释器退出时处理完队列中的日志并写出剩余的缓冲日志
+atexit.register(_logger_setup.shutdown)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     获取指定名称的日志记录器
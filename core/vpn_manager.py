@@ -6,13 +6,74 @@ VPN 管理模块
 2. VPN 连接的测试和验证
 """
 
+import base64
+import hashlib
 import os
+import shlex
 import subprocess
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 import ansible_runner
-from .utils.logger import get_logger
+from .utils.logger import get_logger, flush_logs
+from .ansible_manager import ANSIBLE_CFG
 import time
 import json
+import logging
+
+try:
+    # 可选依赖：PyNaCl（进程内生成 Curve25519 密钥对，无需调用 wg genkey/pubkey）
+    from nacl.public import PrivateKey
+except ImportError:
+    PrivateKey = None
+
+try:
+    # 可选依赖：pyroute2（通过 netlink 查询 WireGuard 接口与路由，无需 fork wg/ip 命令）
+    from pyroute2 import IPRoute, WireGuard
+except ImportError:
+    IPRoute = WireGuard = None
+
+try:
+    # 可选依赖：icmplib（一个事件循环内并发发送 ICMP echo，无需为每个节点 fork ping）
+    import icmplib
+except ImportError:
+    icmplib = None
+
+# VPN playbook 的 ansible-runner 环境变量：使用运行时 ansible.cfg（SSH 连接复用、jsonfile 事实缓存）
+# 并启用 pipelining；gathering = smart 时缓存中已有的主机事实不再重复收集
+ANSIBLE_ENVVARS = {
+    'ANSIBLE_CONFIG': ANSIBLE_CFG,
+    'ANSIBLE_PIPELINING': 'True',
+    'ANSIBLE_GATHERING': 'smart',
+}
+
+# 控制端 WireGuard 配置与私钥文件
+WG_CONFIG_PATH = '/etc/wireguard/wg0.conf'
+WG_PRIVATE_KEY_PATH = '/etc/wireguard/private.key'
+
+# 最近一次应用到控制端的 wg0.conf 的 SHA-256，配置未变化时跳过写入与重新加载
+WG_CONFIG_DIGEST = '/etc/wireguard/.peers.sha256'
+
+# 控制端 wg0.conf 中每个对等节点的配置段
+PEER_TEMPLATE = (
+    "[Peer]\n"
+    "PublicKey = {public_key}\n"
+    "AllowedIPs = {ip}/32\n"
+    "Endpoint = {endpoint_ip}:{endpoint_port}\n"
+    "PersistentKeepalive = 25\n"
+)
+
+# 并发测试 VPN 连接的最大线程数
+MAX_VPN_TEST_WORKERS = 16
+
+# icmplib 批量 ping 的次数、间隔与超时（秒）
+PING_COUNT = 3
+PING_INTERVAL = 0.2
+PING_TIMEOUT = 2
+
+# apt 软件包列表的更新时间戳，以及无需再次 apt-get update 的有效期（秒）
+APT_UPDATE_STAMP = '/var/lib/apt/periodic/update-success-stamp'
+APT_UPDATE_MAX_AGE = 3600
 
 class VPNManager:
     def __init__(self, config: dict):
@@ -24,80 +85,191 @@ class VPNManager:
         self.internal_service_port = self.config.get('internal_service_port', 8080)
         self.controller_public_key = None
         self.controller_private_key = None
+        # 各 playbook 共用的 ansible-runner 参数
+        self._runner_kwargs = {
+            'private_data_dir': 'ansible',
+            'envvars': ANSIBLE_ENVVARS,
+        }
 
     def setup_controller_vpn(self) -> bool:
         """配置控制端（server1）的 VPN"""
         try:
-            # 1. 安装 WireGuard
-            subprocess.run(['sudo', 'apt-get', 'update'], check=True)
-            subprocess.run(['sudo', 'apt-get', 'install', '-y', 'wireguard'], check=True)
+            # 1. 安装 WireGuard（已安装时跳过）
+            self._install_wireguard()
 
-            # 2. 生成密钥
-            private_key = subprocess.run(
-                ['wg', 'genkey'],
-                capture_output=True,
-                text=True,
-                check=True
-            ).stdout.strip()
-
-            # 3. 从私钥生成公钥
-            process = subprocess.Popen(
-                ['wg', 'pubkey'],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            stdout, stderr = process.communicate(input=private_key.encode())
-            if process.returncode != 0:
-                raise Exception(f"生成公钥失败: {stderr.decode()}")
-            public_key = stdout.decode().strip()
+            # 2-3. 复用已有私钥（对等节点中记录的控制端公钥保持不变），没有时生成密钥对
+            keypair = self._load_keypair()
+            reused = keypair is not None
+            private_key, public_key = keypair if reused else self._generate_keypair()
 
             # 4. 验证密钥
             if not private_key or not public_key:
                 raise Exception("密钥生成失败")
 
             # 5. 保存密钥
-            with open('/tmp/wg_private.key', 'w') as f:
-                f.write(private_key)
-
-            subprocess.run(['sudo', 'mv', '/tmp/wg_private.key', '/etc/wireguard/private.key'], check=True)
-            subprocess.run(['sudo', 'chmod', '600', '/etc/wireguard/private.key'], check=True)
+            if not reused:
+                self._write_root(WG_PRIVATE_KEY_PATH, private_key)
 
             # 6. 设置控制端配置
             self.controller_public_key = public_key
             self.controller_private_key = private_key
 
+            # 密钥未变且接口已在运行时不重写 wg0.conf、不重启服务（保留已有握手），
+            # 由 _apply_controller_peers 根据摘要决定是否需要热加载对等节点
+            if reused and self._wireguard_interface_up():
+                subprocess.run(
+                    ['sudo', 'sysctl', '-w', 'net.ipv4.ip_forward=1', 'net.ipv4.conf.all.forwarding=1'],
+                    stdout=subprocess.DEVNULL,
+                    check=True
+                )
+                self.logger.info("控制端 WireGuard 已在运行，跳过重写配置与重启")
+                self.logger.info("控制端公钥: %s", self.controller_public_key)
+                return True
+
             # 7. 配置 wg0.conf
             config_content = f"""[Interface]
 Address = {self.controller_ip}/24
 PrivateKey = {private_key}
 ListenPort = {self.wireguard_port}
 """
-            with open('/tmp/wg0.conf', 'w') as f:
-                f.write(config_content)
-
-            subprocess.run(['sudo', 'mv', '/tmp/wg0.conf', '/etc/wireguard/wg0.conf'], check=True)
-            subprocess.run(['sudo', 'chmod', '600', '/etc/wireguard/wg0.conf'], check=True)
-
-            # 8. 启用 IP 转发
-            subprocess.run(['sudo', 'sysctl', '-w', 'net.ipv4.ip_forward=1'], check=True)
-            subprocess.run(['sudo', 'sysctl', '-w', 'net.ipv4.conf.all.forwarding=1'], check=True)
+            self._write_root(WG_CONFIG_PATH, config_content)
 
-            # 9. 启动 WireGuard
-            subprocess.run(['sudo', 'systemctl', 'enable', 'wg-quick@wg0'], check=True)
-            subprocess.run(['sudo', 'systemctl', 'restart', 'wg-quick@wg0'], check=True)
+            # 8-9. 启用 IP 转发并启动 WireGuard（一次 sudo 调用完成）
+            subprocess.run(['sudo', 'bash', '-c', ' && '.join([
+                # wg0.conf 已被重写为不含对等节点的配置，之前记录的摘要失效
+                f'rm -f {WG_CONFIG_DIGEST}',
+                'sysctl -w net.ipv4.ip_forward=1 net.ipv4.conf.all.forwarding=1',
+                'systemctl enable wg-quick@wg0',
+                'systemctl restart wg-quick@wg0',
+            ])], check=True)
 
             # 10. 验证配置
-            self.logger.info(f"控制端公钥: {self.controller_public_key}")
-            self.logger.info(f"控制端 IP: {self.controller_ip}")
+            self.logger.info("控制端公钥: %s", self.controller_public_key)
+            self.logger.info("控制端 IP: %s", self.controller_ip)
 
             self.logger.info("控制端 VPN 配置完成")
             return True
 
         except Exception as e:
-            self.logger.error(f"控制端 VPN 配置失败: {str(e)}")
+            self.logger.error("控制端 VPN 配置失败: %s", e)
+            flush_logs()
             raise
 
+    def _install_wireguard(self) -> None:
+        """
+        在控制端安装 WireGuard
+
+        已安装时直接返回；软件包列表在有效期内更新过时跳过 apt-get update
+
+        Raises:
+            subprocess.CalledProcessError: apt-get 执行失败
+        """
+        installed = subprocess.run(
+            ['dpkg', '-s', 'wireguard'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        ).returncode == 0
+        if installed:
+            self.logger.info("WireGuard 已安装，跳过安装")
+            return
+
+        try:
+            stale = time.time() - os.path.getmtime(APT_UPDATE_STAMP) > APT_UPDATE_MAX_AGE
+        except OSError:
+            stale = True
+        if stale:
+            subprocess.run(['sudo', 'apt-get', 'update'], check=True)
+
+        subprocess.run([
+            'sudo', 'apt-get', 'install', '-y', '--no-install-recommends',
+            'wireguard', 'wireguard-tools'
+        ], check=True)
+
+    def _generate_keypair(self) -> Tuple[str, str]:
+        """
+        生成 WireGuard 密钥对（base64 编码）
+
+        已安装 PyNaCl 时在进程内生成，否则调用 wg genkey / wg pubkey
+
+        Returns:
+            Tuple[str, str]: (私钥, 公钥)
+
+        Raises:
+            Exception: 生成公钥失败
+        """
+        if PrivateKey is not None:
+            key = PrivateKey.generate()
+            return (
+                base64.b64encode(bytes(key)).decode(),
+                base64.b64encode(bytes(key.public_key)).decode()
+            )
+
+        private_key = subprocess.run(
+            ['wg', 'genkey'],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+        return private_key, self._derive_public_key(private_key)
+
+    def _load_keypair(self) -> Optional[Tuple[str, str]]:
+        """
+        读取控制端已保存的私钥并推导公钥
+
+        Returns:
+            Optional[Tuple[str, str]]: (私钥, 公钥)；私钥文件不存在或为空时返回 None
+        """
+        if os.geteuid() == 0:
+            try:
+                with open(WG_PRIVATE_KEY_PATH) as f:
+                    private_key = f.read().strip()
+            except OSError:
+                return None
+        else:
+            result = subprocess.run(
+                ['sudo', 'cat', WG_PRIVATE_KEY_PATH],
+                capture_output=True,
+                text=True
+            )
+            if result.returncode != 0:
+                return None
+            private_key = result.stdout.strip()
+
+        if not private_key:
+            return None
+        self.logger.info("复用已有的控制端 WireGuard 私钥")
+        return private_key, self._derive_public_key(private_key)
+
+    def _derive_public_key(self, private_key: str) -> str:
+        """
+        由私钥计算公钥（base64 编码）
+
+        已安装 PyNaCl 时在进程内计算，否则调用 wg pubkey
+
+        Args:
+            private_key: base64 编码的私钥
+
+        Returns:
+            str: base64 编码的公钥
+
+        Raises:
+            Exception: 生成公钥失败
+        """
+        if PrivateKey is not None:
+            key = PrivateKey(base64.b64decode(private_key))
+            return base64.b64encode(bytes(key.public_key)).decode()
+
+        process = subprocess.Popen(
+            ['wg', 'pubkey'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        stdout, stderr = process.communicate(input=private_key.encode())
+        if process.returncode != 0:
+            raise Exception(f"生成公钥失败: {stderr.decode()}")
+        return stdout.decode().strip()
+
     def setup_vpn(self, hosts: Dict) -> bool:
         """配置所有节点的 VPN"""
         try:
@@ -115,11 +287,10 @@ ListenPort = {self.wireguard_port}
             if not self.controller_public_key:
                 raise Exception("控制端公钥未生成")
 
-            # 4. 配置被控端
-            result = ansible_runner.run(
-                private_data_dir='ansible',
-                playbook='playbooks/setup_wireguard.yml',
-                inventory=hosts,
+            # 4. 配置被控端（同一次执行中返回各节点生成的公钥）
+            result = self._run_playbook(
+                'playbooks/setup_wireguard.yml',
+                hosts,
                 extravars={
                     'controller_public_key': self.controller_public_key,
                     'controller_private_key': self.controller_private_key,
@@ -128,106 +299,43 @@ ListenPort = {self.wireguard_port}
                     'wireguard_port': self.wireguard_port,
                     'internal_service_port': self.internal_service_port,
                     'is_controller': False,
-                    'ansible_become': True,
-                    'ansible_become_method': 'sudo',
                     'vpn_cidr': "10.0.0.0/24"
                 },
                 verbosity=2
             )
 
             if result.status == 'successful':
-                # 5. 使用 Ansible 获取被控端的公钥
-                get_pubkey_result = ansible_runner.run(
-                    private_data_dir='ansible',
-                    playbook='playbooks/get_wireguard_pubkey.yml',
-                    inventory=hosts,
-                    extravars={
-                        'ansible_become': True,
-                        'ansible_become_method': 'sudo'
-                    },
-                    verbosity=2
-                )
+                # 5. 单次遍历同一次执行的 Ansible 事件，收集被控端的公钥（由 set_fact 设置）
+                pubkeys = {}
+                for event in result.events:
+                    if event.get('event') != 'runner_on_ok':
+                        continue
+                    event_data = event.get('event_data', {})
+                    facts = event_data.get('res', {}).get('ansible_facts', {})
+                    if 'wg_public_key' in facts:
+                        pubkeys.setdefault(event_data.get('host'), facts['wg_public_key'])
 
-                if get_pubkey_result.status == 'successful':
-                    # 从 Ansible 结果中获取公钥
-                    for host_name, host_config in hosts['all']['hosts'].items():
-                        if isinstance(host_config, dict) and 'vpn_ip' in host_config:
-                            # 从 Ansible 事件中获取公钥
-                            found_pubkey = False
-                            for event in get_pubkey_result.events:
-                                if (
-                                    event.get('event') == 'runner_on_ok' and 
-                                    event.get('event_data', {}).get('host') == host_name and
-                                    'ansible_facts' in event.get('event_data', {}).get('res', {})
-                                ):
-                                    facts = event['event_data']['res']['ansible_facts']
-                                    if 'wg_public_key' in facts:
-                                        vpn_peers[host_config['vpn_ip']] = {
-                                            'public_key': facts['wg_public_key'],
-                                            'endpoint_ip': host_config['ansible_host'],
-                                            'endpoint_port': self.wireguard_port
-                                        }
-                                        found_pubkey = True
-                                        self.logger.info(f"获取到主机 {host_name} 的公钥: {facts['wg_public_key']}")
-                                        break
-
-                            if not found_pubkey:
-                                self.logger.error(f"无法从 Ansible 结果中找到主机 {host_name} 的公钥")
-                else:
-                    self.logger.error("获取公钥失败")
-                    return False
+                for host_name, host_config in hosts['all']['hosts'].items():
+                    if isinstance(host_config, dict) and 'vpn_ip' in host_config:
+                        public_key = pubkeys.get(host_name)
+                        if public_key is None:
+                            self.logger.error("无法从 Ansible 结果中找到主机 %s 的公钥", host_name)
+                            continue
+
+                        vpn_peers[host_config['vpn_ip']] = {
+                            'public_key': public_key,
+                            'endpoint_ip': host_config['ansible_host'],
+                            'endpoint_port': self.wireguard_port
+                        }
+                        self.logger.info("获取到主机 %s 的公钥: %s", host_name, public_key)
 
                 # 调试输出 vpn_peers 内容
-                print("Debug - vpn_peers 内容:")
-                for ip, info in vpn_peers.items():
-                    print(f"{ip}: {info}")
-
-                # 6. 生成新的控制端配置文件内容
-                base_config = f"""[Interface]
-Address = {self.controller_ip}/24
-PrivateKey = {self.controller_private_key}
-ListenPort = {self.wireguard_port}
-"""
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    for ip, info in vpn_peers.items():
+                        self.logger.debug("vpn_peers 内容 - %s: %s", ip, info)
 
-                # 7. 添加对等节点配置
-                peers_config = ""
-                print("Debug - 开始生成 peers_config")
-                for ip, peer_info in vpn_peers.items():
-                    if (
-                        isinstance(peer_info, dict) and
-                        'public_key' in peer_info and
-                        'endpoint_ip' in peer_info and
-                        'endpoint_port' in peer_info
-                    ):
-                        peers_config += f"""
-                [Peer]
-                PublicKey = {peer_info['public_key']}
-                AllowedIPs = {ip}/32
-                Endpoint = {peer_info['endpoint_ip']}:{peer_info['endpoint_port']}
-                PersistentKeepalive = 25
-                """
-                    else:
-                        self.logger.warning(f"缺少必要的对等节点信息，无法添加到配置中: {ip} -> {peer_info}")
-
-                print("Debug - peers_config 内容:")
-                print(peers_config)
-
-
-                # 8. 写入新的配置到控制端
-                full_config = base_config + peers_config
-                print("Debug - 控制端配置文件内容:")  # 调试输出
-                print(full_config)
-
-                with open('/tmp/wg0.conf', 'w') as f:
-                    f.write(full_config)
-
-                # 9. 更新控制端配置并重启服务
-                subprocess.run(['sudo', 'mv', '/tmp/wg0.conf', '/etc/wireguard/wg0.conf'], check=True)
-                subprocess.run(['sudo', 'chmod', '600', '/etc/wireguard/wg0.conf'], check=True)
-                subprocess.run(['sudo', 'systemctl', 'restart', 'wg-quick@wg0'], check=True)
-
-                # 10. 等待 VPN 接口启动
-                time.sleep(5)
+                # 6-10. 生成控制端配置并热加载对等节点（配置未变化时跳过）
+                self._apply_controller_peers(vpn_peers)
 
                 # 11. 测试 VPN 连接
                 success = self.test_vpn_connections(hosts)
@@ -235,35 +343,278 @@ ListenPort = {self.wireguard_port}
                 return success
             else:
                 stderr = result.stderr.read() if result.stderr else "未知错误"
-                self.logger.error(f"VPN 配置失败，控制端公钥: {self.controller_public_key}")
-                self.logger.error(f"控制端 IP: {self.controller_ip}")
+                self.logger.error("VPN 配置失败，控制端公钥: %s", self.controller_public_key)
+                self.logger.error("控制端 IP: %s", self.controller_ip)
                 raise Exception(f"VPN 配置失败: {stderr}")
 
         except Exception as e:
-            self.logger.error(f"VPN 配置错误: {str(e)}")
+            self.logger.error("VPN 配置错误: %s", e)
             return False
 
-    def test_vpn_connection(self, target_ip: str, timeout: int = 5) -> bool:
-        """测试到指定 IP 的 VPN 连接"""
+    def _run_playbook(self, playbook: str, hosts: Dict, extravars: Optional[Dict] = None, **kwargs):
+        """
+        使用共用的 ansible-runner 参数执行 playbook（以 sudo 提权）
+
+        Args:
+            playbook: playbook 路径（相对于 private_data_dir）
+            hosts: 主机配置字典
+            extravars: 额外变量
+            **kwargs: 传给 ansible_runner.run 的其他参数
+
+        Returns:
+            ansible_runner.Runner: 执行结果
+        """
+        return ansible_runner.run(
+            private_data_dir=self._runner_kwargs['private_data_dir'],
+            envvars=dict(self._runner_kwargs['envvars']),
+            playbook=playbook,
+            inventory=hosts,
+            extravars={
+                'ansible_become': True,
+                'ansible_become_method': 'sudo',
+                **(extravars or {})
+            },
+            **kwargs
+        )
+
+    def _apply_controller_peers(self, vpn_peers: Dict) -> None:
+        """
+        生成控制端 wg0.conf（接口配置 + 对等节点）并热加载
+
+        完整配置的摘要与最近一次应用的摘要相同时跳过写入与重新加载
+
+        Args:
+            vpn_peers: {VPN IP: {'public_key', 'endpoint_ip', 'endpoint_port'}} 对等节点信息
+
+        Raises:
+            subprocess.CalledProcessError: 更新配置或重启服务失败
+        """
+        # 1. 生成新的控制端配置文件内容
+        base_config = f"""[Interface]
+Address = {self.controller_ip}/24
+PrivateKey = {self.controller_private_key}
+ListenPort = {self.wireguard_port}
+"""
+
+        # 2. 添加对等节点配置
+        peers = []
+        for ip, peer_info in vpn_peers.items():
+            if (
+                isinstance(peer_info, dict) and
+                'public_key' in peer_info and
+                'endpoint_ip' in peer_info and
+                'endpoint_port' in peer_info
+            ):
+                peers.append(PEER_TEMPLATE.format(ip=ip, **peer_info))
+            else:
+                self.logger.warning("缺少必要的对等节点信息，无法添加到配置中: %s -> %s", ip, peer_info)
+
+        peers_config = '\n'.join(peers)
+        self.logger.debug("peers_config 内容:\n%s", peers_config)
+
+        # 3. 完整配置（包含私钥，不输出；各段之间空一行）未变化时跳过
+        full_config = '\n'.join([base_config] + peers)
+        digest = hashlib.sha256(full_config.encode()).hexdigest()
+        try:
+            with open(WG_CONFIG_DIGEST) as f:
+                applied_digest = f.read().strip()
+        except OSError:
+            applied_digest = None
+        if digest == applied_digest:
+            self.logger.info("控制端 WireGuard 对等节点未变化，跳过重新加载")
+            return
+
+        # 4. 通过标准输入把接口配置直接交给内核（wg 原生格式不含 Address），
+        #    同时在后台线程把完整配置持久化到磁盘，两者互不依赖
+        wg_config = '\n'.join([
+            f"[Interface]\nPrivateKey = {self.controller_private_key}\nListenPort = {self.wireguard_port}\n"
+        ] + peers)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            persisted = executor.submit(self._write_root, WG_CONFIG_PATH, full_config)
+            synced = self._sync_wireguard(wg_config)
+            persisted.result()
+
+        # 5. 接口未启动时回退为重启服务（读取刚写入的 wg0.conf），成功后记录摘要
+        if not synced:
+            self._restart_wireguard()
+        try:
+            self._write_root(WG_CONFIG_DIGEST, digest)
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.logger.warning("记录控制端 WireGuard 配置摘要失败: %s", e)
+
+    def _write_root(self, path: str, content: str) -> None:
+        """
+        原子地写入只有 root 可读写（0600）的文件
+
+        以 root 运行时直接创建临时文件并 os.replace，不再 fork 进程；否则通过一次
+        sudo 调用从标准输入写入临时文件并 mv 替换（不在 /tmp 留下可读的副本）
+
+        Args:
+            path: 目标文件路径
+            content: 文件内容
+
+        Raises:
+            OSError: 写入失败
+            subprocess.CalledProcessError: sudo 写入失败
+        """
+        tmp_path = f'{path}.tmp'
+        if os.geteuid() == 0:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                os.write(fd, content.encode())
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, path)
+            return
+
+        subprocess.run(
+            ['sudo', 'bash', '-c',
+             f'umask 077 && cat > {shlex.quote(tmp_path)} && mv {shlex.quote(tmp_path)} {shlex.quote(path)}'],
+            input=content,
+            text=True,
+            check=True
+        )
+
+    def _run_privileged(self, commands: List[str]) -> bool:
+        """
+        通过一次 sudo bash 调用依次执行多条命令
+
+        前一条命令失败时继续执行后续命令，失败的命令记录为警告
+
+        Args:
+            commands: 要执行的 shell 命令列表
+
+        Returns:
+            bool: 所有命令是否都执行成功
+        """
+        script = '; '.join(
+            f'{command} || {{ echo "命令执行失败: {command}" >&2; rc=1; }}' for command in commands
+        )
         try:
-            # 1. 检查 WireGuard 接口
             result = subprocess.run(
-                ['sudo', 'wg', 'show', 'wg0'],
+                ['sudo', 'bash', '-c', f'rc=0; {script}; exit $rc'],
                 capture_output=True,
                 text=True
             )
-            if result.returncode != 0:
-                self.logger.error(f"无法获取 WireGuard 接口状态: {result.stderr}")
+        except OSError as e:
+            self.logger.warning("执行本地清理命令时出错: %s", e)
+            return False
+        if result.returncode != 0:
+            self.logger.warning("执行本地清理命令时出错: %s", result.stderr.strip())
+            return False
+        return True
+
+    def _sync_wireguard(self, wg_config: str) -> bool:
+        """
+        通过标准输入将 wg 原生格式的配置热加载到运行中的 wg0 接口
+
+        wg syncconf 不重建接口，已有握手与路由保持不变；配置不落临时文件
+
+        Args:
+            wg_config: wg 原生格式的接口与对等节点配置（不含 wg-quick 扩展字段）
+
+        Returns:
+            bool: 热加载是否成功（接口尚未启动时失败）
+        """
+        result = subprocess.run(
+            ['sudo', 'wg', 'syncconf', 'wg0', '/dev/stdin'],
+            input=wg_config,
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            self.logger.warning("wg syncconf 失败，重启 WireGuard 服务: %s", result.stderr)
+        return result.returncode == 0
+
+    def _restart_wireguard(self) -> None:
+        """
+        重启 wg-quick 服务并等待接口就绪（例如刚安装完成、接口尚未启动时）
+
+        Raises:
+            subprocess.CalledProcessError: 重启服务失败
+        """
+        subprocess.run(['sudo', 'systemctl', 'restart', 'wg-quick@wg0'], check=True)
+        time.sleep(5)
+
+    def _wireguard_interface_up(self) -> bool:
+        """
+        检查 wg0 接口是否存在
+
+        已安装 pyroute2 时通过 netlink 查询，失败（例如权限不足）时回退为 sudo wg show wg0
+
+        Returns:
+            bool: wg0 接口是否存在
+        """
+        if WireGuard is not None:
+            try:
+                with WireGuard() as wg:
+                    wg.info('wg0')
+                return True
+            except Exception as e:
+                self.logger.debug("通过 netlink 查询 WireGuard 接口失败: %s", e)
+
+        result = subprocess.run(
+            ['sudo', 'wg', 'show', 'wg0'],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            self.logger.error("无法获取 WireGuard 接口状态: %s", result.stderr)
+            return False
+        return True
+
+    def _has_route(self, target_ip: str) -> bool:
+        """
+        检查到目标 IP 的路由
+
+        已安装 pyroute2 时通过 netlink 查询，否则调用 ip route get
+
+        Args:
+            target_ip: 目标 IP
+
+        Returns:
+            bool: 是否存在到目标 IP 的路由
+        """
+        if IPRoute is not None:
+            try:
+                with IPRoute() as ipr:
+                    return bool(ipr.route('get', dst=target_ip))
+            except Exception as e:
+                self.logger.error("无法获取到 %s 的路由: %s", target_ip, e)
+                return False
+
+        result = subprocess.run(
+            ['sudo', 'ip', 'route', 'get', target_ip],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            self.logger.error("无法获取到 %s 的路由: %s", target_ip, result.stderr)
+            return False
+        return True
+
+    def test_vpn_connection(self, target_ip: str, timeout: int = 5,
+                            interface_up: Optional[bool] = None) -> bool:
+        """
+        测试到指定 IP 的 VPN 连接
+
+        Args:
+            target_ip: 目标 VPN IP
+            timeout: ping 超时时间（秒）
+            interface_up: 已查询的 wg0 接口状态，为 None 时在此查询
+
+        Returns:
+            bool: 是否连通
+        """
+        try:
+            # 1. 检查 WireGuard 接口
+            if interface_up is None:
+                interface_up = self._wireguard_interface_up()
+            if not interface_up:
                 return False
 
             # 2. 检查路由
-            result = subprocess.run(
-                ['sudo', 'ip', 'route', 'get', target_ip],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode != 0:
-                self.logger.error(f"无法获取到 {target_ip} 的路由: {result.stderr}")
+            if not self._has_route(target_ip):
                 return False
 
             # 3. 等待接口就绪
@@ -281,16 +632,58 @@ ListenPort = {self.wireguard_port}
 
             success = result.returncode == 0
             if success:
-                self.logger.info(f"VPN 连接到 {target_ip} 成功")
+                self.logger.info("VPN 连接到 %s 成功", target_ip)
             else:
-                self.logger.warning(f"VPN 连接到 {target_ip} 失败: {result.stderr}")
+                self.logger.warning("VPN 连接到 %s 失败: %s", target_ip, result.stderr)
 
             return success
 
         except Exception as e:
-            self.logger.error(f"测试 VPN 连接时发生错误: {str(e)}")
+            self.logger.error("测试 VPN 连接时发生错误: %s", e)
             return False
 
+    def _multiping(self, vpn_ips: List[str]) -> Optional[List[bool]]:
+        """
+        使用 icmplib 在一个事件循环内 ping 所有节点
+
+        以控制端 VPN IP 为源地址（经 wg0 发出），使用非特权 ICMP 套接字
+        （需要 net.ipv4.ping_group_range 允许当前用户）
+
+        Args:
+            vpn_ips: 节点 VPN IP 列表
+
+        Returns:
+            Optional[List[bool]]: 与 vpn_ips 顺序一致的连通结果；未安装 icmplib
+            或无法发送 ICMP 时返回 None，由调用方回退为逐个节点 ping
+        """
+        if icmplib is None:
+            return None
+
+        try:
+            subprocess.run(['sudo', 'ip', 'link', 'set', 'wg0', 'up'], check=True)
+            hosts = icmplib.multiping(
+                vpn_ips,
+                count=PING_COUNT,
+                interval=PING_INTERVAL,
+                timeout=PING_TIMEOUT,
+                source=self.controller_ip,
+                privileged=False
+            )
+        except Exception as e:
+            self.logger.debug("icmplib 批量 ping 失败，回退为逐个节点 ping: %s", e)
+            return None
+
+        alive = {host.address: host.is_alive for host in hosts}
+        results = []
+        for ip in vpn_ips:
+            if alive.get(ip, False):
+                self.logger.info("VPN 连接到 %s 成功", ip)
+                results.append(True)
+            else:
+                self.logger.warning("VPN 连接到 %s 失败", ip)
+                results.append(False)
+        return results
+
     def test_vpn_connections(self, hosts: Dict) -> bool:
         """测试所有 VPN 连接"""
         try:
@@ -305,9 +698,20 @@ ListenPort = {self.wireguard_port}
             print("VPN 连接测试报告:")
             print("=" * 50)
 
+            # WireGuard 接口状态只查询一次；已安装 icmplib 时一次批量 ping 所有节点，
+            # 否则各节点的测试并发执行；结果按原顺序输出
+            results = []
+            if vpn_ips:
+                interface_up = self._wireguard_interface_up()
+                results = self._multiping(vpn_ips) if interface_up else None
+                if results is None:
+                    test_one = partial(self.test_vpn_connection, interface_up=interface_up)
+                    with ThreadPoolExecutor(max_workers=min(MAX_VPN_TEST_WORKERS, len(vpn_ips))) as executor:
+                        results = list(executor.map(test_one, vpn_ips))
+
             success_count = 0
-            for ip in vpn_ips:
-                if self.test_vpn_connection(ip):
+            for ip, connected in zip(vpn_ips, results):
+                if connected:
                     success_count += 1
                     print(f"✓ {ip}: 连通")
                 else:
@@ -327,11 +731,11 @@ ListenPort = {self.wireguard_port}
                 self.logger.info("所有VPN连接测试通过")
                 return True
             else:
-                self.logger.warning(f"部分VPN连接测试失败: {success_count}/{len(vpn_ips)}")
+                self.logger.warning("部分VPN连接测试失败: %s/%s", success_count, len(vpn_ips))
                 return False
 
         except Exception as e:
-            self.logger.error(f"VPN连接测试失败: {str(e)}")
+            self.logger.error("VPN连接测试失败: %s", e)
             return False
 
     def get_vpn_status(self) -> str:
@@ -363,7 +767,7 @@ ListenPort = {self.wireguard_port}
             return report
 
         except Exception as e:
-            self.logger.error(f"获取 VPN 状态失败: {str(e)}")
+            self.logger.error("获取 VPN 状态失败: %s", e)
             return f"获取 VPN 状态失败: {str(e)}"
 
     def stop_vpn(self, hosts: Dict) -> bool:
@@ -379,52 +783,28 @@ ListenPort = {self.wireguard_port}
         try:
             self.logger.info("开始停止和清理 VPN 配置...")
 
-            # 1. 停止本地 WireGuard 服务
-            try:
-                subprocess.run(['sudo', 'systemctl', 'stop', 'wg-quick@wg0'], check=True)
-                subprocess.run(['sudo', 'systemctl', 'disable', 'wg-quick@wg0'], check=True)
-                self.logger.info("本地 WireGuard 服务已停止")
-            except Exception as e:
-                self.logger.warning(f"停止本地 WireGuard 服务时出错: {str(e)}")
-
-            # 2. 删除本地 WireGuard 配置
-            try:
-                subprocess.run(['sudo', 'rm', '-f', '/etc/wireguard/wg0.conf'], check=True)
-                subprocess.run(['sudo', 'rm', '-f', '/etc/wireguard/private.key'], check=True)
-                self.logger.info("本地 WireGuard 配置已清理")
-            except Exception as e:
-                self.logger.warning(f"清理本地 WireGuard 配置时出错: {str(e)}")
+            # 1-2. 停止本地 WireGuard 服务并删除配置（一次 sudo 调用，前一步失败也继续清理）
+            if self._run_privileged([
+                'systemctl stop wg-quick@wg0',
+                'systemctl disable wg-quick@wg0',
+                'rm -f /etc/wireguard/wg0.conf /etc/wireguard/private.key',
+            ]):
+                self.logger.info("本地 WireGuard 服务已停止，配置已清理")
 
             # 3. 停止并清理远程节点的 WireGuard 配置
-            result = ansible_runner.run(
-                private_data_dir='ansible',
-                playbook='playbooks/stop_wireguard.yml',
-                inventory=hosts,
-                extravars={
-                    'ansible_become': True,
-                    'ansible_become_method': 'sudo'
-                }
-            )
+            result = self._run_playbook('playbooks/stop_wireguard.yml', hosts)
 
             if result.status != 'successful':
                 stderr = result.stderr.read() if result.stderr else "未知错误"
-                self.logger.error(f"远程 VPN 清理失败: {stderr}")
+                self.logger.error("远程 VPN 清理失败: %s", stderr)
                 return False
 
-            # 4. 禁用 IP 转发
-            try:
-                subprocess.run(['sudo', 'sysctl', '-w', 'net.ipv4.ip_forward=0'], check=True)
-                subprocess.run(['sudo', 'sysctl', '-w', 'net.ipv4.conf.all.forwarding=0'], check=True)
-                self.logger.info("IP 转发已禁用")
-            except Exception as e:
-                self.logger.warning(f"禁用 IP 转发时出错: {str(e)}")
-
-            # 5. 删除 WireGuard 接口
-            try:
-                subprocess.run(['sudo', 'ip', 'link', 'delete', 'wg0'], check=False)
-                self.logger.info("WireGuard 接口已删除")
-            except Exception as e:
-                self.logger.warning(f"删除 WireGuard 接口时出错: {str(e)}")
+            # 4-5. 禁用 IP 转发并删除 WireGuard 接口（接口可能已随服务停止而删除）
+            if self._run_privileged([
+                'sysctl -w net.ipv4.ip_forward=0 net.ipv4.conf.all.forwarding=0',
+                'ip link delete wg0 2>/dev/null || true',
+            ]):
+                self.logger.info("IP 转发已禁用，WireGuard 接口已删除")
 
             self.logger.info("""
 VPN 配置已完全清理！
@@ -440,5 +820,8 @@ VPN 配置已完全清理！
             return True
 
         except Exception as e:
-            self.logger.error(f"VPN 清理失败: {str(e)}")
-            return False
\ No newline at end of file
+            self.logger.error("VPN 清理失败: %s", e)
+            return False
+
+        finally:
+            flush_logs()
\ No newline at end of file
@@ -5,12 +5,26 @@
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 import ansible_runner
+from core.ansible_manager import ANSIBLE_CFG
 from core.base_manager import BaseServiceManager
 from core.security_manager import SecurityManager
 
 
+# ansible-runner 环境变量：使用运行时 ansible.cfg（SSH ControlMaster/ControlPersist），
+# 并强制启用 pipelining，每台主机每次 playbook 执行只建立一次 SSH 连接
+ANSIBLE_ENVVARS = {
+    'ANSIBLE_CONFIG': ANSIBLE_CFG,
+    'ANSIBLE_PIPELINING': 'True',
+    'ANSIBLE_HOST_KEY_CHECKING': 'False',
+}
+
+# playbook 查找目录（相对于 ansible_dir，按顺序查找）
+PLAYBOOK_DIRS = ('playbooks/data_collector', 'playbooks/common')
+
+
 class DataCollectorDeployer(BaseServiceManager):
     """
     数据采集部署器
@@ -25,6 +39,7 @@ class DataCollectorDeployer(BaseServiceManager):
     SERVICE_NAME = "data-collector"
     DEFAULT_METRICS_PORT = 8000
     DEFAULT_API_PORT_OFFSET = 500
+    DEFAULT_DEPLOY_CONCURRENCY = 10
     
     def __init__(self, config: Dict):
         """
@@ -38,9 +53,21 @@ class DataCollectorDeployer(BaseServiceManager):
                 - exchange: 交易所名称（如 gateio, mexc）
                 - pairs: 交易对列表
                 - metrics_port: Prometheus 指标端口
+                - deploy_concurrency: 并行处理的最大主机数
         """
         super().__init__(config)
         self.ansible_dir = config.get('ansible_dir', 'ansible')
+        self._ansible_dir_abs = os.path.abspath(self.ansible_dir)
+        
+        # SSH 连接参数（每次执行 playbook、查询状态与日志时复用）
+        self._ssh_key_path = os.path.expanduser(config.get('ssh_key_path', '~/.ssh/lightsail_key.pem'))
+        self._ssh_user = config.get('ssh_user', 'ubuntu')
+        self._ssh_port = int(config.get('ssh_port', 22))
+        # 服务状态检查默认连接安全加固后的 SSH 端口
+        self._status_ssh_port = int(config.get('ssh_port', 6677))
+        self._ssh_common_args = '-o StrictHostKeyChecking=no'
+        # playbook 名称 -> 绝对路径
+        self._playbook_cache: Dict[str, str] = {}
         
         # GitHub 配置
         self.github_repo = config.get('github_repo', 'https://github.com/hummingbot/quants-lab.git')
@@ -68,6 +95,7 @@ class DataCollectorDeployer(BaseServiceManager):
             (self.metrics_port or self.DEFAULT_METRICS_PORT) + self.DEFAULT_API_PORT_OFFSET
         )
         self.force_skip_security = config.get('force_skip_security', True)
+        self.deploy_concurrency = int(config.get('deploy_concurrency', self.DEFAULT_DEPLOY_CONCURRENCY))
         
         # Conda 配置
         self.conda_dir = config.get('conda_dir', '/opt/miniconda3')
@@ -79,7 +107,7 @@ class DataCollectorDeployer(BaseServiceManager):
         """
         部署数据采集服务到指定主机
         
-        部署流程：
+        部署流程（1-6 由 site_deploy.yml 在一次 playbook 执行中完成）：
         1. 安装 Miniconda
         2. Clone quants-lab 仓库
         3. 创建 conda 环境
@@ -91,11 +119,12 @@ class DataCollectorDeployer(BaseServiceManager):
         Args:
             hosts: 目标主机列表
             **kwargs: 额外参数
-                - vpn_ip: VPN IP 地址
+                - vpn_ip: VPN IP 地址（所有主机相同时为字符串，否则为 {主机: VPN IP} 字典）
                 - exchange: 交易所名称（覆盖默认）
                 - pairs: 交易对列表（覆盖默认）
                 - skip_monitoring: 跳过监控配置
                 - skip_security: 跳过安全配置
+                - isolate_hosts: 每台主机单独执行部署 playbook（主机之间并行）
         
         Returns:
             bool: 部署是否成功
@@ -129,64 +158,103 @@ class DataCollectorDeployer(BaseServiceManager):
             self.logger.error("trading pairs list is required")
             return False
         
-        for host in hosts:
-            try:
-                self.logger.info(f"[{host}] Deploying {exchange} data collector...")
-                
-                # Step 1: 设置环境
-                if not self._setup_environment(host):
-                    self.logger.error(f"[{host}] Environment setup failed")
-                    return False
-                
-                # Step 2: Clone 仓库
-                if not self._clone_repository(host):
-                    self.logger.error(f"[{host}] Repository clone failed")
-                    return False
-                
-                # Step 3: 设置 Conda 环境
-                if not self._setup_conda_environment(host):
-                    self.logger.error(f"[{host}] Conda environment setup failed")
-                    return False
-                
-                # Step 4: 部署配置
-                if not self._deploy_config(host, exchange, pairs):
-                    self.logger.error(f"[{host}] Config deployment failed")
-                    return False
-                
-                # Step 5: 创建 systemd 服务
-                if not self._setup_systemd_service(host, exchange, vpn_ip):
-                    self.logger.error(f"[{host}] Systemd service setup failed")
-                    return False
-                
-                # Step 6: 启动服务
-                if not self._start_collector_service(host, exchange, vpn_ip):
-                    self.logger.error(f"[{host}] Service start failed")
-                    return False
-                
-                # Step 7: 配置监控（可选）
-                if not skip_monitoring:
-                    if not self._setup_monitoring(host, vpn_ip, exchange):
-                        self.logger.warning(f"[{host}] Monitoring setup failed, continuing...")
-                
-                # Step 8: 配置安全（可选，默认跳过）
-                if not skip_security:
-                    if not self._configure_security(host, vpn_ip):
-                        self.logger.warning(f"[{host}] Security configuration failed, continuing...")
-                
-                self.logger.info(f"[{host}] ✅ Deployment successful!")
-                self.logger.info(
-                    f"[{host}] Metrics: http://{vpn_ip}:{self.metrics_port}/metrics (bind: {self.metrics_bind_host})"
-                )
-                
-            except Exception as e:
-                self.logger.error(f"[{host}] Deployment failed: {e}")
-                import traceback
-                self.logger.error(traceback.format_exc())
+        # 主机相关的变量放入 inventory 主机变量，每个步骤对所有主机只执行一次 playbook
+        if isinstance(vpn_ip, dict):
+            vpn_ips = {host: vpn_ip.get(host) for host in hosts}
+            missing = [host for host, ip in vpn_ips.items() if not ip]
+            if missing:
+                self.logger.error(f"vpn_ip is missing for host(s): {', '.join(missing)}")
+                return False
+        else:
+            vpn_ips = {host: vpn_ip for host in hosts}
+        
+        isolate_hosts = kwargs.get('isolate_hosts', False)
+        
+        target = ', '.join(hosts)
+        try:
+            self.logger.info(f"[{target}] Deploying {exchange} data collector...")
+            
+            # Step 1-6: 环境、仓库、Conda 环境、配置、systemd 服务与启动合并为一次 playbook 执行
+            if not isolate_hosts and not self._run_site_deploy(hosts, exchange, pairs, vpn_ips):
+                self.logger.error(f"[{target}] Deployment playbook failed")
+                return False
+            
+            # 各主机的后续步骤互不依赖（以 SSH 等待为主），按 deploy_concurrency 并行执行
+            with ThreadPoolExecutor(max_workers=min(self.deploy_concurrency, len(hosts))) as executor:
+                futures = {
+                    host: executor.submit(
+                        self._deploy_single, host, exchange, pairs, vpn_ips[host],
+                        skip_monitoring, skip_security, isolate_hosts
+                    )
+                    for host in hosts
+                }
+            
+            failed = [host for host, future in futures.items() if not future.result()]
+            if failed:
+                self.logger.error(f"Deployment failed on host(s): {', '.join(failed)}")
                 return False
+            
+        except Exception as e:
+            self.logger.error(f"[{target}] Deployment failed: {e}")
+            import traceback
+            self.logger.error(traceback.format_exc())
+            return False
         
         self.logger.info("All deployments completed successfully!")
         return True
     
+    def _deploy_single(
+        self,
+        host: str,
+        exchange: str,
+        pairs: List[str],
+        vpn_ip: str,
+        skip_monitoring: bool,
+        skip_security: bool,
+        run_playbook: bool = False
+    ) -> bool:
+        """
+        完成单台主机的部署（在线程池中执行）
+        
+        Args:
+            host: 目标主机
+            exchange: 交易所名称
+            pairs: 交易对列表
+            vpn_ip: 该主机的 VPN IP
+            skip_monitoring: 跳过监控配置
+            skip_security: 跳过安全配置
+            run_playbook: 是否先对该主机单独执行部署 playbook
+        
+        Returns:
+            bool: 部署是否成功
+        """
+        try:
+            if run_playbook and not self._run_site_deploy([host], exchange, pairs, {host: vpn_ip}):
+                self.logger.error(f"[{host}] Deployment playbook failed")
+                return False
+            
+            # Step 7: 配置监控（可选）
+            if not skip_monitoring:
+                if not self._setup_monitoring(host, vpn_ip, exchange):
+                    self.logger.warning(f"[{host}] Monitoring setup failed, continuing...")
+            
+            # Step 8: 配置安全（可选，默认跳过）
+            if not skip_security:
+                if not self._configure_security(host, vpn_ip):
+                    self.logger.warning(f"[{host}] Security configuration failed, continuing...")
+            
+            self.logger.info(f"[{host}] ✅ Deployment successful!")
+            self.logger.info(
+                f"[{host}] Metrics: http://{vpn_ip}:{self.metrics_port}/metrics (bind: {self.metrics_bind_host})"
+            )
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"[{host}] Deployment failed: {e}")
+            import traceback
+            self.logger.error(traceback.format_exc())
+            return False
+    
     def start(self, instance_id: str) -> bool:
         """
         启动数据采集实例
@@ -311,25 +379,9 @@ class DataCollectorDeployer(BaseServiceManager):
             # 检查数据文件
             data_being_written = self._check_data_output(host)
             
-            if service_running and (not vpn_ip or metrics_available):
-                status = 'healthy'
-                message = f'{instance_id} is running normally'
-            elif service_running:
-                status = 'degraded'
-                message = f'{instance_id} is running but metrics not available'
-            else:
-                status = 'unhealthy'
-                message = f'{instance_id} service is not running'
-            
-            return {
-                'status': status,
-                'metrics': {
-                    'service_running': service_running,
-                    'metrics_available': metrics_available,
-                    'data_being_written': data_being_written,
-                },
-                'message': message
-            }
+            return self._health_result(
+                instance_id, bool(vpn_ip), service_running, metrics_available, data_being_written
+            )
             
         except Exception as e:
             self.logger.error(f"Health check error for {instance_id}: {e}")
@@ -339,6 +391,91 @@ class DataCollectorDeployer(BaseServiceManager):
                 'message': f'Error: {str(e)}'
             }
     
+    def health_check_many(
+        self,
+        instance_ids: List[str],
+        vpn_ips: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Dict]:
+        """
+        批量检查多个数据采集实例的健康状态
+        
+        所有主机的服务状态通过一次 playbook 执行查询，metrics 端点并行探测
+        
+        Args:
+            instance_ids: 实例 ID 列表
+            vpn_ips: {主机: VPN IP}，未指定的主机使用配置中的 vpn_ip
+        
+        Returns:
+            Dict[str, Dict]: {实例 ID: 健康状态信息}（格式与 health_check 相同）
+        """
+        self.logger.info(f"Checking health of {len(instance_ids)} instance(s)...")
+        
+        try:
+            instances = {instance_id: self._parse_instance_id(instance_id) for instance_id in instance_ids}
+            services: Dict[str, List[str]] = {}
+            for host, exchange in instances.values():
+                services.setdefault(host, []).append(f"quants-lab-{exchange}-collector")
+            
+            # 检查 systemd 服务状态（一次 playbook 执行覆盖所有主机）
+            active = self._check_service_statuses(services)
+            
+            # 检查 metrics 端点（同一 VPN IP 只探测一次）
+            host_vpn_ips = {
+                host: (vpn_ips or {}).get(host, self.config.get('vpn_ip'))
+                for host in services
+            }
+            metrics = self._check_metrics_endpoints(
+                {vpn_ip for vpn_ip in host_vpn_ips.values() if vpn_ip}, self.metrics_port
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Health check error: {e}")
+            return {
+                instance_id: {'status': 'unknown', 'metrics': {}, 'message': f'Error: {str(e)}'}
+                for instance_id in instance_ids
+            }
+        
+        results = {}
+        for instance_id, (host, exchange) in instances.items():
+            vpn_ip = host_vpn_ips[host]
+            results[instance_id] = self._health_result(
+                instance_id,
+                bool(vpn_ip),
+                f"quants-lab-{exchange}-collector" in active.get(host, set()),
+                metrics.get(vpn_ip, False),
+                self._check_data_output(host)
+            )
+        return results
+    
+    def _health_result(
+        self,
+        instance_id: str,
+        has_vpn_ip: bool,
+        service_running: bool,
+        metrics_available: bool,
+        data_being_written: bool
+    ) -> Dict:
+        """根据各项检查结果生成健康状态信息"""
+        if service_running and (not has_vpn_ip or metrics_available):
+            status = 'healthy'
+            message = f'{instance_id} is running normally'
+        elif service_running:
+            status = 'degraded'
+            message = f'{instance_id} is running but metrics not available'
+        else:
+            status = 'unhealthy'
+            message = f'{instance_id} service is not running'
+        
+        return {
+            'status': status,
+            'metrics': {
+                'service_running': service_running,
+                'metrics_available': metrics_available,
+                'data_being_written': data_being_written,
+            },
+            'message': message
+        }
+    
     def get_logs(self, instance_id: str, lines: int = 100) -> str:
         """
         获取数据采集实例日志
@@ -358,15 +495,10 @@ class DataCollectorDeployer(BaseServiceManager):
             
             # 使用 SSH 获取日志
             import subprocess
-            ssh_key = self.config.get('ssh_key_path', '~/.ssh/lightsail_key.pem')
-            ssh_port = self.config.get('ssh_port', 22)
-            ssh_user = self.config.get('ssh_user', 'ubuntu')
-            
-            ssh_key = os.path.expanduser(ssh_key)
             
             cmd = [
-                'ssh', '-i', ssh_key, '-p', str(ssh_port),
-                f'{ssh_user}@{host}',
+                'ssh', '-i', self._ssh_key_path, '-p', str(self._ssh_port),
+                f'{self._ssh_user}@{host}',
                 f'tail -n {lines} {log_file}'
             ]
             
@@ -377,8 +509,8 @@ class DataCollectorDeployer(BaseServiceManager):
             # 如果文件日志为空，尝试 journalctl 作为后备
             if not output.strip():
                 jcmd = [
-                    'ssh', '-i', ssh_key, '-p', str(ssh_port),
-                    f'{ssh_user}@{host}',
+                    'ssh', '-i', self._ssh_key_path, '-p', str(self._ssh_port),
+                    f'{self._ssh_user}@{host}',
                     f'journalctl -u quants-lab-{exchange}-collector -n {lines} --no-pager'
                 ]
                 jresult = subprocess.run(jcmd, capture_output=True, timeout=10, text=True)
@@ -428,10 +560,7 @@ class DataCollectorDeployer(BaseServiceManager):
             result = self._run_ansible_playbook(
                 'clone_quantslab_repo.yml',
                 [host],
-                {
-                    'github_repo': self.github_repo,
-                    'github_branch': self.github_branch
-                }
+                self._repository_vars()
             )
             
             if not result:
@@ -463,95 +592,137 @@ class DataCollectorDeployer(BaseServiceManager):
     
     # 辅助方法
     
-    def _setup_environment(self, host: str) -> bool:
+    def _setup_environment(self, hosts: List[str]) -> bool:
         """设置基础环境（Miniconda + 目录）"""
-        self.logger.info(f"[{host}] Setting up environment...")
+        self.logger.info(f"[{', '.join(hosts)}] Setting up environment...")
         
         try:
             return self._run_ansible_playbook(
                 'setup_data_collector_environment.yml',
-                [host],
+                hosts,
                 {}
             )
         except Exception as e:
-            self.logger.error(f"[{host}] Environment setup error: {e}")
+            self.logger.error(f"[{', '.join(hosts)}] Environment setup error: {e}")
             return False
     
-    def _clone_repository(self, host: str) -> bool:
+    def _run_site_deploy(
+        self,
+        hosts: List[str],
+        exchange: str,
+        pairs: List[str],
+        vpn_ips: Dict[str, str]
+    ) -> bool:
+        """
+        通过 site_deploy.yml 一次执行全部部署阶段
+        
+        各阶段的变量合并为一份 extravars，ansible-runner 只启动一次
+        
+        Args:
+            hosts: 目标主机列表
+            exchange: 交易所名称
+            pairs: 交易对列表
+            vpn_ips: {主机: VPN IP}
+        
+        Returns:
+            bool: 部署是否成功
+        """
+        self.logger.info(f"[{', '.join(hosts)}] Running deployment playbook...")
+        
+        return self._run_ansible_playbook(
+            'site_deploy.yml',
+            hosts,
+            {
+                **self._repository_vars(),
+                'recreate_env': True,
+                **self._config_vars(exchange, pairs),
+                **self._service_vars(exchange)
+            },
+            host_vars={host: {'vpn_ip': vpn_ips[host]} for host in hosts}
+        )
+    
+    def _repository_vars(self) -> Dict:
+        """仓库克隆所需的变量"""
+        return {
+            'github_repo': self.github_repo,
+            'github_branch': self.github_branch
+        }
+    
+    def _config_vars(self, exchange: str, pairs: List[str]) -> Dict:
+        """采集器配置文件所需的变量"""
+        # 获取交易所特定配置
+        exchange_config = self.config.get('exchanges', {}).get(exchange, {})
+        
+        return {
+            'exchange': exchange,
+            'trading_pairs': pairs,
+            'depth_limit': exchange_config.get('depth_limit', 100),
+            'snapshot_interval': exchange_config.get('snapshot_interval', 300),
+            'buffer_size': exchange_config.get('buffer_size', 100),
+            'flush_interval': exchange_config.get('flush_interval', 10.0),
+            'gap_warning_threshold': exchange_config.get('gap_warning_threshold', 50),
+            'output_dir': self.config.get('output_dir', '/data/orderbook_ticks')
+        }
+    
+    def _service_vars(self, exchange: str) -> Dict:
+        """systemd 服务与启动所需的变量（不含各主机不同的 vpn_ip）"""
+        return {
+            'exchange': exchange,
+            'metrics_port': self.metrics_port,
+            'metrics_bind_host': self.metrics_bind_host,
+            'api_port': self.api_port
+        }
+    
+    def _clone_repository(self, hosts: List[str]) -> bool:
         """克隆 quants-lab 仓库"""
-        self.logger.info(f"[{host}] Cloning quants-lab repository...")
+        self.logger.info(f"[{', '.join(hosts)}] Cloning quants-lab repository...")
         
         return self._run_ansible_playbook(
             'clone_quantslab_repo.yml',
-            [host],
-            {
-                'github_repo': self.github_repo,
-                'github_branch': self.github_branch
-            }
+            hosts,
+            self._repository_vars()
         )
     
-    def _setup_conda_environment(self, host: str) -> bool:
+    def _setup_conda_environment(self, hosts: List[str]) -> bool:
         """设置 conda 环境"""
-        self.logger.info(f"[{host}] Setting up conda environment...")
+        self.logger.info(f"[{', '.join(hosts)}] Setting up conda environment...")
         
         return self._run_ansible_playbook(
             'setup_conda_environment.yml',
-            [host],
+            hosts,
             {'recreate_env': True}
         )
     
-    def _deploy_config(self, host: str, exchange: str, pairs: List[str]) -> bool:
+    def _deploy_config(self, hosts: List[str], exchange: str, pairs: List[str]) -> bool:
         """部署配置文件"""
-        self.logger.info(f"[{host}] Deploying {exchange} configuration...")
-        
-        # 获取交易所特定配置
-        exchange_config = self.config.get('exchanges', {}).get(exchange, {})
+        self.logger.info(f"[{', '.join(hosts)}] Deploying {exchange} configuration...")
         
         return self._run_ansible_playbook(
             'deploy_data_collector_config.yml',
-            [host],
-            {
-                'exchange': exchange,
-                'trading_pairs': pairs,
-                'depth_limit': exchange_config.get('depth_limit', 100),
-                'snapshot_interval': exchange_config.get('snapshot_interval', 300),
-                'buffer_size': exchange_config.get('buffer_size', 100),
-                'flush_interval': exchange_config.get('flush_interval', 10.0),
-                'gap_warning_threshold': exchange_config.get('gap_warning_threshold', 50),
-                'output_dir': self.config.get('output_dir', '/data/orderbook_ticks')
-            }
+            hosts,
+            self._config_vars(exchange, pairs)
         )
     
-    def _setup_systemd_service(self, host: str, exchange: str, vpn_ip: str) -> bool:
-        """创建 systemd 服务"""
-        self.logger.info(f"[{host}] Creating systemd service...")
+    def _setup_systemd_service(self, hosts: List[str], exchange: str, vpn_ips: Dict[str, str]) -> bool:
+        """创建 systemd 服务（vpn_ips 为 {主机: VPN IP}，作为主机变量传入）"""
+        self.logger.info(f"[{', '.join(hosts)}] Creating systemd service...")
         
         return self._run_ansible_playbook(
             'setup_systemd_service.yml',
-            [host],
-            {
-                'exchange': exchange,
-                'vpn_ip': vpn_ip,
-                'metrics_port': self.metrics_port,
-                'metrics_bind_host': self.metrics_bind_host,
-                'api_port': self.api_port
-            }
+            hosts,
+            self._service_vars(exchange),
+            host_vars={host: {'vpn_ip': vpn_ips[host]} for host in hosts}
         )
     
-    def _start_collector_service(self, host: str, exchange: str, vpn_ip: str) -> bool:
-        """启动采集器服务"""
-        self.logger.info(f"[{host}] Starting {exchange} collector service...")
+    def _start_collector_service(self, hosts: List[str], exchange: str, vpn_ips: Dict[str, str]) -> bool:
+        """启动采集器服务（vpn_ips 为 {主机: VPN IP}，作为主机变量传入）"""
+        self.logger.info(f"[{', '.join(hosts)}] Starting {exchange} collector service...")
         
         return self._run_ansible_playbook(
             'start_data_collector.yml',
-            [host],
-            {
-                'exchange': exchange,
-                'vpn_ip': vpn_ip,
-                'metrics_port': self.metrics_port,
-                'metrics_bind_host': self.metrics_bind_host,
-                'api_port': self.api_port
-            }
+            hosts,
+            self._service_vars(exchange),
+            host_vars={host: {'vpn_ip': vpn_ips[host]} for host in hosts}
         )
     
     def _setup_monitoring(self, host: str, vpn_ip: str, exchange: str) -> bool:
@@ -573,9 +744,9 @@ class DataCollectorDeployer(BaseServiceManager):
                 'ssh_port': self.config.get('ssh_port', 22),
                 'vpn_network': self.config.get('vpn_network', '10.0.0.0/24')
             }
-            # 为 E2E 保持 SSH 22 端口开放（防火墙规则已包含 fallback）
-            if 'public_ports' not in self.config:
-                self.config['public_ports'] = [{'port': 22, 'proto': 'tcp', 'comment': 'SSH management'}]
+            # 为 E2E 保持 SSH 22 端口开放（防火墙规则已包含 fallback）；
+            # setdefault 是原子操作，多台主机并行配置时不会互相覆盖
+            self.config.setdefault('public_ports', [{'port': 22, 'proto': 'tcp', 'comment': 'SSH management'}])
             
             security_manager = SecurityManager(security_config)
             
@@ -597,15 +768,12 @@ class DataCollectorDeployer(BaseServiceManager):
         """检查 systemd 服务状态"""
         try:
             import subprocess
-            ssh_key = os.path.expanduser(self.config.get('ssh_key_path', '~/.ssh/lightsail_key.pem'))
-            ssh_port = self.config.get('ssh_port', 6677)
-            ssh_user = self.config.get('ssh_user', 'ubuntu')
             
             service_name = f"quants-lab-{exchange}-collector"
             
             cmd = [
-                'ssh', '-i', ssh_key, '-p', str(ssh_port),
-                f'{ssh_user}@{host}',
+                'ssh', '-i', self._ssh_key_path, '-p', str(self._status_ssh_port),
+                f'{self._ssh_user}@{host}',
                 f'systemctl is-active {service_name}'
             ]
             
@@ -614,6 +782,51 @@ class DataCollectorDeployer(BaseServiceManager):
         except:
             return False
     
+    def _check_service_statuses(self, services: Dict[str, List[str]]) -> Dict[str, set]:
+        """
+        通过一次 playbook 执行查询多台主机上的 systemd 服务状态
+        
+        Args:
+            services: {主机: 服务名列表}
+        
+        Returns:
+            Dict[str, set]: {主机: 处于 active 状态的服务名}（不可达的主机为空集合）
+        """
+        result = self._execute_playbook(
+            'check_collector_status.yml',
+            list(services),
+            host_vars={host: {'collector_services': names} for host, names in services.items()}
+        )
+        
+        active = {host: set() for host in services}
+        for event in result.events:
+            if event.get('event') != 'runner_on_ok':
+                continue
+            event_data = event.get('event_data', {})
+            host = event_data.get('host')
+            for item in event_data.get('res', {}).get('results', []):
+                if item.get('stdout', '').strip() == 'active':
+                    active.setdefault(host, set()).add(item.get('item'))
+        return active
+    
+    def _check_metrics_endpoints(self, vpn_ips, port: int) -> Dict[str, bool]:
+        """
+        并行检查多个 metrics 端点
+        
+        Args:
+            vpn_ips: VPN IP 集合
+            port: metrics 端口
+        
+        Returns:
+            Dict[str, bool]: {VPN IP: 端点是否可用}
+        """
+        vpn_ips = list(vpn_ips)
+        if not vpn_ips:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.deploy_concurrency, len(vpn_ips))) as executor:
+            available = executor.map(lambda vpn_ip: self._check_metrics_endpoint(vpn_ip, port), vpn_ips)
+            return dict(zip(vpn_ips, available))
+    
     def _check_metrics_endpoint(self, vpn_ip: str, port: int) -> bool:
         """检查 metrics 端点"""
         try:
@@ -648,93 +861,66 @@ class DataCollectorDeployer(BaseServiceManager):
             # 简单格式：假设是 host
             return instance_id, self.exchange
     
+    def _resolve_playbook(self, playbook: str) -> str:
+        """
+        查找 playbook 文件（依次查找 data_collector 与 common 目录），结果按名称缓存
+        
+        Args:
+            playbook: playbook 文件名
+        
+        Returns:
+            str: playbook 的绝对路径
+        
+        Raises:
+            FileNotFoundError: 所有目录中都不存在该 playbook
+        """
+        path = self._playbook_cache.get(playbook)
+        if path is not None:
+            return path
+        
+        for subdir in PLAYBOOK_DIRS:
+            candidate = os.path.join(self._ansible_dir_abs, subdir, playbook)
+            if os.path.isfile(candidate):
+                self._playbook_cache[playbook] = candidate
+                return candidate
+        
+        raise FileNotFoundError(f"Playbook {playbook} not found in any location")
+    
     def _run_ansible_playbook(
         self,
         playbook: str,
         hosts: List[str],
-        extra_vars: Optional[Dict] = None
+        extra_vars: Optional[Dict] = None,
+        host_vars: Optional[Dict[str, Dict]] = None
     ) -> bool:
-        """运行 Ansible playbook"""
+        """
+        对所有主机运行一次 Ansible playbook（由 Ansible 按 forks 并行执行）
+        
+        Args:
+            playbook: playbook 文件名
+            hosts: 目标主机列表
+            extra_vars: 所有主机共用的变量
+            host_vars: {主机: 变量} 各主机不同的变量，写入 inventory 主机变量
+                （extravars 优先级最高，因此主机相关的变量不能放入 extra_vars）
+        
+        Returns:
+            bool: 执行是否成功
+        """
         try:
-            # 配置 SSH 连接参数
-            ssh_key_path = self.config.get('ssh_key_path', '~/.ssh/lightsail_key.pem')
-            ssh_user = self.config.get('ssh_user', 'ubuntu')
-            ssh_port = self.config.get('ssh_port', 22)
-            
-            # 展开路径中的 ~
-            ssh_key_path = os.path.expanduser(ssh_key_path)
-            
-            # 获取 ansible_dir 的绝对路径
-            ansible_dir = self.ansible_dir
-            if not os.path.isabs(ansible_dir):
-                ansible_dir = os.path.abspath(ansible_dir)
-            
-            inventory = {
-                'all': {
-                    'hosts': {
-                        host: {
-                            'ansible_host': host,
-                            'ansible_user': ssh_user,
-                            'ansible_port': ssh_port,
-                            'ansible_ssh_private_key_file': ssh_key_path,
-                            'ansible_ssh_common_args': '-o StrictHostKeyChecking=no'
-                        } for host in hosts
-                    }
-                }
-            }
+            try:
+                result = self._execute_playbook(playbook, hosts, extra_vars, host_vars)
+            except FileNotFoundError as e:
+                self.logger.error(str(e))
+                return False
             
-            # 尝试多个 playbook 路径
-            playbook_paths = [
-                f'playbooks/data_collector/{playbook}',
-                f'playbooks/common/{playbook}'
-            ]
+            if result.status == 'successful':
+                return True
             
-            last_error = None
-            for playbook_path in playbook_paths:
-                try:
-                    result = ansible_runner.run(
-                        private_data_dir=ansible_dir,
-                        playbook=playbook_path,
-                        inventory=inventory,
-                        extravars={
-                            'ansible_become': True,
-                            'ansible_become_method': 'sudo',
-                            **(extra_vars or {})
-                        },
-                        verbosity=1
-                    )
-                    
-                    if result.status == 'successful':
-                        return True
-                    elif result.status == 'failed':
-                        last_error = {
-                            'path': playbook_path,
-                            'status': result.status
-                        }
-                        # 检查是否是文件不存在
-                        if result.stdout:
-                            stdout_content = result.stdout.read()
-                            if 'could not be found' in stdout_content:
-                                continue
-                        # 真正的执行错误
-                        self.logger.error(f"Playbook {playbook} execution failed")
-                        if result.stdout:
-                            self.logger.error(f"Stdout: {result.stdout.read()}")
-                        if result.stderr:
-                            self.logger.error(f"Stderr: {result.stderr.read()}")
-                        return False
-                    
-                except FileNotFoundError:
-                    continue
-                except Exception as e:
-                    self.logger.warning(f"Error trying {playbook_path}: {e}")
-                    continue
-            
-            # 所有路径都失败了
-            if last_error:
-                self.logger.error(f"Playbook {playbook} failed: {last_error}")
-            else:
-                self.logger.error(f"Playbook {playbook} not found in any location")
+            self.logger.error(f"Playbook {playbook} execution failed: {result.status}")
+            if result.stdout:
+                self.logger.error(f"Stdout: {result.stdout.read()}")
+            if result.stderr:
+                self.logger.error(f"Stderr: {result.stderr.read()}")
             return False
             
         except Exception as e:
@@ -743,6 +929,57 @@ class DataCollectorDeployer(BaseServiceManager):
             self.logger.error(traceback.format_exc())
             return False
     
+    def _execute_playbook(
+        self,
+        playbook: str,
+        hosts: List[str],
+        extra_vars: Optional[Dict] = None,
+        host_vars: Optional[Dict[str, Dict]] = None
+    ):
+        """
+        构建 inventory 并通过 ansible-runner 执行 playbook
+        
+        Args:
+            playbook: playbook 文件名
+            hosts: 目标主机列表
+            extra_vars: 所有主机共用的变量
+            host_vars: {主机: 变量} 各主机不同的变量
+        
+        Returns:
+            ansible_runner.Runner: 执行结果（status、events 等）
+        
+        Raises:
+            FileNotFoundError: playbook 不存在
+        """
+        inventory = {
+            'all': {
+                'hosts': {
+                    host: {
+                        'ansible_host': host,
+                        'ansible_user': self._ssh_user,
+                        'ansible_port': self._ssh_port,
+                        'ansible_ssh_private_key_file': self._ssh_key_path,
+                        'ansible_ssh_common_args': self._ssh_common_args,
+                        'ansible_pipelining': True,
+                        **(host_vars or {}).get(host, {})
+                    } for host in hosts
+                }
+            }
+        }
+        
+        return ansible_runner.run(
+            private_data_dir=self._ansible_dir_abs,
+            playbook=self._resolve_playbook(playbook),
+            inventory=inventory,
+            extravars={
+                'ansible_become': True,
+                'ansible_become_method': 'sudo',
+                **(extra_vars or {})
+            },
+            envvars=ANSIBLE_ENVVARS,
+            verbosity=1
+        )
+    
     def get_service_name(self) -> str:
         """获取服务名称"""
         return self.config.get('service_name', self.SERVICE_NAME)
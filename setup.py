@@ -18,6 +18,15 @@ setup(
         'colorama>=0.4',
         'python-dotenv>=1.0',
     ],
+    extras_require={
+        'mitogen': ['mitogen>=0.3'],
+        'orjson': ['orjson>=3.9'],
+        'ssh2': ['ssh2-python>=1.0'],
+        'asyncssh': ['asyncssh>=2.13'],
+        'pynacl': ['pynacl>=1.5'],
+        'pyroute2': ['pyroute2>=0.7'],
+        'icmplib': ['icmplib>=3.0'],
+    },
     entry_points={
         'console_scripts': [
             'quants-infra=cli.main:cli',
@@ -12,6 +12,12 @@ from unittest.mock import Mock, patch, MagicMock
 from core.security_manager import SecurityManager
 
 
+@pytest.fixture(autouse=True)
+def isolate_verify_cache(tmp_path, monkeypatch):
+    """安全验证结果缓存写入临时目录，避免测试之间共享缓存"""
+    monkeypatch.setattr('core.security_manager.VERIFY_CACHE_DIR', tmp_path / 'security_cache')
+
+
 class TestSecurityWorkflow:
     """安全配置工作流测试"""
     
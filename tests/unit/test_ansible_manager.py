@@ -71,6 +71,96 @@ class TestAnsibleManager:
         assert 'stdout' in result
         mock_ansible_run.assert_called_once()
 
+    @patch('ansible_runner.run')
+    def test_run_playbook_uses_runtime_config(self, mock_ansible_run, ansible_manager, sample_inventory):
+        """测试 playbook 使用启用连接复用的 ansible.cfg"""
+        mock_result = Mock()
+        mock_result.rc = 0
+        mock_result.status = 'successful'
+        mock_result.events = []
+        mock_ansible_run.return_value = mock_result
+
+        ansible_manager.run_playbook(
+            playbook='/path/to/playbook.yml',
+            inventory=sample_inventory
+        )
+
+        cfg_path = mock_ansible_run.call_args[1]['envvars']['ANSIBLE_CONFIG']
+        cfg = Path(cfg_path).read_text()
+        assert 'pipelining = True' in cfg
+        assert 'ControlPersist=600s' in cfg
+
+        envvars = mock_ansible_run.call_args[1]['envvars']
+        assert envvars['ANSIBLE_PIPELINING'] == 'True'
+        assert envvars['ANSIBLE_HOST_KEY_CHECKING'] == 'False'
+        assert envvars['ANSIBLE_RETRY_FILES_ENABLED'] == 'False'
+        assert 'ANSIBLE_CALLBACKS_ENABLED' not in envvars
+
+    def test_profile_tasks_callback_opt_in(self):
+        """测试 profile_tasks 配置启用任务耗时统计回调"""
+        manager = AnsibleManager({'profile_tasks': True})
+
+        assert manager._envvars['ANSIBLE_CALLBACKS_ENABLED'] == 'ansible.posix.profile_tasks'
+
+    @patch('ansible_runner.run')
+    def test_run_playbook_uses_mitogen_when_available(self, mock_ansible_run, sample_inventory):
+        """测试安装 Mitogen 时启用 mitogen_linear 策略，可通过配置关闭"""
+        mock_ansible_run.return_value = Mock(rc=0, status='successful', events=[])
+
+        with patch('core.ansible_manager.MITOGEN_STRATEGY_DIR', '/opt/mitogen/strategy'):
+            AnsibleManager({'use_mitogen': True}).run_playbook(
+                playbook='/path/to/playbook.yml', inventory=sample_inventory
+            )
+            envvars = mock_ansible_run.call_args[1]['envvars']
+            assert envvars['ANSIBLE_STRATEGY'] == 'mitogen_linear'
+            assert envvars['ANSIBLE_STRATEGY_PLUGINS'] == '/opt/mitogen/strategy'
+
+            AnsibleManager({'use_mitogen': False}).run_playbook(
+                playbook='/path/to/playbook.yml', inventory=sample_inventory
+            )
+            assert 'ANSIBLE_STRATEGY' not in mock_ansible_run.call_args[1]['envvars']
+
+        with patch('core.ansible_manager.MITOGEN_STRATEGY_DIR', None):
+            assert AnsibleManager({'use_mitogen': True}).use_mitogen is False
+
+    def test_run_playbook_async(self, ansible_manager, sample_inventory):
+        """测试异步执行 playbook 使用 ansible-playbook 子进程"""
+        import asyncio
+        from unittest.mock import AsyncMock
+
+        proc = Mock(returncode=0)
+        proc.communicate = AsyncMock(return_value=(b'ok', b''))
+
+        with patch('core.ansible_manager.asyncio.create_subprocess_exec',
+                   AsyncMock(return_value=proc)) as mock_exec:
+            result = asyncio.run(ansible_manager.run_playbook_async(
+                playbook='/path/to/playbook.yml',
+                inventory=sample_inventory,
+                extra_vars={'ssh_port': 6677},
+                tags=['firewall', 'verify']
+            ))
+
+        assert result == {'rc': 0, 'stdout': 'ok', 'stderr': '', 'status': 'successful'}
+        cmd = mock_exec.call_args.args
+        assert cmd[0] == 'ansible-playbook'
+        assert cmd[3] == '/path/to/playbook.yml'
+        assert cmd[cmd.index('--tags') + 1] == 'firewall,verify'
+        assert cmd[cmd.index('--extra-vars') + 1].startswith('@')
+        assert mock_exec.call_args.kwargs['env']['ANSIBLE_CONFIG'] == ansible_manager.ansible_cfg
+
+    def test_run_playbook_async_error(self, ansible_manager, sample_inventory):
+        """测试异步执行 playbook 异常时返回失败结果"""
+        import asyncio
+
+        with patch('core.ansible_manager.asyncio.create_subprocess_exec',
+                   side_effect=FileNotFoundError('ansible-playbook')):
+            result = asyncio.run(ansible_manager.run_playbook_async(
+                playbook='/path/to/playbook.yml', inventory=sample_inventory
+            ))
+
+        assert result['rc'] == 1
+        assert result['status'] == 'failed'
+
     @patch('ansible_runner.run')
     def test_run_playbook_failure(self, mock_ansible_run, ansible_manager, sample_inventory):
         """测试 playbook 运行失败"""
@@ -148,6 +238,42 @@ class TestAnsibleManager:
 
         assert result['rc'] == 0
 
+    @patch('ansible_runner.run')
+    def test_run_playbook_collects_task_results(self, mock_ansible_run, ansible_manager, sample_inventory):
+        """测试从 runner 事件中收集结构化任务结果"""
+        mock_result = Mock()
+        mock_result.rc = 0
+        mock_result.status = 'successful'
+        mock_result.events = [
+            {'event': 'playbook_on_start'},
+            {'event': 'runner_on_ok', 'stdout': 'ok: [1.2.3.4]',
+             'event_data': {'host': '1.2.3.4', 'task': 'check', 'res': {'rc': 0}}}
+        ]
+        mock_ansible_run.return_value = mock_result
+
+        result = ansible_manager.run_playbook(playbook='/path/to/playbook.yml', inventory=sample_inventory)
+
+        assert result['task_results'] == [
+            {'host': '1.2.3.4', 'task': 'check', 'event': 'runner_on_ok', 'res': {'rc': 0}}
+        ]
+
+    @pytest.mark.parametrize('use_orjson', [True, False])
+    def test_write_inventory_json(self, ansible_manager, sample_inventory, use_orjson, tmp_path):
+        """测试 inventory JSON 写入（orjson 可选，缺失时回退到 json）"""
+        import json
+        import core.ansible_manager as am
+
+        if use_orjson:
+            orjson = pytest.importorskip('orjson')
+        else:
+            orjson = None
+
+        with patch.object(am, 'orjson', orjson):
+            path = ansible_manager._write_inventory(str(tmp_path), sample_inventory)
+
+        with open(path) as f:
+            assert json.load(f) == sample_inventory
+
     @patch('ansible_runner.run')
     def test_run_playbook_timeout(self, mock_ansible_run, ansible_manager, sample_inventory):
         """测试 playbook 执行超时"""
@@ -226,6 +352,23 @@ class TestAnsibleManager:
 
         assert result['rc'] == 0
 
+    @patch('ansible_runner.run')
+    def test_run_playbook_with_runner_tags(self, mock_ansible_run, ansible_manager, sample_inventory):
+        """测试 tags 参数传递给 ansible-runner"""
+        mock_result = Mock()
+        mock_result.rc = 0
+        mock_result.status = 'successful'
+        mock_result.events = []
+        mock_ansible_run.return_value = mock_result
+
+        ansible_manager.run_playbook(
+            playbook='/path/to/playbook.yml',
+            inventory=sample_inventory,
+            tags=['firewall', 'verify']
+        )
+
+        assert mock_ansible_run.call_args[1]['tags'] == 'firewall,verify'
+
     @patch('ansible_runner.run')
     def test_run_playbook_error_handling(self, mock_ansible_run, ansible_manager, sample_inventory):
         """测试 playbook 错误处理"""
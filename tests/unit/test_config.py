@@ -8,7 +8,9 @@ and config merging functionality.
 import pytest
 import os
 import tempfile
+import yaml
 from pathlib import Path
+from unittest.mock import Mock, patch
 from core.utils.config import load_config, replace_env_vars, merge_configs
 
 
@@ -105,6 +107,48 @@ name: test
         assert "配置文件格式错误" in str(exc_info.value)
 
 
+class TestLoadConfigCache:
+    """测试配置解析缓存"""
+
+    def test_unchanged_file_parsed_once(self, tmp_path, monkeypatch):
+        """测试文件未修改时只解析一次，环境变量仍每次替换"""
+        config_file = tmp_path / "config.yml"
+        config_file.write_text("name: ${CACHE_NAME:default}\nitems: [1, 2]\n")
+
+        with patch('core.utils.config.yaml.load', wraps=yaml.load) as mock_load:
+            first = load_config(str(config_file))
+            first['items'].append(3)
+            monkeypatch.setenv("CACHE_NAME", "custom")
+            second = load_config(str(config_file))
+
+        assert mock_load.call_count == 1
+        assert first['name'] == "default"
+        assert second == {'name': "custom", 'items': [1, 2]}
+
+    def test_json_parsed_with_orjson_when_available(self, tmp_path):
+        """测试已安装 orjson 时以字节形式交给 orjson 解析"""
+        config_file = tmp_path / "config.json"
+        config_file.write_text('{"ssh_port": 22}')
+        fake_orjson = Mock()
+        fake_orjson.loads.return_value = {'ssh_port': 22}
+
+        with patch('core.utils.config.orjson', fake_orjson):
+            assert load_config(str(config_file)) == {'ssh_port': 22}
+
+        fake_orjson.loads.assert_called_once_with(b'{"ssh_port": 22}')
+
+    def test_modified_file_reparsed(self, tmp_path):
+        """测试文件修改时间变化后重新解析"""
+        config_file = tmp_path / "config.json"
+        config_file.write_text('{"ssh_port": 22}')
+        assert load_config(str(config_file))['ssh_port'] == 22
+
+        config_file.write_text('{"ssh_port": 6677}')
+        st = config_file.stat()
+        os.utime(config_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert load_config(str(config_file))['ssh_port'] == 6677
+
+
 class TestReplaceEnvVars:
     """Test environment variable replacement functionality"""
     
@@ -196,6 +240,14 @@ class TestReplaceEnvVars:
         
         assert result == data
     
+    def test_strings_without_reference_skip_regex(self):
+        """测试不含 ${ 的字符串原样返回，不进入正则替换"""
+        with patch('core.utils.config._ENV_PATTERN') as mock_pattern:
+            assert replace_env_vars({'a': 'plain', 'b': ['$HOME', '{x}']}) == {
+                'a': 'plain', 'b': ['$HOME', '{x}']
+            }
+        mock_pattern.sub.assert_not_called()
+
     def test_empty_env_var_uses_empty_string(self, monkeypatch):
         """Test that missing env var without default uses empty string"""
         monkeypatch.delenv('MISSING_VAR', raising=False)
@@ -10,7 +10,12 @@ from core.schemas.config_schemas import (
     SecurityConfig,
     DataCollectorConfig,
     MonitorConfig,
+    FirewallRule,
+    FirewallConfig,
+    validate_config,
+    get_adapter,
 )
+from core.schemas.environment_schema import EnvironmentConfig
 
 
 class TestInfraValidation:
@@ -77,6 +82,56 @@ blueprint: ubuntu_22_04
         assert "bundle" in str(exc_info.value)
 
 
+class TestStringInterning:
+    """Test repeated enum-like values share one string object"""
+    
+    def test_instance_values_interned(self):
+        """Test blueprint/bundle/region are interned across instances"""
+        first = InfraInstanceConfig(
+            name='instance-1', blueprint=''.join(['ubuntu', '_22_04']), bundle='small_3_0'
+        )
+        second = InfraInstanceConfig(
+            name='instance-2', blueprint=''.join(['ubuntu_', '22_04']), bundle='small_3_0'
+        )
+        
+        assert first.blueprint is second.blueprint
+        assert first.region is second.region
+
+
+class TestFirewallRuleValidation:
+    """Test firewall rule validation"""
+    
+    def test_plain_ip_gets_host_prefix(self):
+        """Test a bare IPv4 address is normalized to /32"""
+        rule = FirewallRule(port=22, protocol='tcp', source='1.2.3.4')
+        assert rule.source == '1.2.3.4/32'
+    
+    def test_cidr_kept_as_is(self):
+        """Test CIDR blocks are left unchanged"""
+        rule = FirewallRule(port=22, protocol='tcp', source='10.0.0.0/24')
+        assert rule.source == '10.0.0.0/24'
+        
+        rule = FirewallRule(port=22, protocol='tcp')
+        assert rule.source == '0.0.0.0/0'
+    
+    def test_ipv6_address_gets_host_prefix(self):
+        """Test a bare IPv6 address is normalized to /128"""
+        rule = FirewallRule(port=22, protocol='tcp', source='2001:db8::1')
+        assert rule.source == '2001:db8::1/128'
+    
+    def test_unknown_field_rejected(self):
+        """Test misspelled rule keys are rejected"""
+        with pytest.raises(ValueError):
+            FirewallRule(port=22, protocol='tcp', sorce='10.0.0.0/24')
+    
+    def test_invalid_source_rejected(self):
+        """Test malformed sources are rejected"""
+        for source in ('300.1.1.1', '10.0.0.0/33', 'not-an-ip'):
+            with pytest.raises(ValueError) as exc_info:
+                FirewallRule(port=22, protocol='tcp', source=source)
+            assert "Invalid CIDR format" in str(exc_info.value)
+
+
 class TestSecurityValidation:
     """Test security config validation"""
     
@@ -110,6 +165,127 @@ ssh_port: 70000
             load_and_validate_config(str(config_file), SecurityConfig)
         
         assert "ssh_port" in str(exc_info.value)
+    
+    def test_profile_accepts_rule_file_names(self):
+        """Test rule file names are normalized to profile names"""
+        for alias in ('data_collector', 'data_collector_rules', 'data-collector'):
+            config = validate_config(
+                {'instance_name': 'test-instance', 'ssh_key': '~/.ssh/test_key.pem', 'profile': alias},
+                SecurityConfig
+            )
+            assert config.profile == 'data-collector'
+        
+        config = validate_config(
+            {'instance_name': 'test-instance', 'ssh_key': '~/.ssh/test_key.pem', 'profile': 'default_rules'},
+            SecurityConfig
+        )
+        assert config.profile == 'default'
+    
+    def test_invalid_profile(self):
+        """Test security profile must be a known rule set"""
+        with pytest.raises(ValueError) as exc_info:
+            validate_config(
+                {'instance_name': 'test-instance', 'ssh_key': '~/.ssh/test_key.pem', 'profile': 'database'},
+                SecurityConfig
+            )
+        
+        assert "profile" in str(exc_info.value)
+    
+    def test_firewall_rules_validated(self, tmp_path):
+        """Test nested firewall rules are validated as models"""
+        config_file = tmp_path / "security.yml"
+        config_file.write_text("""
+instance_name: test-instance
+ssh_key: ~/.ssh/test_key.pem
+firewall:
+  default_policy: drop
+  rules:
+    - port: 8000
+      protocol: tcp
+      source: 10.0.0.1
+""")
+        
+        config = load_and_validate_config(str(config_file), SecurityConfig)
+        
+        assert config['firewall']['default_policy'] == 'drop'
+        assert config['firewall']['rules'][0]['source'] == '10.0.0.1/32'
+    
+    def test_invalid_firewall_rule(self):
+        """Test bad firewall rules fail at parse time"""
+        with pytest.raises(ValueError) as exc_info:
+            validate_config(
+                {
+                    'instance_name': 'test-instance',
+                    'ssh_key': '~/.ssh/test_key.pem',
+                    'firewall': {'rules': [{'port': 70000, 'protocol': 'tcp'}]},
+                },
+                SecurityConfig
+            )
+        
+        assert "firewall.rules.0.port" in str(exc_info.value)
+
+
+class TestEnvironmentValidation:
+    """Test environment config validation"""
+    
+    def test_security_section_parsed(self):
+        """Test environment security section becomes a typed model"""
+        config = validate_config(
+            {
+                'name': 'production',
+                'security': {
+                    'instances': ['collector-1'],
+                    'ssh': {'port': 6677, 'key_path': '/keys/test.pem'},
+                    'firewall': {'rules': [{'port': 22, 'protocol': 'tcp'}]},
+                },
+            },
+            EnvironmentConfig
+        )
+        
+        assert config.security.instances == ['collector-1']
+        assert config.security.ssh.port == 6677
+        assert config.security.vpn_network == '10.0.0.0/24'
+        assert isinstance(config.security.firewall, FirewallConfig)
+    
+    def test_security_ssh_key_path_defaults(self):
+        """Test environment ssh section may omit key_path"""
+        import os
+        config = validate_config(
+            {'security': {'ssh': {'port': 22}}},
+            EnvironmentConfig
+        )
+        
+        assert config.security.ssh.port == 22
+        assert config.security.ssh.key_path == os.path.expanduser('~/.ssh/lightsail_key.pem')
+    
+    def test_instances_and_services_are_read_only(self):
+        """Test loaded instances and services cannot be mutated"""
+        from pydantic import ValidationError
+        config = validate_config(
+            {
+                'infrastructure': {'instances': [
+                    {'name': 'collector-1', 'blueprint': 'ubuntu_22_04', 'bundle': 'small_3_0'}
+                ]},
+                'services': [
+                    {'type': 'monitor', 'target': 'collector-1', 'config': {}}
+                ],
+            },
+            EnvironmentConfig
+        )
+        
+        with pytest.raises(ValidationError):
+            config.infrastructure['instances'][0].name = 'other'
+        with pytest.raises(ValidationError):
+            config.services[0].target = 'other'
+    
+    def test_example_environment_config(self):
+        """Test the shipped example environment config validates"""
+        example = Path(__file__).parents[2] / 'config' / 'examples' / 'production_environment.yml'
+        
+        config = load_and_validate_config(str(example), EnvironmentConfig)
+        
+        assert config['security']['instances']
+        assert config['services']
 
 
 class TestDataCollectorValidation:
@@ -228,6 +404,17 @@ email: invalid-email
             load_and_validate_config(str(config_file), MonitorConfig)
         
         assert "Invalid email" in str(exc_info.value)
+    
+    def test_email_requires_domain(self):
+        """Test email needs a local part and a dotted domain"""
+        base = {'host': '54.123.45.67', 'grafana_password': 'secure123'}
+        
+        for email in ('alerts@', '@example.com', 'alerts@localhost', 'a b@example.com'):
+            with pytest.raises(ValueError):
+                validate_config({**base, 'email': email}, MonitorConfig)
+        
+        config = validate_config({**base, 'email': 'alerts@example.com'}, MonitorConfig)
+        assert config.email == 'alerts@example.com'
 
 
 class TestValidationOptional:
@@ -265,3 +452,45 @@ bundle: small_3_0
         with pytest.raises(ValueError):
             load_and_validate_config(str(config_file), InfraInstanceConfig)
 
+
+
+class TestValidateConfigHelper:
+    """Test the schema-level validate_config helper"""
+    
+    def test_returns_model_instance(self):
+        """Test a valid dict is turned into the schema model"""
+        config = validate_config(
+            {'name': 'test-instance', 'blueprint': 'ubuntu_22_04', 'bundle': 'small_3_0'},
+            InfraInstanceConfig
+        )
+        
+        assert isinstance(config, InfraInstanceConfig)
+        assert config.region == 'us-east-1'
+    
+    def test_reports_all_field_errors(self):
+        """Test validation errors list each failing field"""
+        with pytest.raises(ValueError) as exc_info:
+            validate_config({'name': 'ab'}, InfraInstanceConfig)
+        
+        message = str(exc_info.value)
+        assert message.startswith("Configuration validation failed:")
+        assert "name" in message
+        assert "blueprint" in message
+        assert "bundle" in message
+    
+    def test_validate_by_kind(self):
+        """Test schemas can be selected by SCHEMA_MAP key"""
+        config = validate_config(
+            {'host': '54.123.45.67', 'grafana_password': 'secure_password_123'},
+            'monitor'
+        )
+        
+        assert isinstance(config, MonitorConfig)
+        assert get_adapter('monitor') is get_adapter('monitor')
+    
+    def test_unknown_kind_rejected(self):
+        """Test unknown config types are reported"""
+        with pytest.raises(ValueError) as exc_info:
+            validate_config({}, 'database')
+        
+        assert "Unknown config type: database" in str(exc_info.value)
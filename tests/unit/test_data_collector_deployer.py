@@ -97,27 +97,16 @@ class TestDataCollectorDeployer:
 
     # ============ 部署测试 ============
 
-    @patch.object(DataCollectorDeployer, '_setup_environment')
-    @patch.object(DataCollectorDeployer, '_clone_repository')
-    @patch.object(DataCollectorDeployer, '_setup_conda_environment')
-    @patch.object(DataCollectorDeployer, '_deploy_config')
-    @patch.object(DataCollectorDeployer, '_setup_systemd_service')
-    @patch.object(DataCollectorDeployer, '_start_collector_service')
+    @patch.object(DataCollectorDeployer, '_run_site_deploy')
     @patch.object(DataCollectorDeployer, '_setup_monitoring')
     @patch.object(DataCollectorDeployer, '_configure_security')
     def test_deploy_success(
-        self, mock_security, mock_monitoring, mock_start, mock_systemd,
-        mock_config, mock_conda, mock_clone, mock_env,
+        self, mock_security, mock_monitoring, mock_site,
         collector_deployer
     ):
         """测试完整部署成功"""
         # Mock 所有步骤成功
-        mock_env.return_value = True
-        mock_clone.return_value = True
-        mock_conda.return_value = True
-        mock_config.return_value = True
-        mock_systemd.return_value = True
-        mock_start.return_value = True
+        mock_site.return_value = True
         mock_monitoring.return_value = True
         mock_security.return_value = True
         
@@ -131,74 +120,97 @@ class TestDataCollectorDeployer:
         assert result is True
         
         # 验证所有步骤都被调用
-        mock_env.assert_called_once()
-        mock_clone.assert_called_once()
-        mock_conda.assert_called_once()
-        mock_config.assert_called_once()
-        mock_systemd.assert_called_once()
-        mock_start.assert_called_once()
+        mock_site.assert_called_once_with(
+            ['54.XXX.XXX.XXX'], 'gateio', ['VIRTUAL-USDT'], {'54.XXX.XXX.XXX': '10.0.0.2'}
+        )
         mock_monitoring.assert_called_once()
         mock_security.assert_called_once()
 
-    def test_deploy_missing_vpn_ip(self, collector_deployer):
-        """测试部署缺少 VPN IP"""
+    def test_deploy_runs_each_playbook_once_for_all_hosts(self, collector_deployer, mock_ansible_runner):
+        """测试多主机部署时合并的部署 playbook 只执行一次，各主机的 VPN IP 写入主机变量"""
+        hosts = ['54.0.0.1', '54.0.0.2']
         result = collector_deployer.deploy(
-            hosts=['54.XXX.XXX.XXX'],
-            exchange='gateio',
+            hosts=hosts,
+            vpn_ip={'54.0.0.1': '10.0.0.2', '54.0.0.2': '10.0.0.3'},
             pairs=['VIRTUAL-USDT']
         )
 
+        assert result is True
+        mock_ansible_runner.assert_called_once()
+        call_args = mock_ansible_runner.call_args
+        assert call_args[1]['playbook'].endswith('site_deploy.yml')
+        assert list(call_args[1]['inventory']['all']['hosts']) == hosts
+
+        extra_vars = call_args[1]['extravars']
+        assert 'vpn_ip' not in extra_vars
+        assert extra_vars['github_repo'] == collector_deployer.github_repo
+        assert extra_vars['recreate_env'] is True
+        assert extra_vars['trading_pairs'] == ['VIRTUAL-USDT']
+        assert extra_vars['metrics_port'] == 8000
+
+        inventory_hosts = mock_ansible_runner.call_args[1]['inventory']['all']['hosts']
+        assert inventory_hosts['54.0.0.1']['vpn_ip'] == '10.0.0.2'
+        assert inventory_hosts['54.0.0.2']['vpn_ip'] == '10.0.0.3'
+
+    def test_deploy_isolate_hosts_runs_in_parallel(self, collector_deployer):
+        """测试 isolate_hosts 时每台主机单独执行部署 playbook，且主机之间并行"""
+        import threading
+        hosts = ['54.0.0.1', '54.0.0.2', '54.0.0.3']
+        barrier = threading.Barrier(len(hosts), timeout=5)
+
+        def fake_site(site_hosts, exchange, pairs, vpn_ips):
+            # 所有主机同时进入才能通过屏障，串行执行会超时
+            barrier.wait()
+            return site_hosts != ['54.0.0.3']
+
+        with patch.object(collector_deployer, '_run_site_deploy', side_effect=fake_site) as mock_site:
+            result = collector_deployer.deploy(
+                hosts=hosts,
+                vpn_ip='10.0.0.2',
+                pairs=['VIRTUAL-USDT'],
+                isolate_hosts=True,
+                skip_monitoring=True
+            )
+
         assert result is False
+        assert sorted(c.args[0] for c in mock_site.call_args_list) == [[host] for host in hosts]
 
-    def test_deploy_missing_pairs(self, collector_deployer):
-        """测试部署缺少交易对"""
+    def test_deploy_missing_host_vpn_ip(self, collector_deployer, mock_ansible_runner):
+        """测试按主机指定 VPN IP 时缺少某个主机的 VPN IP"""
         result = collector_deployer.deploy(
-            hosts=['54.XXX.XXX.XXX'],
-            vpn_ip='10.0.0.2',
-            exchange='gateio',
-            pairs=[]
+            hosts=['54.0.0.1', '54.0.0.2'],
+            vpn_ip={'54.0.0.1': '10.0.0.2'},
+            pairs=['VIRTUAL-USDT']
         )
 
         assert result is False
+        mock_ansible_runner.assert_not_called()
 
-    @patch.object(DataCollectorDeployer, '_setup_environment')
-    def test_deploy_environment_setup_failure(self, mock_env, collector_deployer):
-        """测试环境设置失败"""
-        mock_env.return_value = False
-        
+    def test_deploy_missing_vpn_ip(self, collector_deployer):
+        """测试部署缺少 VPN IP"""
         result = collector_deployer.deploy(
             hosts=['54.XXX.XXX.XXX'],
-            vpn_ip='10.0.0.2',
+            exchange='gateio',
             pairs=['VIRTUAL-USDT']
         )
 
         assert result is False
 
-    @patch.object(DataCollectorDeployer, '_setup_environment')
-    @patch.object(DataCollectorDeployer, '_clone_repository')
-    def test_deploy_clone_failure(self, mock_clone, mock_env, collector_deployer):
-        """测试仓库克隆失败"""
-        mock_env.return_value = True
-        mock_clone.return_value = False
-        
+    def test_deploy_missing_pairs(self, collector_deployer):
+        """测试部署缺少交易对"""
         result = collector_deployer.deploy(
             hosts=['54.XXX.XXX.XXX'],
             vpn_ip='10.0.0.2',
-            pairs=['VIRTUAL-USDT']
+            exchange='gateio',
+            pairs=[]
         )
 
         assert result is False
 
-    @patch.object(DataCollectorDeployer, '_setup_environment')
-    @patch.object(DataCollectorDeployer, '_clone_repository')
-    @patch.object(DataCollectorDeployer, '_setup_conda_environment')
-    def test_deploy_conda_failure(
-        self, mock_conda, mock_clone, mock_env, collector_deployer
-    ):
-        """测试 Conda 环境设置失败"""
-        mock_env.return_value = True
-        mock_clone.return_value = True
-        mock_conda.return_value = False
+    @patch.object(DataCollectorDeployer, '_run_site_deploy')
+    def test_deploy_playbook_failure(self, mock_site, collector_deployer):
+        """测试部署 playbook 失败"""
+        mock_site.return_value = False
         
         result = collector_deployer.deploy(
             hosts=['54.XXX.XXX.XXX'],
@@ -208,23 +220,16 @@ class TestDataCollectorDeployer:
 
         assert result is False
 
-    @patch.object(DataCollectorDeployer, '_setup_environment')
-    @patch.object(DataCollectorDeployer, '_clone_repository')
-    @patch.object(DataCollectorDeployer, '_setup_conda_environment')
-    @patch.object(DataCollectorDeployer, '_deploy_config')
-    @patch.object(DataCollectorDeployer, '_setup_systemd_service')
-    @patch.object(DataCollectorDeployer, '_start_collector_service')
+    @patch.object(DataCollectorDeployer, '_run_site_deploy')
     @patch.object(DataCollectorDeployer, '_setup_monitoring')
     @patch.object(DataCollectorDeployer, '_configure_security')
     def test_deploy_skip_monitoring_and_security(
-        self, mock_security, mock_monitoring, mock_start, mock_systemd,
-        mock_config, mock_conda, mock_clone, mock_env,
+        self, mock_security, mock_monitoring, mock_site,
         collector_deployer
     ):
         """测试跳过监控和安全配置"""
         # Mock 所有步骤成功
-        for mock in [mock_env, mock_clone, mock_conda, mock_config, 
-                     mock_systemd, mock_start, mock_monitoring, mock_security]:
+        for mock in [mock_site, mock_monitoring, mock_security]:
             mock.return_value = True
         
         result = collector_deployer.deploy(
@@ -243,7 +248,7 @@ class TestDataCollectorDeployer:
 
     def test_setup_environment_success(self, collector_deployer, mock_ansible_runner):
         """测试设置环境成功"""
-        result = collector_deployer._setup_environment('54.XXX.XXX.XXX')
+        result = collector_deployer._setup_environment(['54.XXX.XXX.XXX'])
 
         assert result is True
         mock_ansible_runner.assert_called_once()
@@ -256,7 +261,7 @@ class TestDataCollectorDeployer:
         """测试设置环境失败"""
         mock_ansible_runner.return_value.status = 'failed'
         
-        result = collector_deployer._setup_environment('54.XXX.XXX.XXX')
+        result = collector_deployer._setup_environment(['54.XXX.XXX.XXX'])
 
         assert result is False
 
@@ -264,7 +269,7 @@ class TestDataCollectorDeployer:
 
     def test_clone_repository_success(self, collector_deployer, mock_ansible_runner):
         """测试克隆仓库成功"""
-        result = collector_deployer._clone_repository('54.XXX.XXX.XXX')
+        result = collector_deployer._clone_repository(['54.XXX.XXX.XXX'])
 
         assert result is True
         
@@ -279,7 +284,7 @@ class TestDataCollectorDeployer:
 
     def test_setup_conda_environment_success(self, collector_deployer, mock_ansible_runner):
         """测试设置 Conda 环境成功"""
-        result = collector_deployer._setup_conda_environment('54.XXX.XXX.XXX')
+        result = collector_deployer._setup_conda_environment(['54.XXX.XXX.XXX'])
 
         assert result is True
         
@@ -294,7 +299,7 @@ class TestDataCollectorDeployer:
     def test_deploy_config_success(self, collector_deployer, mock_ansible_runner):
         """测试部署配置成功"""
         result = collector_deployer._deploy_config(
-            '54.XXX.XXX.XXX',
+            ['54.XXX.XXX.XXX'],
             'gateio',
             ['VIRTUAL-USDT', 'IRON-USDT']
         )
@@ -313,7 +318,7 @@ class TestDataCollectorDeployer:
     def test_deploy_config_with_exchange_config(self, collector_deployer, mock_ansible_runner):
         """测试使用交易所特定配置部署"""
         result = collector_deployer._deploy_config(
-            '54.XXX.XXX.XXX',
+            ['54.XXX.XXX.XXX'],
             'gateio',
             ['VIRTUAL-USDT']
         )
@@ -331,28 +336,74 @@ class TestDataCollectorDeployer:
     def test_setup_systemd_service_success(self, collector_deployer, mock_ansible_runner):
         """测试设置 systemd 服务成功"""
         result = collector_deployer._setup_systemd_service(
-            '54.XXX.XXX.XXX',
+            ['54.XXX.XXX.XXX'],
             'gateio',
-            '10.0.0.2'
+            {'54.XXX.XXX.XXX': '10.0.0.2'}
         )
 
         assert result is True
         
-        # 验证传递的变量
+        # 验证传递的变量（VPN IP 作为主机变量，不放入 extravars）
         call_args = mock_ansible_runner.call_args
         extra_vars = call_args[1]['extravars']
         assert extra_vars['exchange'] == 'gateio'
-        assert extra_vars['vpn_ip'] == '10.0.0.2'
+        assert 'vpn_ip' not in extra_vars
         assert extra_vars['metrics_port'] == 8000
+        host_vars = call_args[1]['inventory']['all']['hosts']['54.XXX.XXX.XXX']
+        assert host_vars['vpn_ip'] == '10.0.0.2'
+
+    def test_run_ansible_playbook_reuses_ssh_connections(self, collector_deployer, mock_ansible_runner):
+        """测试 playbook 使用运行时 ansible.cfg（ControlPersist）并启用 pipelining"""
+        from core.ansible_manager import ANSIBLE_CFG
+
+        assert collector_deployer._run_ansible_playbook('stop_data_collector.yml', ['54.XXX.XXX.XXX'])
+
+        kwargs = mock_ansible_runner.call_args[1]
+        assert kwargs['envvars']['ANSIBLE_CONFIG'] == ANSIBLE_CFG
+        assert kwargs['envvars']['ANSIBLE_PIPELINING'] == 'True'
+        assert kwargs['inventory']['all']['hosts']['54.XXX.XXX.XXX']['ansible_pipelining'] is True
+
+    def test_ssh_settings_resolved_once(self, collector_deployer, mock_ansible_runner):
+        """测试 SSH 密钥路径与 ansible 目录在初始化时解析，执行 playbook 时不再重复解析"""
+        import os
+
+        with patch('deployers.data_collector.os.path.expanduser') as mock_expand, \
+             patch('deployers.data_collector.os.path.abspath') as mock_abspath:
+            collector_deployer._run_ansible_playbook('stop_data_collector.yml', ['54.XXX.XXX.XXX'])
+            collector_deployer._run_ansible_playbook('stop_data_collector.yml', ['54.XXX.XXX.XXX'])
+
+        mock_expand.assert_not_called()
+        mock_abspath.assert_not_called()
+        kwargs = mock_ansible_runner.call_args[1]
+        assert kwargs['private_data_dir'] == os.path.abspath('ansible')
+        host_vars = kwargs['inventory']['all']['hosts']['54.XXX.XXX.XXX']
+        assert host_vars['ansible_ssh_private_key_file'] == os.path.expanduser('~/.ssh/lightsail_key.pem')
+
+    def test_resolve_playbook_cached(self, collector_deployer):
+        """测试 playbook 路径只查找一次，common 目录中的 playbook 也能找到"""
+        import os
+
+        with patch('deployers.data_collector.os.path.isfile', wraps=os.path.isfile) as mock_isfile:
+            first = collector_deployer._resolve_playbook('stop_data_collector.yml')
+            assert collector_deployer._resolve_playbook('stop_data_collector.yml') == first
+
+        assert mock_isfile.call_count == 1
+        assert first == os.path.abspath('ansible/playbooks/data_collector/stop_data_collector.yml')
+        assert collector_deployer._resolve_playbook('setup_docker.yml').endswith('playbooks/common/setup_docker.yml')
+
+    def test_run_ansible_playbook_missing_playbook(self, collector_deployer, mock_ansible_runner):
+        """测试 playbook 不存在时不启动 ansible-runner"""
+        assert collector_deployer._run_ansible_playbook('missing.yml', ['54.XXX.XXX.XXX']) is False
+        mock_ansible_runner.assert_not_called()
 
     # ============ 服务启动测试 ============
 
     def test_start_collector_service_success(self, collector_deployer, mock_ansible_runner):
         """测试启动采集器服务成功"""
         result = collector_deployer._start_collector_service(
-            '54.XXX.XXX.XXX',
+            ['54.XXX.XXX.XXX'],
             'gateio',
-            '10.0.0.2'
+            {'54.XXX.XXX.XXX': '10.0.0.2'}
         )
 
         assert result is True
@@ -457,6 +508,34 @@ class TestDataCollectorDeployer:
 
         assert health['status'] == 'unhealthy'
 
+    @patch.object(DataCollectorDeployer, '_check_metrics_endpoint')
+    def test_health_check_many_single_playbook_run(self, mock_metrics, collector_deployer, mock_ansible_runner):
+        """测试批量健康检查只执行一次 playbook，同一 VPN IP 的 metrics 端点只探测一次"""
+        mock_metrics.return_value = True
+        mock_ansible_runner.return_value.events = iter([
+            {'event': 'runner_on_ok', 'event_data': {'host': '54.0.0.1', 'res': {'results': [
+                {'item': 'quants-lab-gateio-collector', 'stdout': 'active'},
+                {'item': 'quants-lab-mexc-collector', 'stdout': 'inactive'},
+            ]}}},
+            {'event': 'runner_on_unreachable', 'event_data': {'host': '54.0.0.2', 'res': {}}},
+        ])
+        instance_ids = [
+            'data-collector-gateio-54.0.0.1',
+            'data-collector-mexc-54.0.0.1',
+            'data-collector-gateio-54.0.0.2',
+        ]
+
+        results = collector_deployer.health_check_many(instance_ids)
+
+        mock_ansible_runner.assert_called_once()
+        kwargs = mock_ansible_runner.call_args[1]
+        assert kwargs['playbook'].endswith('check_collector_status.yml')
+        assert kwargs['inventory']['all']['hosts']['54.0.0.1']['collector_services'] == [
+            'quants-lab-gateio-collector', 'quants-lab-mexc-collector'
+        ]
+        mock_metrics.assert_called_once_with('10.0.0.2', 8000)
+        assert [results[i]['status'] for i in instance_ids] == ['healthy', 'unhealthy', 'unhealthy']
+
     # ============ 日志获取测试 ============
 
     @patch('subprocess.run')
@@ -664,8 +743,9 @@ class TestDataCollectorDeployerIntegration:
             )
             
             assert result is True
-            # 验证 Ansible playbook 被多次调用（各个部署步骤）
-            assert mock_ansible.call_count >= 6
+            # 验证各个部署步骤合并为一次 Ansible playbook 执行
+            mock_ansible.assert_called_once()
+            assert mock_ansible.call_args[1]['playbook'].endswith('playbooks/data_collector/site_deploy.yml')
 
     def test_deploy_multiple_exchanges(self, full_config):
         """测试部署多个交易所"""
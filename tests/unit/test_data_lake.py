@@ -54,6 +54,31 @@ class TestSourceConfig:
                 user='ubuntu',
                 remote_root='/var/data/test'
             )
+    
+    def test_unknown_field_rejected(self):
+        """测试拼写错误的字段会被拒绝"""
+        from pydantic import ValidationError
+        with pytest.raises(ValidationError):
+            SourceConfig(
+                type='ssh',
+                host='10.0.0.11',
+                user='ubuntu',
+                remote_root='/var/data/test',
+                sshkey='~/.ssh/test.pem'  # 拼写错误
+            )
+    
+    def test_source_config_is_read_only(self):
+        """测试源配置加载后不可修改"""
+        from pydantic import ValidationError
+        config = SourceConfig(
+            type='ssh',
+            host='10.0.0.11',
+            user='ubuntu',
+            remote_root='/var/data/test'
+        )
+        
+        with pytest.raises(ValidationError):
+            config.host = '10.0.0.12'
 
 
 class TestProfileConfig:
@@ -79,6 +104,20 @@ class TestProfileConfig:
         assert profile.local_subdir == 'test_data'
         assert profile.retention_days == 30
     
+    def test_shared_source_validated_once(self):
+        """测试相同源配置在 profiles 之间复用同一个 SourceConfig"""
+        source = {
+            'type': 'ssh',
+            'host': '10.0.0.11',
+            'user': 'ubuntu',
+            'remote_root': '/var/data/shared'
+        }
+        
+        first = ProfileConfig(source=dict(source), local_subdir='first')
+        second = ProfileConfig(source=dict(source), local_subdir='second')
+        
+        assert first.source is second.source
+    
     def test_invalid_retention_days(self):
         """测试无效的保留天数"""
         source = SourceConfig(
@@ -88,7 +127,7 @@ class TestProfileConfig:
             remote_root='/var/data/test'
         )
         
-        with pytest.raises(ValueError, match='retention_days 必须大于 0'):
+        with pytest.raises(ValueError, match='greater than 0'):
             ProfileConfig(
                 source=source,
                 local_subdir='test_data',
@@ -332,6 +371,18 @@ class TestDataLakeConfig:
         assert len(enabled) == 1
         assert 'profile1' in enabled
         assert 'profile2' not in enabled
+        
+        # 返回只读视图，调用方不能修改内部缓存
+        with pytest.raises(TypeError):
+            enabled['profile2'] = profile2
+        assert 'profile2' not in config.get_enabled_profiles()
+        
+        # model_construct 跳过验证时按 profiles 计算
+        constructed = DataLakeConfig.model_construct(
+            root_dir='/data/lake',
+            profiles={'profile1': profile1, 'profile2': profile2}
+        )
+        assert list(constructed.get_enabled_profiles()) == ['profile1']
     
     def test_auto_checkpoint_file_generation(self):
         """测试自动生成 checkpoint 文件路径"""
@@ -356,6 +407,31 @@ class TestDataLakeConfig:
         # checkpoint_file 应该被自动生成
         assert config.profiles['test'].checkpoint_file is not None
         assert 'test.json' in config.profiles['test'].checkpoint_file
+    
+    def test_default_checkpoint_paths(self):
+        """测试默认 checkpoint 目录和文件路径"""
+        source = SourceConfig(
+            type='ssh',
+            host='10.0.0.11',
+            user='ubuntu',
+            remote_root='/var/data/test'
+        )
+        
+        config = DataLakeConfig(
+            root_dir='/data/lake',
+            profiles={
+                'auto': ProfileConfig(source=source, local_subdir='auto'),
+                'custom': ProfileConfig(
+                    source=source,
+                    local_subdir='custom',
+                    checkpoint_file='/tmp/custom.json'
+                ),
+            }
+        )
+        
+        assert config.checkpoint_dir == '/data/lake/.checkpoints'
+        assert config.profiles['auto'].checkpoint_file == '/data/lake/.checkpoints/auto.json'
+        assert config.profiles['custom'].checkpoint_file == '/tmp/custom.json'
 
 
 if __name__ == '__main__':
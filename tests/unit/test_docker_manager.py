@@ -279,6 +279,22 @@ class TestDockerManager:
         assert result is True
         mock_ansible_runner.assert_called_once()
 
+    def test_playbooks_share_runner_options(self, docker_manager, mock_ansible_runner):
+        """测试多次 playbook 调用共享同一组 ansible-runner 参数"""
+        hosts = {'host1': {}}
+        docker_manager.setup_docker(hosts)
+        docker_manager.stop_docker(hosts)
+
+        setup_kwargs = mock_ansible_runner.call_args_list[0][1]
+        stop_kwargs = mock_ansible_runner.call_args_list[1][1]
+        assert setup_kwargs['private_data_dir'] == stop_kwargs['private_data_dir']
+        assert setup_kwargs['extravars']['docker_version'] == 'latest'
+        assert setup_kwargs['extravars']['ansible_become'] is True
+        assert stop_kwargs['extravars'] == {
+            'ansible_become': True,
+            'ansible_become_method': 'sudo'
+        }
+
     # ============ 本地 Docker 测试 ============
 
     @patch('core.docker_manager.DockerManager._check_local_docker')
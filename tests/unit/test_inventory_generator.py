@@ -0,0 +1,177 @@
+"""
+Unit tests for InventoryGenerator
+测试 Ansible Inventory 生成器
+"""
+
+import json
+
+import pytest
+import yaml
+from unittest.mock import patch
+
+from core.inventory_generator import InventoryGenerator, HostInfo
+
+
+class TestInventoryGenerator:
+    """InventoryGenerator 单元测试"""
+
+    @pytest.fixture
+    def generator(self):
+        """创建 InventoryGenerator 实例"""
+        return InventoryGenerator()
+
+    @pytest.fixture
+    def instances(self):
+        """示例实例列表"""
+        return [
+            {
+                'name': 'collector-1',
+                'instance_id': 'collector-1',
+                'public_ip': '1.2.3.4',
+                'tags': {'Service': 'data-collector', 'Environment': 'prod'}
+            },
+            {
+                'name': 'monitor-1',
+                'instance_id': 'monitor-1',
+                'public_ip': '5.6.7.8',
+                'ssh_port': 6677,
+                'tags': {'Service': 'monitor', 'Environment': 'dev'}
+            },
+            {
+                'instance_id': 'exec-1',
+                'public_ip': '9.9.9.9',
+                'service_type': 'execution'
+            },
+        ]
+
+    def test_host_info_to_dict(self):
+        """测试主机记录转换为主机变量"""
+        host_info = HostInfo(
+            ansible_host='1.2.3.4',
+            ansible_user='ubuntu',
+            ansible_port=22,
+            instance_id='i-1',
+            service_type='monitor',
+            tags={'environment': 'prod'}
+        )
+
+        assert host_info.to_dict() == {
+            'ansible_host': '1.2.3.4',
+            'ansible_user': 'ubuntu',
+            'ansible_port': 22,
+            'instance_id': 'i-1',
+            'environment': 'prod',
+            'service_type': 'monitor',
+        }
+
+    def test_build_inventory(self, generator, instances):
+        """测试构建 inventory 结构"""
+        inventory = generator._build_inventory(instances)
+        hosts = inventory['all']['hosts']
+        children = inventory['all']['children']
+
+        assert set(hosts) == {'collector-1', 'monitor-1', 'exec-1'}
+        assert hosts['collector-1']['ansible_host'] == '1.2.3.4'
+        assert hosts['collector-1']['environment'] == 'prod'
+        assert hosts['collector-1']['service_type'] == 'data-collector'
+        assert hosts['monitor-1']['ansible_port'] == 6677
+        assert hosts['exec-1']['service_type'] == 'execution'
+
+        assert children['data_collectors']['hosts'] == ['collector-1']
+        assert children['monitors']['hosts'] == ['monitor-1']
+        assert children['execution_engines']['hosts'] == ['exec-1']
+
+    def test_from_lightsail_uses_cache(self, generator, instances):
+        """测试相同 region/profile 的 Lightsail 查询复用缓存"""
+        with patch('core.inventory_generator.LightsailManager') as mock_manager:
+            mock_manager.return_value.list_instances.return_value = instances
+
+            first = generator.from_lightsail('ap-northeast-1')
+            second = generator.from_lightsail(
+                'ap-northeast-1', tags_filter={'Environment': 'prod'}
+            )
+
+            assert mock_manager.return_value.list_instances.call_count == 1
+            assert len(first['all']['hosts']) == 3
+            assert list(second['all']['hosts']) == ['collector-1']
+
+            generator.from_lightsail('us-east-1')
+            assert mock_manager.return_value.list_instances.call_count == 2
+
+    def test_from_lightsail_cache_expired(self, instances):
+        """测试缓存过期后重新查询"""
+        generator = InventoryGenerator(cache_ttl=0)
+        with patch('core.inventory_generator.LightsailManager') as mock_manager:
+            mock_manager.return_value.list_instances.return_value = instances
+
+            generator.from_lightsail('ap-northeast-1')
+            generator.from_lightsail('ap-northeast-1')
+
+            assert mock_manager.return_value.list_instances.call_count == 2
+
+    def test_from_lightsail_tags_filter_requires_all_tags(self, generator, instances):
+        """测试标签过滤要求所有标签都匹配"""
+        with patch('core.inventory_generator.LightsailManager') as mock_manager:
+            mock_manager.return_value.list_instances.return_value = instances
+
+            inventory = generator.from_lightsail(
+                'ap-northeast-1',
+                tags_filter={'Environment': 'dev', 'Service': 'monitor'}
+            )
+            assert list(inventory['all']['hosts']) == ['monitor-1']
+
+            inventory = generator.from_lightsail(
+                'ap-northeast-1',
+                tags_filter={'Environment': 'prod', 'Service': 'monitor'}
+            )
+            assert inventory['all']['hosts'] == {}
+
+    def test_from_manual_config_yaml(self, generator, tmp_path):
+        """测试从 YAML 手动配置生成 inventory"""
+        config_file = tmp_path / 'instances.yml'
+        config_file.write_text(
+            "instances:\n"
+            "  - name: monitor-1\n"
+            "    public_ip: 5.6.7.8\n"
+            "    service_type: monitor\n"
+        )
+
+        inventory = generator.from_manual_config(str(config_file))
+
+        assert inventory['all']['hosts']['monitor-1']['ansible_host'] == '5.6.7.8'
+        assert inventory['all']['children']['monitors']['hosts'] == ['monitor-1']
+        # 返回普通字典，可直接序列化
+        json.dumps(inventory)
+
+    def test_save_inventory_stable_output(self, generator, instances, tmp_path):
+        """测试 inventory 输出稳定且内容未变化时跳过写入"""
+        output_file = tmp_path / 'inventory.json'
+
+        assert generator.save_inventory(
+            generator._build_inventory(instances), str(output_file)
+        ) is True
+        first = output_file.read_bytes()
+
+        # 输入顺序不同，输出字节一致，不重复写入
+        assert generator.save_inventory(
+            generator._build_inventory(list(reversed(instances))), str(output_file)
+        ) is False
+        assert output_file.read_bytes() == first
+
+    def test_save_inventory_does_not_modify_input(self, generator, instances, tmp_path):
+        """测试保存时排序不修改调用方的 inventory"""
+        inventory = generator._build_inventory(list(reversed(instances)))
+        inventory['all']['children']['monitors']['hosts'] = ['monitor-2', 'monitor-1']
+
+        generator.save_inventory(inventory, str(tmp_path / 'inventory.json'))
+
+        assert inventory['all']['children']['monitors']['hosts'] == ['monitor-2', 'monitor-1']
+
+    def test_save_inventory_yaml(self, generator, instances, tmp_path):
+        """测试以 YAML 格式保存 inventory"""
+        output_file = tmp_path / 'inventory.yml'
+        inventory = generator._build_inventory(instances)
+        generator.save_inventory(inventory, str(output_file))
+
+        loaded = yaml.safe_load(output_file.read_text())
+        assert loaded == inventory
@@ -0,0 +1,115 @@
+"""
+Unit tests for logger
+测试日志管理模块
+"""
+
+import logging
+import threading
+import logging.handlers
+
+import pytest
+from unittest.mock import patch
+
+from core.utils import logger as logger_module
+
+
+class TestLoggerSetup:
+    """LoggerSetup 单元测试"""
+
+    @pytest.fixture
+    def logger_setup(self, tmp_path, monkeypatch):
+        """日志目录指向临时目录，测试结束后恢复根日志记录器"""
+        setup = logger_module._logger_setup
+        root = logging.getLogger()
+        saved = (setup.log_dir, setup.buffered_handler, root.level, list(root.handlers))
+        for name in ('logThreads', 'logProcesses', 'logMultiprocessing', '_srcfile'):
+            monkeypatch.setattr(logging, name, getattr(logging, name))
+        setup.log_dir = str(tmp_path)
+        yield setup
+        setup.shutdown()
+        setup.log_dir, setup.buffered_handler, level, handlers = saved
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+    def test_file_logs_buffered_until_flush(self, logger_setup, tmp_path):
+        """测试 INFO 日志先缓冲，flush_logs 后写入文件"""
+        logger_setup.setup()
+        log_file = tmp_path / 'deployment.log'
+
+        logging.getLogger('test.buffer').info('buffered message')
+        logger_setup.listener.queue.join()
+        # 文件延迟到第一次写入时才创建
+        assert not log_file.exists()
+
+        logger_module.flush_logs()
+        assert 'buffered message' in log_file.read_text(encoding='utf-8')
+
+    def test_file_handler_rotates_daily(self, logger_setup):
+        """测试文件日志按 UTC 午夜轮转"""
+        logger_setup.setup()
+
+        file_handler = logger_setup.buffered_handler.target
+        assert isinstance(file_handler, logging.handlers.TimedRotatingFileHandler)
+        assert file_handler.when == 'MIDNIGHT' and file_handler.utc is True
+        assert file_handler.backupCount == logger_module.LOG_BACKUP_COUNT
+
+    def test_root_logger_only_enqueues(self, logger_setup):
+        """测试根日志记录器只挂载 QueueHandler，由监听器线程写出日志"""
+        root = logger_setup.setup()
+
+        assert len(root.handlers) == 1
+        assert isinstance(root.handlers[0], logging.handlers.QueueHandler)
+        assert logger_setup.buffered_handler in logger_setup.listener.handlers
+
+        logger_setup.setup()
+        assert len(root.handlers) == 1
+
+    def test_unused_record_attributes_disabled(self, logger_setup):
+        """测试配置后日志记录不再采集线程、进程信息与调用位置"""
+        logger_setup.setup()
+
+        record = logging.getLogger('test.record').makeRecord(
+            'test.record', logging.INFO, 'fn', 1, 'msg', None, None
+        )
+        assert record.threadName is None and record.processName is None
+        assert logging._srcfile is None
+
+    def test_log_dir_created_once(self, logger_setup, monkeypatch):
+        """测试日志目录只在首次配置时创建"""
+        monkeypatch.setattr(logger_module.LoggerSetup, '_dir_ready', False)
+        with patch('core.utils.logger.os.makedirs') as mock_makedirs:
+            logger_setup.setup()
+            logger_setup.setup()
+
+        mock_makedirs.assert_called_once_with(logger_setup.log_dir, exist_ok=True)
+
+    def test_error_flushes_immediately(self, logger_setup, tmp_path):
+        """测试 ERROR 日志连同之前缓冲的日志立即写入文件"""
+        logger_setup.setup()
+        log_file = tmp_path / 'deployment.log'
+
+        log = logging.getLogger('test.error')
+        log.info('before error')
+        log.error('boom')
+        logger_setup.listener.queue.join()
+
+        content = log_file.read_text(encoding='utf-8')
+        assert 'before error' in content and 'boom' in content
+
+    def test_singleton_across_threads(self, monkeypatch):
+        """测试多个线程同时创建时只产生一个实例"""
+        monkeypatch.setattr(logger_module.LoggerSetup, '_instance', None)
+        barrier = threading.Barrier(8)
+        instances = []
+
+        def create():
+            barrier.wait()
+            instances.append(logger_module.LoggerSetup())
+
+        threads = [threading.Thread(target=create) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(instance) for instance in instances}) == 1
@@ -4,10 +4,16 @@ Unit tests for SecurityManager
 """
 
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from pathlib import Path
 
-from core.security_manager import SecurityManager
+from core.security_manager import SecurityManager, SecurityManagerBulk, ReadinessReactor
+
+
+@pytest.fixture(autouse=True)
+def isolate_verify_cache(tmp_path, monkeypatch):
+    """安全验证结果缓存写入临时目录，避免测试之间共享缓存"""
+    monkeypatch.setattr('core.security_manager.VERIFY_CACHE_DIR', tmp_path / 'security_cache')
 
 
 class TestSecurityManager:
@@ -46,9 +52,14 @@ class TestSecurityManager:
 
     @pytest.fixture
     def security_manager(self, security_config, mock_ansible_manager):
-        """创建 SecurityManager 实例"""
+        """创建 SecurityManager 实例（整个测试期间不进行真实的端口探测）"""
         with patch.object(SecurityManager, '_wait_for_instance_ready', return_value=True):
-            return SecurityManager(security_config)
+            yield SecurityManager(security_config)
+
+    @pytest.fixture
+    def probe_manager(self, security_config, mock_ansible_manager):
+        """创建使用真实就绪探测逻辑的 SecurityManager（socket 由测试自行 Mock）"""
+        return SecurityManager(security_config)
 
     def test_init_security_manager(self, security_manager):
         """测试 SecurityManager 初始化"""
@@ -312,6 +323,299 @@ class TestSecurityManager:
 
         assert result is False
 
+    def test_verify_security_uses_cached_result(self, security_manager, mock_ansible_manager):
+        """测试配置未变化时复用最近一次成功的验证结果，force 强制重新验证"""
+        first = security_manager.verify_security()
+        second = security_manager.verify_security()
+
+        assert first['success'] is True
+        assert second == first
+        assert mock_ansible_manager.run_playbook.call_count == 1
+
+        security_manager.verify_security(force=True)
+        assert mock_ansible_manager.run_playbook.call_count == 2
+
+    def test_verify_security_cache_invalidated(self, security_config, mock_ansible_manager):
+        """测试配置变化或验证失败时不使用缓存"""
+        SecurityManager(security_config).verify_security()
+        SecurityManager({**security_config, 'log_dropped': True}).verify_security()
+        assert mock_ansible_manager.run_playbook.call_count == 2
+
+        mock_ansible_manager.run_playbook.return_value = {'rc': 1, 'stderr': 'failed'}
+        manager = SecurityManager({**security_config, 'vpn_network': '10.9.0.0/24'})
+        manager.verify_security()
+        manager.verify_security()
+        assert mock_ansible_manager.run_playbook.call_count == 4
+
+    @pytest.mark.parametrize('mutate', [
+        lambda manager: manager.setup_firewall('monitor'),
+        lambda manager: manager.adjust_firewall_for_vpn(),
+        lambda manager: manager.install_fail2ban(),
+    ])
+    def test_verify_security_cache_dropped_after_reconfiguration(
+        self, security_manager, mock_ansible_manager, mutate
+    ):
+        """测试修改安全配置后删除验证结果缓存，下一次验证重新运行 playbook"""
+        security_manager.verify_security()
+        with patch.object(security_manager, '_load_rules_vars', return_value={}):
+            mutate(security_manager)
+        security_manager.verify_security()
+
+        verify_calls = [
+            c for c in mock_ansible_manager.run_playbook.call_args_list
+            if c.kwargs['playbook'].endswith('99_verify_security.yml')
+        ]
+        assert len(verify_calls) == 2
+
+    def test_setup_all_security_success(self, security_manager, mock_ansible_manager):
+        """测试完整安全流程：初始化后，防火墙、fail2ban、验证在一次 playbook 中按顺序执行"""
+        rules = {'public_ports': [{'port': 443, 'protocol': 'tcp'}], 'ssh_port': 22}
+        with patch.object(security_manager, '_load_security_rules', return_value=rules) as mock_rules:
+            result = security_manager.setup_all_security('monitor')
+
+            assert result is True
+            mock_rules.assert_called_once_with('monitor')
+            assert mock_ansible_manager.run_playbook.call_count == 2
+
+            initial_call, phases_call = mock_ansible_manager.run_playbook.call_args_list
+            assert '01_initial_security.yml' in str(initial_call[1]['playbook'])
+            assert str(phases_call[1]['playbook']).endswith('security/all.yml')
+            # all.yml 中 firewall 先于 fail2ban 导入，保证执行顺序
+            assert phases_call[1]['tags'] == ['firewall', 'fail2ban', 'verify']
+            extra_vars = phases_call[1]['extra_vars']
+            assert extra_vars['public_ports'] == rules['public_ports']
+            # 规则文件不能覆盖实例的 SSH 端口
+            assert extra_vars['ssh_port'] == 6677
+
+    def test_setup_all_security_phase_failure(self, security_manager, mock_ansible_manager):
+        """测试防火墙等阶段失败时返回 False"""
+        mock_ansible_manager.run_playbook.side_effect = [
+            {'rc': 0, 'stdout': '', 'stderr': ''},
+            {'rc': 2, 'stdout': '', 'stderr': 'firewall failed'},
+        ]
+        with patch.object(security_manager, '_load_security_rules', return_value={}):
+            assert security_manager.setup_all_security() is False
+
+    def test_setup_all_security_initial_failure(self, security_manager):
+        """测试初始安全配置失败时直接返回"""
+        with patch.object(security_manager, 'setup_initial_security', return_value=False), \
+             patch.object(security_manager, 'run_security_phases') as mock_phases:
+            result = security_manager.setup_all_security()
+
+            assert result is False
+            mock_phases.assert_not_called()
+
+    def test_run_security_phases_single_playbook(self, security_manager, mock_ansible_manager):
+        """测试多个安全阶段在一次 playbook 执行中完成"""
+        result = security_manager.run_security_phases(['fail2ban', 'verify'])
+
+        assert result is True
+        mock_ansible_manager.run_playbook.assert_called_once()
+        call_args = mock_ansible_manager.run_playbook.call_args
+        assert str(call_args[1]['playbook']).endswith('security/all.yml')
+        assert call_args[1]['tags'] == ['fail2ban', 'verify']
+        assert call_args[1]['extra_vars']['ssh_port'] == 6677
+
+    def test_run_security_phases_unknown_phase(self, security_manager):
+        """测试未知阶段被拒绝"""
+        with pytest.raises(ValueError):
+            security_manager.run_security_phases(['firewall', 'database'])
+
+    def test_run_security_phases_loads_firewall_profile(self, security_manager, mock_ansible_manager):
+        """测试 firewall 阶段使用所选规则配置"""
+        with patch.object(security_manager, '_load_security_rules',
+                          return_value={'public_ports': [{'port': 80}]}) as mock_rules:
+            assert security_manager.run_security_phases(['firewall'], rules_profile='execution') is True
+
+            mock_rules.assert_called_once_with('execution')
+            extra_vars = mock_ansible_manager.run_playbook.call_args[1]['extra_vars']
+            assert extra_vars['public_ports'] == [{'port': 80}]
+
+    def test_run_security_phases_service_requires_type(self, security_manager, mock_ansible_manager):
+        """测试 service 阶段必须提供 service_type，并加载对应服务规则"""
+        assert security_manager.run_security_phases(['service']) is False
+        mock_ansible_manager.run_playbook.assert_not_called()
+
+        with patch.object(security_manager, '_load_security_rules', return_value={}) as mock_rules:
+            assert security_manager.run_security_phases(
+                ['service'], extra_vars={'service_type': 'monitor'}
+            ) is True
+            mock_rules.assert_called_once_with('monitor_rules')
+
+    def test_run_security_phases_rejects_firewall_with_service(self, security_manager):
+        """测试 firewall 与 service 阶段不能合并执行"""
+        with pytest.raises(ValueError):
+            security_manager.run_security_phases(
+                ['firewall', 'service'], extra_vars={'service_type': 'monitor'}
+            )
+
+    @staticmethod
+    def _local_server(banner):
+        """启动本地 TCP 服务，接受连接后发送 banner（None 表示不发送）"""
+        import socket
+        import threading
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+
+        def serve():
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                try:
+                    if banner is not None:
+                        conn.sendall(banner)
+                    conn.recv(1)
+                except OSError:
+                    pass
+
+        threading.Thread(target=serve, daemon=True).start()
+        return server
+
+    def test_wait_for_instance_ready_checks_ssh_banner(self, probe_manager):
+        """测试等待实例就绪：收到 SSH 标识后返回"""
+        probe_manager.config['instance_ip'] = '127.0.0.1'
+        server = self._local_server(b'SSH-2.0-OpenSSH_9.6\r\n')
+        with server, patch.object(probe_manager, '_open_control_master') as mock_master:
+            port = server.getsockname()[1]
+            assert probe_manager._wait_for_instance_ready(timeout=5, port=port) is True
+
+        mock_master.assert_called_once_with(port)
+
+    def test_wait_for_instance_ready_requires_banner(self, probe_manager):
+        """测试端口可连接但没有 SSH 标识时不视为就绪"""
+        probe_manager.config['instance_ip'] = '127.0.0.1'
+        server = self._local_server(None)
+        with server:
+            port = server.getsockname()[1]
+            assert probe_manager._wait_for_instance_ready(timeout=0.5, port=port) is False
+
+    def test_wait_for_instance_ready_timeout(self, probe_manager):
+        """测试端口一直拒绝连接时退避重试并超时返回 False"""
+        import socket
+        import time
+        probe_manager.config['instance_ip'] = '127.0.0.1'
+        with socket.socket() as closed:
+            closed.bind(('127.0.0.1', 0))
+            port = closed.getsockname()[1]
+
+        start = time.monotonic()
+        with patch.object(ReadinessReactor, '_open_probe_socket',
+                          wraps=ReadinessReactor._open_probe_socket) as mock_open:
+            assert probe_manager._wait_for_instance_ready(timeout=1.2, port=port) is False
+
+        assert 1.2 <= time.monotonic() - start < 3
+        # 退避间隔 0.5s、1.0s：1.2s 内共连接 2 次
+        assert mock_open.call_count == 2
+
+    def test_readiness_reactor_shares_one_thread(self):
+        """测试多个探测共用一个反应器线程"""
+        import threading
+        reactor = ReadinessReactor()
+        servers = [self._local_server(b'SSH-2.0-OpenSSH_9.6\r\n') for _ in range(3)]
+        silent = self._local_server(None)
+
+        threads_before = threading.active_count()
+        futures = [reactor.wait('127.0.0.1', s.getsockname()[1], 5) for s in servers]
+        futures.append(reactor.wait('127.0.0.1', silent.getsockname()[1], 0.5))
+        assert threading.active_count() <= threads_before + 1
+
+        assert [f.result(timeout=10) for f in futures] == [True, True, True, False]
+        for server in servers + [silent]:
+            server.close()
+
+    def test_readiness_reactor_recovers_from_loop_error(self):
+        """测试反应器线程出错时所有等待中的探测返回 False，之后的探测重新启动线程"""
+        reactor = ReadinessReactor()
+        silent = self._local_server(None)
+        port = silent.getsockname()[1]
+
+        with patch.object(reactor, '_on_ready', side_effect=OSError('selector error')):
+            future = reactor.wait('127.0.0.1', port, 5)
+            assert future.result(timeout=5) is False
+        assert reactor._thread is None
+
+        server = self._local_server(b'SSH-2.0-OpenSSH_9.6\r\n')
+        assert reactor.result(reactor.wait('127.0.0.1', server.getsockname()[1], 5), 5) is True
+        for sock in (silent, server):
+            sock.close()
+
+    def test_setup_all_security_async(self, security_manager, mock_ansible_manager):
+        """测试异步完整安全配置：初始配置后按标签运行 all.yml"""
+        import asyncio
+        mock_ansible_manager.run_playbook_async = AsyncMock(return_value={'rc': 0})
+
+        with patch.object(security_manager, '_wait_for_instance_ready_async',
+                          AsyncMock(return_value=True)):
+            assert asyncio.run(security_manager.setup_all_security_async()) is True
+
+        calls = mock_ansible_manager.run_playbook_async.call_args_list
+        assert len(calls) == 2
+        assert calls[0].kwargs['playbook'].endswith('01_initial_security.yml')
+        assert calls[1].kwargs['playbook'].endswith('all.yml')
+        assert calls[1].kwargs['tags'] == ['firewall', 'fail2ban', 'verify']
+        assert 'public_ports' in calls[1].kwargs['extra_vars']
+        mock_ansible_manager.run_playbook.assert_not_called()
+
+    def test_setup_all_security_async_initial_failure(self, security_manager, mock_ansible_manager):
+        """测试异步初始配置失败时不运行后续阶段"""
+        import asyncio
+        mock_ansible_manager.run_playbook_async = AsyncMock(return_value={'rc': 1, 'stderr': 'boom'})
+
+        with patch.object(security_manager, '_wait_for_instance_ready_async',
+                          AsyncMock(return_value=True)):
+            assert asyncio.run(security_manager.setup_all_security_async()) is False
+
+        assert mock_ansible_manager.run_playbook_async.call_count == 1
+
+    def test_wait_for_instance_ready_async(self, probe_manager):
+        """测试异步就绪探测：收到 SSH 标识返回 True，无标识时超时"""
+        import asyncio
+        probe_manager.config['instance_ip'] = '127.0.0.1'
+
+        with self._local_server(b'SSH-2.0-OpenSSH_9.6\r\n') as server, \
+             patch.object(probe_manager, '_open_control_master') as mock_master:
+            port = server.getsockname()[1]
+            assert asyncio.run(probe_manager._wait_for_instance_ready_async(timeout=5, port=port)) is True
+            mock_master.assert_called_once_with(port)
+
+        with self._local_server(None) as server:
+            port = server.getsockname()[1]
+            assert asyncio.run(probe_manager._wait_for_instance_ready_async(timeout=0.5, port=port)) is False
+
+    def test_open_control_master(self, security_manager):
+        """测试实例就绪后在后台建立 SSH 主连接，并在退出时关闭"""
+        with patch('core.security_manager.subprocess.Popen') as mock_popen, \
+             patch('core.security_manager.atexit.register') as mock_register, \
+             patch('core.security_manager.Path.mkdir'):
+            assert security_manager._open_control_master(6677) is True
+            assert security_manager._open_control_master(6677) is False
+
+        cmd = mock_popen.call_args.args[0]
+        mock_popen.assert_called_once()
+        assert cmd[:4] == ['ssh', '-M', '-N', '-f']
+        assert 'ubuntu@1.2.3.4' == cmd[-1]
+        assert cmd[cmd.index('-p') + 1] == '6677'
+        mock_register.assert_called_once_with(security_manager._close_control_master)
+
+        with patch('core.security_manager.subprocess.run') as mock_run:
+            security_manager._close_control_master()
+            security_manager._close_control_master()
+
+        mock_run.assert_called_once()
+        assert mock_run.call_args.args[0][:3] == ['ssh', '-O', 'exit']
+
+    def test_control_master_can_be_disabled(self, security_config, mock_ansible_manager):
+        """测试 ssh_control_master: false 时不建立主连接"""
+        manager = SecurityManager({**security_config, 'ssh_control_master': False})
+
+        with patch('core.security_manager.subprocess.Popen') as mock_popen:
+            assert manager._open_control_master(6677) is False
+
+        mock_popen.assert_not_called()
+
     def test_create_inventory(self, security_manager):
         """测试创建 Ansible inventory"""
         inventory = security_manager._create_inventory()
@@ -331,6 +635,45 @@ class TestSecurityManager:
         assert 'wireguard_port' in base_vars
         assert 'vpn_network' in base_vars
 
+    def test_get_security_status_single_ssh_call(self, security_manager):
+        """测试安全状态通过一次 SSH 执行查询并解析"""
+        sep = '=====quants-infra-status=====\n'
+        stdout = (
+            "-P INPUT DROP\n-A INPUT -p tcp --dport 6677 -j ACCEPT\n-A INPUT -i lo -j ACCEPT\n" + sep +
+            "port 6677\npasswordauthentication no\npermitrootlogin no\n" + sep +
+            "Status\n|- Number of jail:\t1\n`- Jail list:\tsshd\n" + sep +
+            "LISTEN 0      128    0.0.0.0:6677   0.0.0.0:*\nLISTEN 0      128       [::]:6677      [::]:*\n"
+        )
+        with patch('core.security_manager.subprocess.run',
+                   return_value=Mock(returncode=0, stdout=stdout, stderr='')) as mock_run:
+            status = security_manager.get_security_status()
+
+        mock_run.assert_called_once()
+        assert status['firewall'] == {'status': 'active', 'rules_count': 2}
+        assert status['ssh']['port'] == 6677
+        assert status['ssh']['password_auth'] == 'disabled'
+        assert status['ssh']['root_login'] == 'disabled'
+        assert status['fail2ban'] == {'status': 'active', 'jails': ['sshd']}
+        assert status['open_ports'] == [{'port': 6677, 'protocol': 'tcp'}]
+
+    def test_get_security_status_ssh_failure(self, security_manager):
+        """测试 SSH 连接失败时返回错误信息"""
+        with patch('core.security_manager.subprocess.run',
+                   return_value=Mock(returncode=255, stdout='', stderr='Connection refused')):
+            status = security_manager.get_security_status()
+
+        assert status['success'] is False
+        assert 'Connection refused' in status['error']
+
+    def test_inventory_and_base_vars_cached(self, security_manager):
+        """测试 inventory 与基础变量只构建一次，_get_base_vars 返回副本"""
+        assert security_manager._create_inventory() is security_manager._inventory
+        assert security_manager._inventory is security_manager._inventory
+
+        base_vars = security_manager._get_base_vars()
+        base_vars['ssh_port'] = 22
+        assert security_manager._base_vars['ssh_port'] == 6677
+
     @patch('pathlib.Path.exists')
     @patch('pathlib.Path.read_text')
     def test_load_security_rules_success(self, mock_read, mock_exists, security_manager):
@@ -350,6 +693,109 @@ vpn_only_ports:
         assert rules is not None
         assert 'public_ports' in rules
 
+    def test_rules_preloaded_at_init(self, security_manager):
+        """测试初始化时预加载规则，加载规则不再访问文件系统"""
+        assert 'default_rules' in security_manager._rules_cache
+
+        with patch.object(security_manager, '_resolve_rules_path') as mock_resolve:
+            rules = security_manager._load_security_rules('data-collector_rules')
+            rules['extra'] = True
+
+        mock_resolve.assert_not_called()
+        assert 'extra' not in security_manager._rules_cache['data_collector_rules']
+
+    def test_resolve_rules_path_uses_lookup_table(self, security_manager):
+        """测试规则路径通过预先扫描的查找表解析，不再逐个探测文件"""
+        with patch('pathlib.Path.exists', side_effect=AssertionError('unexpected stat')):
+            assert security_manager._resolve_rules_path('data-collector').name == 'data_collector.yml'
+            assert security_manager._resolve_rules_path('monitor').name == 'monitor_rules.yml'
+            assert security_manager._resolve_rules_path('default_rules').name == 'default_rules.yml'
+            with pytest.raises(FileNotFoundError):
+                security_manager._resolve_rules_path('database')
+
+    def test_parse_verification_results_from_task_results(self, security_manager):
+        """测试从结构化任务结果解析验证结果"""
+        def status(firewall):
+            return {'summary': {'firewall_status': firewall, 'ssh_status': 'PASS',
+                                'fail2ban_status': 'PASS', 'overall_status': 'PASS'}}
+
+        result = {
+            'rc': 0,
+            'task_results': [
+                {'host': '1.2.3.4', 'event': 'runner_on_ok', 'res': {'security_status': status('PASS')}},
+                {'host': '1.2.3.5', 'event': 'runner_on_ok', 'res': {'security_status': status('FAIL')}},
+                {'host': '1.2.3.4', 'event': 'runner_on_ok', 'res': {'changed': False}}
+            ]
+        }
+
+        parsed = security_manager._parse_verification_results(result)
+
+        assert parsed['success'] is True
+        assert parsed['firewall'] == 'failed'
+        assert parsed['ssh'] == 'hardened'
+        assert set(parsed['hosts']) == {'1.2.3.4', '1.2.3.5'}
+
+    def test_unexpected_errors_propagate(self, security_manager, mock_ansible_manager):
+        """测试预期错误返回 False，程序错误直接抛出"""
+        mock_ansible_manager.run_playbook.side_effect = OSError("ssh failed")
+        assert security_manager.install_fail2ban() is False
+
+        mock_ansible_manager.run_playbook.side_effect = AttributeError("bug")
+        with pytest.raises(AttributeError):
+            security_manager.install_fail2ban()
+
+    def test_ansible_manager_created_lazily(self, security_config, mock_ansible_manager):
+        """测试 AnsibleManager 与 SSH 密钥检查延迟到首次使用"""
+        with patch('pathlib.Path.exists', return_value=False), \
+             patch('core.security_manager.AnsibleManager') as mock_am:
+            manager = SecurityManager(security_config)
+            mock_am.assert_not_called()
+
+            with pytest.raises(FileNotFoundError):
+                manager.ansible_manager
+            assert manager.setup_firewall() is False
+            mock_am.assert_not_called()
+
+    def test_lazy_rules_skips_preload(self, security_config, mock_ansible_manager):
+        """测试 lazy_rules 关闭预加载"""
+        manager = SecurityManager({**security_config, 'lazy_rules': True})
+
+        assert manager._rules_cache is None
+
+    def test_load_security_rules_utf8_bytes(self, security_manager, tmp_path):
+        """测试以字节方式解析包含中文注释的规则文件"""
+        rules_file = tmp_path / 'utf8_rules.yml'
+        rules_file.write_bytes("# 公开端口\npublic_ports:\n  - port: 80\n    comment: 网页\n".encode('utf-8'))
+
+        with patch.object(security_manager, '_resolve_rules_path', return_value=rules_file):
+            rules = security_manager._load_security_rules('utf8')
+
+        assert rules['public_ports'] == [{'port': 80, 'comment': '网页'}]
+
+    def test_load_security_rules_cached_by_mtime(self, security_manager, tmp_path):
+        """测试规则文件按修改时间缓存，修改后重新加载"""
+        import os
+        rules_file = tmp_path / 'custom.yml'
+        rules_file.write_text("public_ports: []\nssh_port: 22\n")
+
+        with patch.object(security_manager, '_resolve_rules_path', return_value=rules_file), \
+             patch('core.security_manager.yaml.load', wraps=__import__('yaml').load) as mock_load:
+            first = security_manager._load_security_rules('custom')
+            first.pop('ssh_port')
+            second = security_manager._load_security_rules('custom')
+
+            # 调用方修改返回值不影响缓存
+            assert second['ssh_port'] == 22
+            assert mock_load.call_count == 1
+
+            rules_file.write_text("public_ports: []\nssh_port: 2222\n")
+            stat = rules_file.stat()
+            os.utime(rules_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            third = security_manager._load_security_rules('custom')
+
+            assert third['ssh_port'] == 2222
+            assert mock_load.call_count == 2
+
     @patch('pathlib.Path.exists')
     def test_load_security_rules_not_found(self, mock_exists, security_manager):
         """测试加载不存在的安全规则"""
@@ -359,6 +805,91 @@ vpn_only_ports:
             security_manager._load_security_rules('nonexistent')
 
 
+class TestSecurityManagerBulk:
+    """SecurityManagerBulk 单元测试"""
+
+    @pytest.fixture(autouse=True)
+    def mock_path_exists(self):
+        """自动 Mock Path.exists"""
+        with patch('pathlib.Path.exists', return_value=True):
+            yield
+
+    @pytest.fixture
+    def bulk_configs(self):
+        """三个实例的安全配置"""
+        return [
+            {
+                'instance_ip': f'10.0.1.{i}',
+                'ssh_user': 'ubuntu',
+                'ssh_key_path': '/path/to/key.pem',
+                'ssh_port': 6677
+            }
+            for i in range(1, 4)
+        ]
+
+    @pytest.fixture
+    def mock_ansible_manager(self):
+        """Mock AnsibleManager"""
+        with patch('core.security_manager.AnsibleManager') as mock_am:
+            mock_instance = Mock()
+            mock_instance.run_playbook.return_value = {'rc': 0, 'stdout': '', 'stderr': ''}
+            mock_am.return_value = mock_instance
+            yield mock_instance
+
+    def test_inventory_contains_all_hosts(self, bulk_configs):
+        """测试 inventory 包含所有实例"""
+        manager = SecurityManagerBulk(bulk_configs)
+
+        hosts = manager._inventory['all']['hosts']
+        assert list(hosts) == ['10.0.1.1', '10.0.1.2', '10.0.1.3']
+        assert all(h['ansible_port'] == 6677 for h in hosts.values())
+
+    def test_phases_run_once_for_all_hosts(self, bulk_configs, mock_ansible_manager):
+        """测试安全阶段只执行一次 playbook"""
+        manager = SecurityManagerBulk(bulk_configs)
+
+        assert manager.run_security_phases(['firewall', 'fail2ban']) is True
+
+        mock_ansible_manager.run_playbook.assert_called_once()
+        inventory = mock_ansible_manager.run_playbook.call_args[1]['inventory']
+        assert len(inventory['all']['hosts']) == 3
+
+    def test_wait_submits_all_probes_to_reactor(self, bulk_configs):
+        """测试所有实例的探测一次性提交到反应器，就绪的实例建立主连接"""
+        from concurrent.futures import Future
+
+        def probe(host, port, timeout):
+            future = Future()
+            future.set_result(host != '10.0.1.2')
+            return future
+
+        manager = SecurityManagerBulk(bulk_configs)
+        reactor = Mock()
+        reactor.wait.side_effect = probe
+        reactor.result.side_effect = lambda future, timeout: future.result(timeout)
+
+        with patch.object(ReadinessReactor, 'default', return_value=reactor), \
+             patch.object(SecurityManager, '_open_control_master') as mock_master:
+            assert manager._wait_for_instance_ready(timeout=5, port=6677) is False
+
+        assert [c.args[0] for c in reactor.wait.call_args_list] == ['10.0.1.1', '10.0.1.2', '10.0.1.3']
+        assert mock_master.call_count == 2
+
+    def test_rejects_inconsistent_base_vars(self, bulk_configs):
+        """测试各实例基础变量不一致时报错"""
+        bulk_configs[1]['ssh_port'] = 2222
+
+        with pytest.raises(ValueError):
+            SecurityManagerBulk(bulk_configs)
+
+    def test_rejects_duplicate_and_empty(self, bulk_configs):
+        """测试重复IP与空配置"""
+        with pytest.raises(ValueError):
+            SecurityManagerBulk([])
+        with pytest.raises(ValueError):
+            SecurityManagerBulk([bulk_configs[0], dict(bulk_configs[0])])
+
+
 class TestSecurityManagerEdgeCases:
     """SecurityManager 边界情况测试"""
 
@@ -435,8 +966,9 @@ class TestSecurityManagerEdgeCases:
         
         manager = SecurityManager(config)
         
-        with pytest.raises(ConnectionError):
-            manager.setup_initial_security()
+        with patch.object(manager, '_wait_for_instance_ready', return_value=True):
+            with pytest.raises(ConnectionError):
+                manager.setup_initial_security()
 
 
 class TestSecurityManagerIntegration:
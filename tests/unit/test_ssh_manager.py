@@ -0,0 +1,436 @@
+"""
+Unit tests for SSHManager
+测试 SSH 管理器的所有功能
+"""
+
+import os
+import threading
+
+import pytest
+from unittest.mock import Mock, patch
+
+from core.ssh_manager import SSHManager
+
+
+class TestSSHManager:
+    """SSHManager 单元测试"""
+
+    @pytest.fixture
+    def ssh_manager(self, tmp_path):
+        """创建 SSHManager 实例（家目录指向临时目录，不启动真实 ssh-keygen）"""
+        with patch('core.ssh_manager.os.path.expanduser', return_value=str(tmp_path)), \
+             patch('core.ssh_manager.subprocess.Popen'):
+            manager = SSHManager({'ssh_port': 22})
+        manager._keygen_proc = None
+        return manager
+
+    @pytest.fixture
+    def hosts(self):
+        """vpn_hosts.json 格式的两个主机"""
+        return {
+            'all': {
+                'hosts': {
+                    f'node-{i}': {
+                        'ansible_host': f'10.0.0.{i}',
+                        'ansible_user': 'ubuntu',
+                        'ansible_port': 22,
+                        'ansible_ssh_private_key_file': '~/.ssh/id_rsa'
+                    }
+                    for i in (1, 2)
+                }
+            }
+        }
+
+    def test_test_ssh_connections_runs_concurrently(self, ssh_manager, hosts):
+        """测试所有主机的连接并发测试，sudo 不可用时再测试 root，结果按主机合并"""
+        barrier = threading.Barrier(2, timeout=2)
+
+        def fake_test(host_config):
+            barrier.wait()
+            return {
+                'host': host_config['host'],
+                'success': host_config['username'] != 'root',
+                'message': host_config['username']
+            }
+
+        with patch.object(ssh_manager, '_test_single_connection', side_effect=fake_test):
+            results = ssh_manager.test_ssh_connections(hosts)
+
+        assert [r['host'] for r in results] == ['node-1', 'node-2']
+        for result in results:
+            assert result['user_tests']['normal_user'] == {
+                'username': 'ubuntu', 'success': True, 'message': 'ubuntu'
+            }
+            assert result['user_tests']['root'] == {'success': False, 'message': 'root'}
+
+    def test_init_starts_keygen_in_background(self, tmp_path):
+        """测试密钥对不存在时在初始化阶段后台生成，配置本地 SSH 时等待其完成"""
+        proc = Mock(returncode=0, args=['ssh-keygen'])
+        proc.communicate.return_value = (None, b'')
+
+        with patch('core.ssh_manager.os.path.expanduser', return_value=str(tmp_path)), \
+             patch('core.ssh_manager.subprocess.Popen', return_value=proc) as mock_popen:
+            manager = SSHManager({'ssh_port': 22})
+
+        assert mock_popen.call_args.args[0][:2] == ['ssh-keygen', '-t']
+        assert manager._keygen_proc is proc
+        (tmp_path / '.ssh' / 'id_rsa').write_text('private')
+        (tmp_path / '.ssh' / 'id_rsa.pub').write_text('public')
+
+        with patch('core.ssh_manager.subprocess.run') as mock_run:
+            assert manager._setup_local_ssh() is True
+
+        proc.communicate.assert_called_once()
+        mock_run.assert_not_called()
+        assert manager._keygen_proc is None
+
+    def test_setup_local_ssh_skips_chmod_when_mode_correct(self, ssh_manager, tmp_path):
+        """测试密钥权限已正确时不再 chmod，权限不正确时修正"""
+        private_key = tmp_path / '.ssh' / 'id_rsa'
+        public_key = tmp_path / '.ssh' / 'id_rsa.pub'
+        (tmp_path / '.ssh').mkdir(exist_ok=True)
+        private_key.write_text('private')
+        public_key.write_text('public')
+        os.chmod(private_key, 0o600)
+        os.chmod(public_key, 0o664)
+
+        with patch('core.ssh_manager.os.chmod', wraps=os.chmod) as mock_chmod:
+            assert ssh_manager._setup_local_ssh() is True
+
+        mock_chmod.assert_called_once_with(str(public_key), 0o644)
+        assert public_key.stat().st_mode & 0o777 == 0o644
+
+    def test_init_skips_keygen_with_existing_key(self, tmp_path):
+        """测试密钥对已存在时不启动后台 ssh-keygen"""
+        (tmp_path / '.ssh').mkdir()
+        (tmp_path / '.ssh' / 'id_rsa').write_text('private')
+
+        with patch('core.ssh_manager.os.path.expanduser', return_value=str(tmp_path)), \
+             patch('core.ssh_manager.subprocess.Popen') as mock_popen:
+            manager = SSHManager({'ssh_port': 22})
+
+        mock_popen.assert_not_called()
+        assert manager._keygen_proc is None
+
+    def test_test_ssh_connections_invalid_hosts(self, ssh_manager):
+        """测试无效的主机配置格式"""
+        with pytest.raises(ValueError):
+            ssh_manager.test_ssh_connections({'hosts': {}})
+
+    def test_test_ssh_connections_cached(self, ssh_manager, hosts):
+        """测试 TTL 内重复调用复用测试结果，主机配置变化或清空缓存后重新测试"""
+        def fake_test(host_config):
+            return {'host': host_config['host'], 'success': True, 'message': 'ok'}
+
+        with patch.object(ssh_manager, '_test_single_connection', side_effect=fake_test) as mock_test:
+            assert ssh_manager.verify_all_connections(hosts) is True
+            ssh_manager.get_connection_status(hosts)
+            assert mock_test.call_count == 4
+
+            hosts['all']['hosts']['node-2']['ansible_port'] = 6677
+            ssh_manager.test_ssh_connections(hosts)
+            assert mock_test.call_count == 8
+
+            ssh_manager.invalidate_test_cache()
+            ssh_manager.test_ssh_connections(hosts)
+            assert mock_test.call_count == 12
+
+    def test_test_ssh_connections_cache_expires(self, ssh_manager, hosts):
+        """测试缓存过期后重新测试"""
+        def fake_test(host_config):
+            return {'host': host_config['host'], 'success': True, 'message': 'ok'}
+
+        with patch.object(ssh_manager, '_test_single_connection', side_effect=fake_test) as mock_test, \
+             patch('core.ssh_manager.time.monotonic', side_effect=[0, 100, 100]):
+            ssh_manager.test_ssh_connections(hosts)
+            ssh_manager.test_ssh_connections(hosts)
+
+        assert mock_test.call_count == 8
+
+    def test_setup_ssh_provisions_hosts_concurrently(self, ssh_manager, hosts, tmp_path):
+        """测试各主机并发配置，任一主机失败时整体失败"""
+        barrier = threading.Barrier(2, timeout=2)
+
+        def provision(hostname, host_config, public_key):
+            barrier.wait()
+            return hostname != 'node-2'
+
+        ssh_manager.output_dir = str(tmp_path / 'scripts')
+        with patch.object(ssh_manager, '_read_public_key', return_value='ssh-ed25519 AAAA test'), \
+             patch.object(ssh_manager, '_open_control_master', return_value=True), \
+             patch.object(ssh_manager, '_provision_one', side_effect=provision) as mock_provision:
+            assert ssh_manager.setup_ssh(hosts) is False
+
+        assert mock_provision.call_count == 2
+
+    def test_setup_ssh_multiplexes_connections(self, ssh_manager, hosts, tmp_path):
+        """测试每个主机预先建立一次主连接，初始化文件以 tar 流通过一次 SSH 调用传输并执行"""
+        import io
+        import tarfile
+
+        with patch('core.ssh_manager.SSH_CONTROL_DIR', str(tmp_path / 'cm')), \
+             patch('core.ssh_manager.subprocess.run') as mock_run, \
+             patch.object(ssh_manager, '_read_public_key', return_value='ssh-ed25519 AAAA test'):
+            assert ssh_manager.setup_ssh(hosts) is True
+
+        calls = mock_run.call_args_list
+        masters = [c for c in calls if '-N' in c.args[0]]
+        transfers = [c for c in calls if '-N' not in c.args[0]]
+        assert len(masters) == 2 and len(transfers) == 2
+        for call in masters:
+            assert call.args[0][:3] == ['ssh', '-o', 'ControlMaster=yes']
+            assert '-f' in call.args[0]
+        for call in transfers:
+            cmd = call.args[0]
+            assert cmd[0] == 'ssh'
+            assert 'ControlMaster=auto' in cmd and 'ControlPersist=60s' in cmd
+            assert cmd[-1] == 'tar -xf - -C /tmp && sudo python3 /tmp/setup_ssh.py'
+            with tarfile.open(fileobj=io.BytesIO(call.kwargs['input'])) as tar:
+                members = {m.name: m for m in tar.getmembers()}
+                assert members['setup_ssh.py'].mode == 0o755
+                assert members['id_rsa.pub'].mode == 0o644
+                assert tar.extractfile('id_rsa.pub').read() == b'ssh-ed25519 AAAA test\n'
+                assert b'ssh-ed25519 AAAA test' in tar.extractfile('setup_ssh.py').read()
+        assert (tmp_path / 'cm').is_dir()
+        assert not os.path.exists(ssh_manager.output_dir)
+
+    @pytest.fixture
+    def key_manager(self, ssh_manager, tmp_path):
+        """使用临时目录中公钥的 SSHManager"""
+        public_key = tmp_path / 'id_rsa.pub'
+        public_key.write_text('ssh-ed25519 AAAA test@host\n')
+        ssh_manager.public_key_path = str(public_key)
+        ssh_manager.output_dir = str(tmp_path / 'scripts')
+        return ssh_manager
+
+    def test_public_key_read_once(self, key_manager, hosts):
+        """测试批量生成初始化文件时公钥只读取一次"""
+        with patch.object(key_manager, '_read_public_key',
+                          wraps=key_manager._read_public_key) as mock_read:
+            assert key_manager._initialize_virtual_ssh(hosts) is True
+
+        assert mock_read.call_count == 1
+        for hostname in hosts['all']['hosts']:
+            script = os.path.join(key_manager.output_dir, hostname, 'setup_ssh.py')
+            with open(script) as f:
+                assert 'ssh-ed25519 AAAA test@host' in f.read()
+
+    def test_fingerprint_cached(self, key_manager):
+        """测试公钥指纹缓存，重新配置本地密钥后失效"""
+        completed = Mock(returncode=0, stdout='256 SHA256:abc test@host (ED25519)\n')
+        with patch('core.ssh_manager.subprocess.run', return_value=completed) as mock_run:
+            assert key_manager._get_ssh_key_fingerprint() == '256 SHA256:abc test@host (ED25519)'
+            assert key_manager._get_ssh_key_fingerprint() == '256 SHA256:abc test@host (ED25519)'
+            assert mock_run.call_count == 1
+
+            key_manager._pubkey_cache = None
+            key_manager._get_ssh_key_fingerprint()
+            assert mock_run.call_count == 2
+
+    def test_public_key_hardlinked(self, key_manager):
+        """测试公钥以硬链接方式放入主机目录，重复生成时替换旧链接"""
+        host = {'host': 'node-1', 'ansible_host': '10.0.0.1', 'ansible_user': 'ubuntu', 'ansible_port': 22}
+
+        _, key_path = key_manager._generate_host_files(host, 'ssh-ed25519 AAAA test@host')
+        _, key_path = key_manager._generate_host_files(host, 'ssh-ed25519 AAAA test@host')
+
+        assert os.path.samefile(key_path, key_manager.public_key_path)
+
+    def test_public_key_copied_when_link_fails(self, key_manager):
+        """测试无法创建硬链接时回退为复制"""
+        host = {'host': 'node-1', 'ansible_host': '10.0.0.1', 'ansible_user': 'ubuntu', 'ansible_port': 22}
+
+        with patch('core.ssh_manager.os.link', side_effect=OSError(18, 'Invalid cross-device link')):
+            _, key_path = key_manager._generate_host_files(host, 'ssh-ed25519 AAAA test@host')
+
+        assert not os.path.samefile(key_path, key_manager.public_key_path)
+        with open(key_path) as f:
+            assert f.read() == 'ssh-ed25519 AAAA test@host\n'
+
+    def test_generate_init_script(self, ssh_manager, tmp_path):
+        """测试初始化脚本替换公钥与端口，并带执行权限"""
+        script_path = tmp_path / 'setup_ssh.py'
+        script_path.write_text('stale')
+        os.chmod(script_path, 0o600)
+
+        ssh_manager._generate_init_script(str(script_path), 'ssh-ed25519 AAAA test@host', 6677)
+
+        content = script_path.read_text()
+        assert 'f.write("ssh-ed25519 AAAA test@host\\n")' in content
+        assert 'Port 6677' in content
+        assert "print(f\"为用户 {username} 配置SSH完成\")" in content
+        assert '$' not in content
+        compile(content, str(script_path), 'exec')
+        assert os.stat(script_path).st_mode & 0o777 == 0o755
+
+    def test_generate_host_files_does_not_reread_script(self, key_manager):
+        """测试生成初始化文件后不再回读脚本验证"""
+        import builtins
+        host = {'host': 'node-1', 'ansible_host': '10.0.0.1', 'ansible_user': 'ubuntu', 'ansible_port': 22}
+
+        with patch.object(builtins, 'open', side_effect=AssertionError('unexpected open')):
+            script_path, _ = key_manager._generate_host_files(host, 'ssh-ed25519 AAAA test@host')
+
+        assert os.path.exists(script_path)
+
+    def test_initialize_cloud_ssh_writes_key_info(self, ssh_manager, hosts, tmp_path):
+        """测试云服务器模式生成密钥信息与 authorized_keys"""
+        import json
+        ssh_manager.ssh_dir = str(tmp_path / 'ssh')
+        ssh_manager.output_dir = str(tmp_path / 'scripts')
+        (tmp_path / 'ssh').mkdir()
+
+        def keygen(cmd, check):
+            key_path = cmd[cmd.index('-f') + 1]
+            with open(key_path, 'w') as f:
+                f.write('private')
+            with open(f"{key_path}.pub", 'w') as f:
+                f.write('ssh-ed25519 AAAA cloud@host\n')
+
+        with patch('core.ssh_manager.subprocess.run', side_effect=keygen):
+            assert ssh_manager._initialize_cloud_ssh(hosts) is True
+
+        output_dir = tmp_path / 'scripts' / 'cloud_deploy'
+        key_info = json.loads((output_dir / 'keys_info.json').read_text())
+        assert key_info['public_key'] == 'ssh-ed25519 AAAA cloud@host'
+        assert key_info['hosts'] == ['node-1', 'node-2']
+        assert (output_dir / 'authorized_keys').read_text() == 'ssh-ed25519 AAAA cloud@host'
+
+    @pytest.fixture
+    def key_file(self, tmp_path):
+        """权限正确的测试私钥文件"""
+        key = tmp_path / 'id_rsa'
+        key.write_text('private')
+        os.chmod(key, 0o600)
+        return str(key)
+
+    @pytest.mark.parametrize('use_ssh2', [True, False])
+    def test_single_connection_backend(self, ssh_manager, key_file, use_ssh2):
+        """测试已安装 ssh2-python 时使用 libssh2，否则使用 paramiko"""
+        import core.ssh_manager as sm
+        target = {'host': '10.0.0.1', 'username': 'ubuntu', 'port': 22, 'key_filename': key_file}
+
+        with patch.object(sm, 'Ssh2Session', Mock() if use_ssh2 else None), \
+             patch.object(ssh_manager, '_exec_ssh2', return_value=(0, '')) as mock_ssh2, \
+             patch.object(ssh_manager, '_exec_paramiko', return_value=(1, 'denied')) as mock_paramiko:
+            result = ssh_manager._test_single_connection(target)
+
+        if use_ssh2:
+            mock_ssh2.assert_called_once_with(target, key_file, sm.TEST_COMMAND)
+            mock_paramiko.assert_not_called()
+            assert result == {'host': '10.0.0.1', 'success': True, 'message': 'SSH连接成功'}
+        else:
+            mock_paramiko.assert_called_once_with(target, key_file, sm.TEST_COMMAND)
+            assert result['success'] is False
+            assert result['message'] == '命令执行失败: denied'
+
+    def test_exec_paramiko_tunes_transport(self, ssh_manager, key_file):
+        """测试 paramiko 连接使用较短的握手超时，并在执行命令前调大通道窗口"""
+        import core.ssh_manager as sm
+        target = {'host': '10.0.0.1', 'username': 'ubuntu', 'port': 22}
+        client = Mock()
+        transport = client.get_transport.return_value
+        stdout, stderr = Mock(), Mock()
+        stdout.channel.recv_exit_status.return_value = 0
+        stderr.read.return_value = b''
+
+        def exec_command(command):
+            assert transport.default_window_size == sm.TEST_WINDOW_SIZE
+            assert transport.default_max_packet_size == sm.TEST_MAX_PACKET_SIZE
+            return Mock(), stdout, stderr
+
+        client.exec_command.side_effect = exec_command
+        with patch('core.ssh_manager.paramiko.SSHClient', return_value=client):
+            assert ssh_manager._exec_paramiko(target, key_file, sm.TEST_COMMAND) == (0, '')
+
+        kwargs = client.connect.call_args.kwargs
+        assert kwargs['banner_timeout'] == kwargs['auth_timeout'] == sm.TEST_HANDSHAKE_TIMEOUT
+        client.close.assert_called_once()
+
+    def test_single_connection_auth_failure(self, ssh_manager, key_file):
+        """测试认证失败的结果"""
+        import paramiko
+        target = {'host': '10.0.0.1', 'username': 'root', 'port': 22, 'key_filename': key_file}
+
+        with patch('core.ssh_manager.Ssh2Session', None), \
+             patch.object(ssh_manager, '_exec_paramiko', side_effect=paramiko.AuthenticationException()):
+            result = ssh_manager._test_single_connection(target)
+
+        assert result['message'] == '认证失败，请检查SSH密钥配置'
+
+    @pytest.fixture
+    def fake_asyncssh(self):
+        """模拟 asyncssh 模块：root 认证失败，其他用户连接成功"""
+        from types import SimpleNamespace
+
+        class Error(Exception):
+            pass
+
+        class PermissionDenied(Error):
+            pass
+
+        class Connection:
+            def __init__(self, username):
+                self.username = username
+
+            async def __aenter__(self):
+                if self.username == 'root':
+                    raise PermissionDenied('denied')
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def run(self, command):
+                # 免密 sudo 不可用
+                return SimpleNamespace(exit_status=97 if 'sudo -n' in command else 0, stderr='')
+
+        module = SimpleNamespace(
+            Error=Error,
+            PermissionDenied=PermissionDenied,
+            connect=lambda host, **kwargs: Connection(kwargs['username'])
+        )
+        with patch('core.ssh_manager.asyncssh', module):
+            yield module
+
+    def test_test_ssh_connections_asyncssh(self, ssh_manager, hosts, key_file, fake_asyncssh):
+        """测试已安装 asyncssh 时在事件循环中并发测试，不使用线程池"""
+        for host_config in hosts['all']['hosts'].values():
+            host_config['ansible_ssh_private_key_file'] = key_file
+
+        with patch('core.ssh_manager.ThreadPoolExecutor') as mock_pool:
+            results = ssh_manager.test_ssh_connections(hosts)
+
+        mock_pool.assert_not_called()
+        assert [r['host'] for r in results] == ['node-1', 'node-2']
+        for result in results:
+            assert result['user_tests']['normal_user']['success'] is True
+            assert result['user_tests']['root'] == {
+                'success': False, 'message': '认证失败，请检查SSH密钥配置'
+            }
+
+    def test_sudo_check_skips_root_connection(self, ssh_manager, hosts):
+        """测试普通用户免密 sudo 可用时不再以 root 连接"""
+        def fake_test(host_config):
+            assert host_config['sudo_check'] is True
+            return {'host': host_config['host'], 'success': True, 'message': 'SSH连接成功', 'sudo': True}
+
+        with patch.object(ssh_manager, '_test_single_connection', side_effect=fake_test) as mock_test:
+            assert ssh_manager.verify_all_connections(hosts) is True
+
+        assert mock_test.call_count == 2
+
+    @pytest.mark.parametrize('exit_status, success, sudo', [(0, True, True), (97, True, False), (1, False, None)])
+    def test_sudo_check_exit_status(self, ssh_manager, key_file, exit_status, success, sudo):
+        """测试同一会话中 sudo 检查的退出码解析"""
+        import core.ssh_manager as sm
+        target = {'host': '10.0.0.1', 'username': 'ubuntu', 'port': 22,
+                  'key_filename': key_file, 'sudo_check': True}
+
+        with patch.object(sm, 'Ssh2Session', None), \
+             patch.object(ssh_manager, '_exec_paramiko', return_value=(exit_status, 'err')) as mock_exec:
+            result = ssh_manager._test_single_connection(target)
+
+        assert mock_exec.call_args.args[2] == sm.SUDO_CHECK_COMMAND
+        assert result['success'] is success
+        assert result.get('sudo') is sudo
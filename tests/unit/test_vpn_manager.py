@@ -0,0 +1,359 @@
+"""
+Unit tests for VPNManager
+测试 VPN 管理器的功能
+"""
+
+import threading
+
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+
+from core.vpn_manager import VPNManager
+
+
+class TestVPNManager:
+    """VPNManager 单元测试"""
+
+    @pytest.fixture
+    def vpn_manager(self):
+        """创建 VPNManager 实例"""
+        return VPNManager({'controller_public_ip': '203.0.113.1', 'wireguard_port': 51820})
+
+    @pytest.fixture
+    def hosts(self):
+        """vpn_hosts.json 格式的两个主机"""
+        return {
+            'all': {
+                'hosts': {
+                    f'node-{i}': {
+                        'ansible_host': f'203.0.113.{i + 1}',
+                        'ansible_user': 'ubuntu',
+                        'vpn_ip': f'10.0.0.{i + 1}'
+                    }
+                    for i in (1, 2)
+                }
+            }
+        }
+
+    def test_test_vpn_connections_runs_concurrently(self, vpn_manager, hosts, capsys):
+        """测试各节点的连接测试并发执行，报告按主机顺序输出"""
+        barrier = threading.Barrier(2, timeout=2)
+
+        def fake_test(ip, interface_up=None):
+            barrier.wait()
+            return ip == '10.0.0.2'
+
+        with patch.object(vpn_manager, 'test_vpn_connection', side_effect=fake_test), \
+             patch('core.vpn_manager.subprocess.run', return_value=Mock(returncode=1)):
+            assert vpn_manager.test_vpn_connections(hosts) is False
+
+        out = capsys.readouterr().out
+        assert out.index('✓ 10.0.0.2') < out.index('✗ 10.0.0.3')
+        assert '2 个节点, 1 个完全连通' in out
+
+    @pytest.mark.parametrize('installed, stamp_age, expected', [
+        (True, 0, []),
+        (False, 60, ['install']),
+        (False, 7200, ['update', 'install']),
+        (False, None, ['update', 'install']),
+    ])
+    def test_install_wireguard(self, vpn_manager, installed, stamp_age, expected):
+        """测试已安装时跳过 apt，软件包列表过期或缺失时才执行 apt-get update"""
+        def fake_run(cmd, **kwargs):
+            return Mock(returncode=0 if installed else 1)
+
+        def fake_getmtime(path):
+            if stamp_age is None:
+                raise FileNotFoundError(path)
+            return 10000 - stamp_age
+
+        with patch('core.vpn_manager.subprocess.run', side_effect=fake_run) as mock_run, \
+             patch('core.vpn_manager.os.path.getmtime', side_effect=fake_getmtime), \
+             patch('core.vpn_manager.time.time', return_value=10000):
+            vpn_manager._install_wireguard()
+
+        apt_calls = [c.args[0][2] for c in mock_run.call_args_list if c.args[0][:2] == ['sudo', 'apt-get']]
+        assert apt_calls == expected
+        if 'install' in expected:
+            assert mock_run.call_args.args[0][-2:] == ['wireguard', 'wireguard-tools']
+
+    def test_generate_keypair_in_process(self, vpn_manager):
+        """测试已安装 PyNaCl 时在进程内生成与私钥匹配的 32 字节密钥对"""
+        import base64
+        nacl_public = pytest.importorskip('nacl.public')
+
+        with patch('core.vpn_manager.subprocess.run') as mock_run:
+            private_key, public_key = vpn_manager._generate_keypair()
+
+        mock_run.assert_not_called()
+        private_bytes = base64.b64decode(private_key)
+        assert len(private_bytes) == 32
+        assert bytes(nacl_public.PrivateKey(private_bytes).public_key) == base64.b64decode(public_key)
+
+    def test_generate_keypair_falls_back_to_wg(self, vpn_manager):
+        """测试未安装 PyNaCl 时调用 wg genkey / wg pubkey"""
+        process = Mock(returncode=0)
+        process.communicate.return_value = (b'PUBLIC\n', b'')
+
+        with patch('core.vpn_manager.PrivateKey', None), \
+             patch('core.vpn_manager.subprocess.run', return_value=Mock(stdout='PRIVATE\n')), \
+             patch('core.vpn_manager.subprocess.Popen', return_value=process):
+            assert vpn_manager._generate_keypair() == ('PRIVATE', 'PUBLIC')
+
+        process.communicate.assert_called_once_with(input=b'PRIVATE')
+
+    @pytest.mark.parametrize('syncconf_rc', [0, 1])
+    def test_apply_controller_peers_streams_config(self, vpn_manager, syncconf_rc, tmp_path):
+        """测试配置经标准输入热加载并同时写入磁盘，热加载失败时才重启服务并等待"""
+        vpn_manager.controller_private_key = 'PRIV'
+        peers = {'10.0.0.2': {'public_key': 'PUB1', 'endpoint_ip': '203.0.113.2', 'endpoint_port': 51820}}
+
+        with patch('core.vpn_manager.WG_CONFIG_DIGEST', str(tmp_path / 'digest')), \
+             patch('core.vpn_manager.subprocess.run', return_value=Mock(returncode=syncconf_rc, stderr='')) as mock_run, \
+             patch.object(vpn_manager, '_write_root') as mock_write, \
+             patch('core.vpn_manager.time.sleep') as mock_sleep:
+            vpn_manager._apply_controller_peers(peers)
+
+        commands = [c.args[0] for c in mock_run.call_args_list]
+        assert commands[0] == ['sudo', 'wg', 'syncconf', 'wg0', '/dev/stdin']
+        streamed = mock_run.call_args_list[0].kwargs['input']
+        assert 'Address' not in streamed and 'PublicKey = PUB1' in streamed
+
+        path, persisted = mock_write.call_args_list[0].args
+        assert path == '/etc/wireguard/wg0.conf'
+        assert 'Address = ' in persisted and 'PublicKey = PUB1' in persisted
+        if syncconf_rc == 0:
+            assert len(commands) == 1
+            mock_sleep.assert_not_called()
+        else:
+            assert commands[1] == ['sudo', 'systemctl', 'restart', 'wg-quick@wg0']
+            mock_sleep.assert_called_once()
+
+    def test_setup_vpn_reads_pubkeys_from_single_run(self, vpn_manager, hosts, capsys):
+        """测试被控端的安装与公钥收集在一次 ansible-runner 执行中完成"""
+        def controller_setup():
+            vpn_manager.controller_public_key = 'CONTROLLER_PUB'
+            vpn_manager.controller_private_key = 'CONTROLLER_PRIV'
+
+        events = [
+            {'event': 'runner_on_ok', 'event_data': {'host': f'node-{i}', 'res': {
+                'ansible_facts': {'wg_public_key': f'PUB{i}'}}}}
+            for i in (1, 2)
+        ]
+        events.insert(0, {'event': 'playbook_on_start', 'event_data': {}})
+        # events 在 ansible-runner 中是按需读取磁盘文件的生成器，只允许遍历一次
+        result = Mock(status='successful', events=iter(events))
+
+        with patch.object(vpn_manager, 'setup_controller_vpn', side_effect=controller_setup), \
+             patch('core.vpn_manager.ansible_runner.run', return_value=result) as mock_ansible, \
+             patch('core.vpn_manager.subprocess.run', return_value=Mock(returncode=0)), \
+             patch.object(vpn_manager, '_write_root') as mock_write, \
+             patch.object(vpn_manager, 'test_vpn_connections', return_value=True):
+            assert vpn_manager.setup_vpn(hosts) is True
+
+        mock_ansible.assert_called_once()
+        assert mock_ansible.call_args.kwargs['envvars']['ANSIBLE_PIPELINING'] == 'True'
+        path, config = mock_write.call_args_list[0].args
+        assert path == '/etc/wireguard/wg0.conf'
+        assert 'PublicKey = PUB1' in config and 'PublicKey = PUB2' in config
+        assert '\n[Peer]\nPublicKey = PUB2\nAllowedIPs = 10.0.0.3/32\nEndpoint = 203.0.113.3:51820\n' in config
+        assert not any(line.startswith(' ') for line in config.splitlines())
+        # 调试信息走 logger.debug，不再打印到标准输出（完整配置包含私钥）
+        assert capsys.readouterr().out == ''
+
+    def test_setup_controller_vpn_single_privileged_call(self, vpn_manager):
+        """测试控制端的密钥与配置直接写入，IP 转发与服务启动在一次 sudo 调用中完成"""
+        with patch.object(vpn_manager, '_install_wireguard'), \
+             patch.object(vpn_manager, '_load_keypair', return_value=None), \
+             patch.object(vpn_manager, '_generate_keypair', return_value=('PRIV', 'PUB')), \
+             patch.object(vpn_manager, '_write_root') as mock_write, \
+             patch('core.vpn_manager.subprocess.run') as mock_run:
+            assert vpn_manager.setup_controller_vpn() is True
+
+        assert [c.args[0] for c in mock_write.call_args_list] == [
+            '/etc/wireguard/private.key', '/etc/wireguard/wg0.conf'
+        ]
+        assert mock_write.call_args_list[0].args[1] == 'PRIV'
+        mock_run.assert_called_once()
+        cmd = mock_run.call_args.args[0]
+        assert cmd[:3] == ['sudo', 'bash', '-c']
+        assert '/tmp/' not in cmd[3]
+        assert cmd[3].endswith('systemctl restart wg-quick@wg0')
+        assert vpn_manager.controller_public_key == 'PUB'
+
+    @pytest.mark.parametrize('interface_up', [True, False])
+    def test_setup_controller_vpn_reuses_existing_key(self, vpn_manager, interface_up):
+        """测试复用已有私钥；接口已运行时不重写配置、不重启服务"""
+        with patch.object(vpn_manager, '_install_wireguard'), \
+             patch.object(vpn_manager, '_load_keypair', return_value=('PRIV', 'PUB')), \
+             patch.object(vpn_manager, '_generate_keypair') as mock_generate, \
+             patch.object(vpn_manager, '_wireguard_interface_up', return_value=interface_up), \
+             patch.object(vpn_manager, '_write_root') as mock_write, \
+             patch('core.vpn_manager.subprocess.run') as mock_run:
+            assert vpn_manager.setup_controller_vpn() is True
+
+        mock_generate.assert_not_called()
+        assert vpn_manager.controller_private_key == 'PRIV'
+        scripts = ' '.join(' '.join(c.args[0]) for c in mock_run.call_args_list)
+        if interface_up:
+            mock_write.assert_not_called()
+            assert 'restart' not in scripts and 'rm -f' not in scripts
+        else:
+            assert [c.args[0] for c in mock_write.call_args_list] == ['/etc/wireguard/wg0.conf']
+            assert 'systemctl restart wg-quick@wg0' in scripts
+
+    def test_load_keypair_derives_public_key(self, vpn_manager, tmp_path):
+        """测试读取已保存的私钥并推导出匹配的公钥，私钥文件不存在时返回 None"""
+        pytest.importorskip('nacl.public')
+        private_key, public_key = vpn_manager._generate_keypair()
+        key_file = tmp_path / 'private.key'
+        key_file.write_text(private_key + '\n')
+
+        with patch('core.vpn_manager.os.geteuid', return_value=0), \
+             patch('core.vpn_manager.WG_PRIVATE_KEY_PATH', str(key_file)):
+            assert vpn_manager._load_keypair() == (private_key, public_key)
+        with patch('core.vpn_manager.os.geteuid', return_value=0), \
+             patch('core.vpn_manager.WG_PRIVATE_KEY_PATH', str(tmp_path / 'missing.key')):
+            assert vpn_manager._load_keypair() is None
+
+    def test_stop_vpn_batches_local_cleanup(self, vpn_manager, hosts):
+        """测试本地清理合并为远程清理前后各一次 sudo 调用"""
+        with patch('core.vpn_manager.subprocess.run', return_value=Mock(returncode=0, stderr='')) as mock_run, \
+             patch('core.vpn_manager.ansible_runner.run', return_value=Mock(status='successful')) as mock_ansible:
+            assert vpn_manager.stop_vpn(hosts) is True
+
+        kwargs = mock_ansible.call_args.kwargs
+        assert kwargs['playbook'] == 'playbooks/stop_wireguard.yml'
+        assert kwargs['extravars'] == {'ansible_become': True, 'ansible_become_method': 'sudo'}
+        assert kwargs['envvars']['ANSIBLE_GATHERING'] == 'smart'
+
+        scripts = [c.args[0][3] for c in mock_run.call_args_list]
+        assert len(scripts) == 2
+        assert 'systemctl stop wg-quick@wg0' in scripts[0] and 'rm -f' in scripts[0]
+        assert 'ip_forward=0' in scripts[1] and 'ip link delete wg0' in scripts[1]
+
+    def test_run_privileged_reports_failure(self, vpn_manager):
+        """测试批量命令中有命令失败时返回 False 并继续执行后续命令"""
+        import subprocess
+        real_run = subprocess.run
+
+        # 去掉 sudo 后在本地执行生成的脚本
+        with patch('core.vpn_manager.subprocess.run',
+                   side_effect=lambda cmd, **kw: real_run(cmd[1:], **kw)):
+            assert vpn_manager._run_privileged(['true', 'false', 'touch /dev/null']) is False
+            assert vpn_manager._run_privileged(['true']) is True
+
+    def test_test_vpn_connections_queries_interface_once(self, vpn_manager, hosts):
+        """测试 wg0 接口状态只查询一次并传给各节点的测试"""
+        with patch.object(vpn_manager, '_wireguard_interface_up', return_value=True) as mock_up, \
+             patch.object(vpn_manager, '_has_route', return_value=True), \
+             patch('core.vpn_manager.time.sleep'), \
+             patch('core.vpn_manager.subprocess.run', return_value=Mock(returncode=0, stdout='')) as mock_run:
+            assert vpn_manager.test_vpn_connections(hosts) is True
+
+        mock_up.assert_called_once()
+        commands = [c.args[0] for c in mock_run.call_args_list]
+        assert ['sudo', 'wg', 'show', 'wg0'] not in commands
+        assert sum(1 for cmd in commands if 'ping' in cmd) == 2
+
+    def test_netlink_queries_when_pyroute2_installed(self, vpn_manager):
+        """测试已安装 pyroute2 时通过 netlink 查询接口与路由，不调用子进程"""
+        fake_wg, fake_ipr = MagicMock(), MagicMock()
+        wg = fake_wg.return_value.__enter__.return_value
+        ipr = fake_ipr.return_value.__enter__.return_value
+        ipr.route.return_value = [{'dst': '10.0.0.2'}]
+
+        with patch('core.vpn_manager.WireGuard', fake_wg), \
+             patch('core.vpn_manager.IPRoute', fake_ipr), \
+             patch('core.vpn_manager.subprocess.run') as mock_run:
+            assert vpn_manager._wireguard_interface_up() is True
+            assert vpn_manager._has_route('10.0.0.2') is True
+
+        wg.info.assert_called_once_with('wg0')
+        ipr.route.assert_called_once_with('get', dst='10.0.0.2')
+        mock_run.assert_not_called()
+
+    def test_apply_controller_peers_skips_unchanged_config(self, vpn_manager, tmp_path):
+        """测试完整配置与最近一次应用的摘要相同时跳过写入与重新加载"""
+        import hashlib
+
+        vpn_manager.controller_private_key = 'CONTROLLER_PRIV'
+        peers = {'10.0.0.2': {'public_key': 'PUB1', 'endpoint_ip': '203.0.113.2', 'endpoint_port': 51820}}
+        digest_file = tmp_path / 'peers.sha256'
+
+        with patch('core.vpn_manager.WG_CONFIG_DIGEST', str(digest_file)), \
+             patch.object(vpn_manager, '_write_root') as mock_write, \
+             patch('core.vpn_manager.subprocess.run', return_value=Mock(returncode=0, stderr='')) as mock_run:
+            vpn_manager._apply_controller_peers(peers)
+
+        (_, config), (digest_path, digest) = (c.args for c in mock_write.call_args_list)
+        assert digest_path == str(digest_file)
+        assert digest == hashlib.sha256(config.encode()).hexdigest()
+        assert mock_run.call_count > 0
+
+        digest_file.write_text(digest)
+        with patch('core.vpn_manager.WG_CONFIG_DIGEST', str(digest_file)), \
+             patch.object(vpn_manager, '_write_root') as mock_write, \
+             patch('core.vpn_manager.subprocess.run') as mock_run:
+            vpn_manager._apply_controller_peers(peers)
+
+        mock_write.assert_not_called()
+        mock_run.assert_not_called()
+
+    def test_write_root_as_root(self, vpn_manager, tmp_path):
+        """测试以 root 运行时直接原子写入 0600 文件，不启动子进程"""
+        target = tmp_path / 'wg0.conf'
+        target.write_text('old')
+
+        with patch('core.vpn_manager.os.geteuid', return_value=0), \
+             patch('core.vpn_manager.subprocess.run') as mock_run:
+            vpn_manager._write_root(str(target), 'new config')
+
+        mock_run.assert_not_called()
+        assert target.read_text() == 'new config'
+        assert target.stat().st_mode & 0o777 == 0o600
+        assert not (tmp_path / 'wg0.conf.tmp').exists()
+
+    def test_write_root_via_sudo(self, vpn_manager):
+        """测试非 root 运行时通过一次 sudo 调用从标准输入写入"""
+        with patch('core.vpn_manager.os.geteuid', return_value=1000), \
+             patch('core.vpn_manager.subprocess.run') as mock_run:
+            vpn_manager._write_root('/etc/wireguard/wg0.conf', 'config')
+
+        cmd = mock_run.call_args.args[0]
+        assert cmd[:3] == ['sudo', 'bash', '-c']
+        assert cmd[3] == ('umask 077 && cat > /etc/wireguard/wg0.conf.tmp && '
+                          'mv /etc/wireguard/wg0.conf.tmp /etc/wireguard/wg0.conf')
+        assert mock_run.call_args.kwargs['input'] == 'config'
+
+    def test_test_vpn_connections_multiping(self, vpn_manager, hosts, capsys):
+        """测试已安装 icmplib 时一次批量 ping 所有节点，不再逐个调用 ping"""
+        from types import SimpleNamespace
+
+        fake_icmplib = Mock()
+        fake_icmplib.multiping.return_value = [
+            SimpleNamespace(address='10.0.0.3', is_alive=False),
+            SimpleNamespace(address='10.0.0.2', is_alive=True),
+        ]
+
+        with patch('core.vpn_manager.icmplib', fake_icmplib), \
+             patch.object(vpn_manager, '_wireguard_interface_up', return_value=True), \
+             patch.object(vpn_manager, 'test_vpn_connection') as mock_single, \
+             patch('core.vpn_manager.subprocess.run', return_value=Mock(returncode=0, stdout='')):
+            assert vpn_manager.test_vpn_connections(hosts) is False
+
+        mock_single.assert_not_called()
+        args, kwargs = fake_icmplib.multiping.call_args
+        assert args[0] == ['10.0.0.2', '10.0.0.3']
+        assert kwargs['source'] == '10.0.0.1' and kwargs['privileged'] is False
+        out = capsys.readouterr().out
+        assert '✓ 10.0.0.2' in out and '✗ 10.0.0.3' in out
+
+    def test_multiping_falls_back_on_error(self, vpn_manager):
+        """测试无法发送非特权 ICMP 时返回 None 以回退为逐个节点 ping"""
+        fake_icmplib = Mock()
+        fake_icmplib.multiping.side_effect = PermissionError('ping_group_range')
+
+        with patch('core.vpn_manager.icmplib', fake_icmplib), \
+             patch('core.vpn_manager.subprocess.run'):
+            assert vpn_manager._multiping(['10.0.0.2']) is None